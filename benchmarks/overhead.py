@@ -0,0 +1,74 @@
+"""Python-side overhead per request, measured against the in-process FakeTransport (no shared library, no network).
+
+    python -m benchmarks.overhead --requests 20000 --sizes 0,1024,1048576
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tls_client  # noqa: E402
+from tls_client.transport import FakeTransport  # noqa: E402
+
+
+def measure(size: int, requests: int, redirects: int = 0) -> dict:
+    transport = FakeTransport()
+    url = "https://bench.local/final"
+    transport.add_response(url, body=os.urandom(size), headers={"Content-Type": "application/octet-stream"})
+    for hop in range(redirects):
+        transport.add_response(f"https://bench.local/hop/{hop}", status=302, headers={
+            "Location": f"/hop/{hop + 1}" if hop + 1 < redirects else "/final"
+        })
+    start_url = "https://bench.local/hop/0" if redirects else url
+
+    session = tls_client.Session(transport=transport)
+    phases = defaultdict(int)
+    for _ in range(min(100, requests)):
+        session.get(start_url)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = session.get(start_url)
+        for phase, duration in response.timings.items():
+            phases[phase] += duration
+    elapsed = time.perf_counter() - start
+    session.close()
+
+    return {
+        "body_size": size,
+        "redirects": redirects,
+        "requests": requests,
+        "us_per_request": elapsed / requests * 1_000_000,
+        # per phase of the final hop, the fake transport time is included in "transport"
+        "phases_us": {phase: total / requests / 1000 for phase, total in phases.items()},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--sizes", default="0,1024,102400,1048576")
+    parser.add_argument("--redirects", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in map(int, args.sizes.split(",")):
+        requests = max(10, min(args.requests, 2 * 1024 * 1024 * 1024 // max(size, 1)))
+        result = measure(size, requests, args.redirects)
+        results.append(result)
+        phases = " ".join(f"{phase}={value:.1f}" for phase, value in result["phases_us"].items())
+        print(f"{size:>10} B  {result['us_per_request']:>9.1f} us/request  {phases}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""Benchmark suite for tls_client against a local HTTPS server.
+
+Every (client, protocol, scenario, concurrency) combination runs in its own process, so CPU time and peak RSS are
+attributed to the client only. Results are written as JSON and can be compared against a previous run::
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --clients tls_client --scenarios bytes_1k,redirects --baseline results.json
+
+``requests`` and ``httpx`` are benchmarked if installed (HTTP/2 for httpx needs ``httpx[http2]``), the HTTP/2 server
+needs the ``h2`` package. The server certificate is created with the ``openssl`` command line tool, which has to be on
+the PATH. Peak RSS is reported where the ``resource`` module exists (not on Windows).
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from typing import List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+KB = 1024
+MB = 1024 * 1024
+
+# name -> (method, path, kind, request body size), "multipart" uploads a file of that size with files=
+SCENARIOS = {
+    "bytes_0": ("GET", "/bytes/0", "buffered", 0),
+    "bytes_1k": ("GET", "/bytes/1024", "buffered", 0),
+    "bytes_100k": ("GET", f"/bytes/{100 * KB}", "buffered", 0),
+    "bytes_1m": ("GET", f"/bytes/{MB}", "buffered", 0),
+    "bytes_10m": ("GET", f"/bytes/{10 * MB}", "buffered", 0),
+    "bytes_100m": ("GET", f"/bytes/{100 * MB}", "buffered", 0),
+    "redirects": ("GET", "/redirect/5", "buffered", 0),
+    "cookies": ("GET", "/cookies/20", "buffered", 0),
+    "stream_1m": ("GET", f"/stream/{MB}", "stream", 0),
+    "stream_10m": ("GET", f"/stream/{10 * MB}", "stream", 0),
+    "upload_1m": ("POST", "/upload", "upload", MB),
+    "multipart_10m": ("POST", "/upload", "multipart", 10 * MB),
+    "multipart_100m": ("POST", "/upload", "multipart", 100 * MB),
+}
+DEFAULT_SCENARIOS = ["bytes_0", "bytes_1k", "bytes_100k", "bytes_1m", "bytes_10m", "redirects", "cookies", "stream_1m"]
+
+# Upper bound of transferred bytes per run, large bodies run less requests
+MAX_BYTES_PER_RUN = 2 * 1024 * MB
+
+
+# --- Clients ----------------------------------------------------------------------------------------------------------
+
+class TLSClientClient:
+    name = "tls_client"
+
+    def __init__(self, protocol: str) -> None:
+        sys.path.insert(0, ROOT_DIR)
+        import tls_client
+        self.session = tls_client.Session(force_http1=protocol == "h1")
+
+    def request(self, method: str, url: str, kind: str, body: Optional[bytes]) -> int:
+        if kind == "stream":
+            response = self.session.get(url, verify=False, stream=True)
+            return sum(len(chunk) for chunk in response.iter_content(64 * KB))
+        if kind == "multipart":
+            response = self.session.post(url, files={"file": pathlib.Path(body)}, verify=False)
+            return len(response.content)
+        response = self.session.execute_request(method, url, data=body, verify=False)
+        return len(response.content)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class RequestsClient:
+    name = "requests"
+    protocols = ("h1",)
+
+    def __init__(self, protocol: str) -> None:
+        import requests
+        import urllib3
+        urllib3.disable_warnings()
+        self.session = requests.Session()
+        self.session.verify = False
+
+    def request(self, method: str, url: str, kind: str, body: Optional[bytes]) -> int:
+        if kind == "stream":
+            with self.session.get(url, stream=True) as response:
+                return sum(len(chunk) for chunk in response.iter_content(64 * KB))
+        if kind == "multipart":
+            with open(body, "rb") as f:
+                return len(self.session.post(url, files={"file": f}).content)
+        return len(self.session.request(method, url, data=body).content)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class HttpxClient:
+    name = "httpx"
+
+    def __init__(self, protocol: str) -> None:
+        import httpx
+        self.client = httpx.Client(http1=protocol == "h1", http2=protocol == "h2", verify=False)
+
+    def request(self, method: str, url: str, kind: str, body: Optional[bytes]) -> int:
+        if kind == "stream":
+            with self.client.stream("GET", url) as response:
+                return sum(len(chunk) for chunk in response.iter_bytes(64 * KB))
+        if kind == "multipart":
+            with open(body, "rb") as f:
+                return len(self.client.post(url, files={"file": f}).content)
+        return len(self.client.request(method, url, content=body).content)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+CLIENTS = {client.name: client for client in (TLSClientClient, RequestsClient, HttpxClient)}
+
+
+def client_available(name: str, protocol: str) -> bool:
+    client = CLIENTS[name]
+    if protocol not in getattr(client, "protocols", ("h1", "h2")):
+        return False
+    modules = {"tls_client": [], "requests": ["requests"], "httpx": ["httpx"] + (["h2"] if protocol == "h2" else [])}
+    for module in modules[name]:
+        try:
+            __import__(module)
+        except ImportError:
+            return False
+    return True
+
+
+# --- Worker -----------------------------------------------------------------------------------------------------------
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS of the process in MB, None where it can't be measured (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak / (MB if sys.platform == "darwin" else KB)
+
+
+def percentile(samples: List[float], value: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * value))]
+
+
+def run_worker(spec: dict) -> dict:
+    """Runs one benchmark in the current process."""
+    warnings.simplefilter("ignore")
+    method, path, kind, body_size = SCENARIOS[spec["scenario"]]
+    url = spec["base_url"] + path
+    body = os.urandom(body_size) if body_size and kind != "multipart" else None
+    if kind == "multipart":
+        # uploaded from a file, only the client's own buffering shows up in the peak RSS
+        body = os.path.abspath("upload.bin")
+        with open(body, "wb") as f:
+            for offset in range(0, body_size, MB):
+                f.write(os.urandom(min(MB, body_size - offset)))
+    concurrency = spec["concurrency"]
+
+    # one client per worker thread, so clients without thread-safety guarantees are measured fairly
+    local = threading.local()
+    clients = []
+    clients_lock = threading.Lock()
+
+    def client() -> object:
+        instance = getattr(local, "client", None)
+        if instance is None:
+            instance = local.client = CLIENTS[spec["client"]](spec["protocol"])
+            with clients_lock:
+                clients.append(instance)
+        return instance
+
+    def one_request(_: int) -> float:
+        start = time.perf_counter()
+        client().request(method, url, kind, body)
+        return time.perf_counter() - start
+
+    latencies = []
+    errors = 0
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        # warm up connections and lazy imports
+        list(executor.map(one_request, range(min(concurrency, spec["requests"]))))
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        futures = [executor.submit(one_request, i) for i in range(spec["requests"])]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+    for instance in clients:
+        instance.close()
+
+    latencies.sort()
+    completed = len(latencies)
+    return dict(
+        spec,
+        errors=errors,
+        rps=completed / wall if wall else 0.0,
+        p50_ms=percentile(latencies, 0.50) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+        cpu_ms_per_request=cpu / max(completed, 1) * 1000,
+        peak_rss_mb=peak_rss_mb(),
+    )
+
+
+# --- Orchestration ----------------------------------------------------------------------------------------------------
+
+def requests_for(scenario: str, requested: int) -> int:
+    _, path, kind, body_size = SCENARIOS[scenario]
+    size = max(body_size, int(path.rsplit("/", 1)[-1]) if path.rsplit("/", 1)[-1].isdigit() else 0)
+    if not size:
+        return requested
+    return max(3, min(requested, MAX_BYTES_PER_RUN // size))
+
+
+def spawn_worker(spec: dict, timeout: float) -> dict:
+    # streamed responses are spooled to the working directory, keep them out of the repository
+    with tempfile.TemporaryDirectory(prefix="tls-client-bench-") as cwd:
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker", json.dumps(spec)],
+            cwd=cwd,
+            env=dict(os.environ, PYTHONPATH=ROOT_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")),
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+    if process.returncode != 0:
+        return dict(spec, failed=process.stderr.strip().splitlines()[-1:] or ["unknown error"])
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def result_key(result: dict) -> tuple:
+    return result["client"], result["protocol"], result["scenario"], result["concurrency"]
+
+
+def compare(results: List[dict], baseline_file: str, tolerance: float) -> List[str]:
+    """Returns a description of every result which is worse than the baseline by more than ``tolerance``."""
+    with open(baseline_file, "r") as f:
+        baseline = {result_key(result): result for result in json.load(f)["results"] if "failed" not in result}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result_key(result))
+        if previous is None or "failed" in result:
+            continue
+        if result["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{result_key(result)}: rps {previous['rps']:.1f} -> {result['rps']:.1f}")
+        if result["p99_ms"] > previous["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{result_key(result)}: p99 {previous['p99_ms']:.2f}ms -> {result['p99_ms']:.2f}ms")
+    return regressions
+
+
+def format_mb(value: Optional[float], width: int) -> str:
+    return f"{value:>{width}.1f}" if value is not None else f"{'n/a':>{width}}"
+
+
+def print_table(results: List[dict]) -> None:
+    print(f"{'client':<11}{'proto':<6}{'scenario':<12}{'conc':>5}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'cpu ms':>9}{'rss MB':>9}")
+    for result in results:
+        if "failed" in result:
+            print(f"{result['client']:<11}{result['protocol']:<6}{result['scenario']:<12}{result['concurrency']:>5}"
+                  f"  failed: {result['failed'][0]}")
+            continue
+        print(f"{result['client']:<11}{result['protocol']:<6}{result['scenario']:<12}{result['concurrency']:>5}"
+              f"{result['rps']:>10.1f}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+              f"{result['cpu_ms_per_request']:>9.3f}{format_mb(result['peak_rss_mb'], 9)}")
+
+
+def split(value: str) -> List[str]:
+    return [item for item in value.split(",") if item]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="tls_client,requests,httpx")
+    parser.add_argument("--protocols", default="h1,h2")
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS),
+                        help=f"available: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=500, help="requests per run (less for large bodies)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per run")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against the JSON results of a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return 0
+
+    from .server import h2, start_server
+    server = start_server()
+    base_url = f"https://127.0.0.1:{server.server_address[1]}"
+
+    protocols = [protocol for protocol in split(args.protocols) if protocol == "h1" or h2 is not None]
+    results = []
+    for scenario in split(args.scenarios):
+        for protocol in protocols:
+            for client in split(args.clients):
+                if not client_available(client, protocol):
+                    continue
+                for concurrency in map(int, split(args.concurrency)):
+                    spec = {
+                        "client": client,
+                        "protocol": protocol,
+                        "scenario": scenario,
+                        "concurrency": concurrency,
+                        "requests": requests_for(scenario, args.requests),
+                        "base_url": base_url,
+                    }
+                    try:
+                        results.append(spawn_worker(spec, args.timeout))
+                    except subprocess.TimeoutExpired:
+                        results.append(dict(spec, failed=[f"timeout after {args.timeout}s"]))
+                    print(f"done: {client} {protocol} {scenario} x{concurrency}", file=sys.stderr)
+    server.shutdown()
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Requests per second of a ProcessPool with 1, 2, 4, ... worker processes against a single process.
+
+The default transport is the in-process FakeTransport of each worker, so only the Python side of a request is
+measured (the part which is bound to one core per interpreter); ``--transport cffi`` sends the requests to the local
+benchmark server through the shared library::
+
+    python -m benchmarks.scaling --requests 20000 --size 1024
+    python -m benchmarks.scaling --size 1048576 --transport cffi
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tls_client  # noqa: E402
+from tls_client.pool import ProcessPool  # noqa: E402
+from tls_client.transport import FakeTransport  # noqa: E402
+
+FAKE_URL = "https://bench.local/bytes"
+
+
+def make_session(size: int, transport: str) -> tls_client.Session:
+    if transport == "cffi":
+        return tls_client.Session()
+    fake = FakeTransport()
+    fake.add_response(FAKE_URL, body=os.urandom(size), headers={"Content-Type": "application/octet-stream"})
+    return tls_client.Session(transport=fake)
+
+
+def run_single(url: str, requests: int, threads: int, size: int, transport: str) -> float:
+    session = make_session(size, transport)
+    session.get(url, verify=False)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for response in executor.map(lambda _: session.get(url, verify=False), range(requests)):
+            assert response.status_code == 200
+    elapsed = time.perf_counter() - start
+    session.close()
+    return requests / elapsed
+
+
+def run_pool(url: str, requests: int, workers: int, threads: int, size: int, transport: str, window: int) -> float:
+    factory = functools.partial(make_session, size, transport)
+    with ProcessPool(workers=workers, session_factory=factory, affinity="session", threads=threads) as pool:
+        # one session per worker thread, spread over the workers by session affinity
+        keys = [f"session-{index}" for index in range(workers * threads)]
+        for future in [pool.submit("GET", url, session_key=key, verify=False) for key in keys]:
+            future.result()
+
+        start = time.perf_counter()
+        pending = []
+        for index in range(requests):
+            pending.append(pool.submit("GET", url, session_key=keys[index % len(keys)], verify=False))
+            if len(pending) >= window:
+                assert pending.pop(0).result().status_code == 200
+        for future in pending:
+            assert future.result().status_code == 200
+        elapsed = time.perf_counter() - start
+    return requests / elapsed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=1024, help="response body size in bytes")
+    parser.add_argument("--threads", type=int, default=4, help="threads per process")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--transport", choices=("fake", "cffi"), default="fake")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = FAKE_URL
+    if args.transport == "cffi":
+        from .server import start_server
+        server = start_server()
+        url = f"https://127.0.0.1:{server.server_address[1]}/bytes/{args.size}"
+
+    results = [{"workers": 0, "rps": run_single(url, args.requests, args.threads, args.size, args.transport)}]
+    workers = 1
+    while workers <= args.max_workers:
+        window = workers * args.threads * 2
+        rps = run_pool(url, args.requests, workers, args.threads, args.size, args.transport, window)
+        results.append({"workers": workers, "rps": rps})
+        workers *= 2
+
+    if server is not None:
+        server.shutdown()
+
+    single = results[0]["rps"]
+    print(f"{'workers':<16}{'req/s':>10}{'speedup':>9}")
+    for result in results:
+        label = "single process" if result["workers"] == 0 else str(result["workers"])
+        print(f"{label:<16}{result['rps']:>10.0f}{result['rps'] / single:>9.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"size": args.size, "transport": args.transport, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""Local HTTPS server for the benchmarks.
+
+Serves HTTP/1.1 and, if the optional ``h2`` package is installed, HTTP/2 (negotiated via ALPN) with a self-signed
+certificate. Run standalone with ``python -m benchmarks.server --port 8443``.
+
+Endpoints:
+    /bytes/<n>          body of n bytes
+    /redirect/<n>       redirect chain of n hops ending at /bytes/0
+    /cookies/<n>        sets n cookies
+    /stream/<n>         n bytes, sent in 64 KiB chunks (chunked transfer encoding on HTTP/1.1)
+    /status/<code>      empty response with the given status code
+    /upload             reads the request body and returns its size
+"""
+import argparse
+import os
+import socket
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+except ImportError:
+    h2 = None
+
+CHUNK_SIZE = 64 * 1024
+
+_bodies = {}
+_bodies_lock = threading.Lock()
+
+
+def body_of_size(size: int) -> bytes:
+    with _bodies_lock:
+        body = _bodies.get(size)
+        if body is None:
+            body = _bodies[size] = os.urandom(min(size, 1024)) * (size // 1024) + os.urandom(size % 1024)
+        return body
+
+
+def generate_certificate(directory: str) -> Tuple[str, str]:
+    """Creates a self-signed certificate for localhost using the openssl command line tool (1.1.1 or later, for
+    -addext), which has to be on the PATH."""
+    cert_file = os.path.join(directory, "cert.pem")
+    key_file = os.path.join(directory, "key.pem")
+    try:
+        subprocess.run(
+            [
+                "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+                "-keyout", key_file, "-out", cert_file, "-subj", "/CN=localhost",
+                "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        raise RuntimeError("The benchmark server needs the openssl command line tool on the PATH") from None
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"openssl failed to create the certificate: {e.stderr.decode(errors='replace')}") from None
+    return cert_file, key_file
+
+
+def route(method: str, path: str, body_size: int) -> Tuple[int, List[Tuple[str, str]], Iterable[bytes]]:
+    """Returns status, headers and body chunks for a request."""
+    parts = path.split("?", 1)[0].strip("/").split("/")
+    endpoint = parts[0]
+    argument = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+
+    if endpoint == "bytes":
+        body = body_of_size(argument)
+        return 200, [("content-type", "application/octet-stream"), ("content-length", str(len(body)))], [body]
+
+    if endpoint == "redirect":
+        location = f"/redirect/{argument - 1}" if argument > 1 else "/bytes/0"
+        return 302, [("location", location), ("content-length", "0")], []
+
+    if endpoint == "cookies":
+        headers = [("set-cookie", f"cookie{i}=value{i}; Path=/") for i in range(argument)]
+        return 200, headers + [("content-length", "0")], []
+
+    if endpoint == "stream":
+        body = body_of_size(argument)
+        chunks = (body[offset:offset + CHUNK_SIZE] for offset in range(0, len(body), CHUNK_SIZE))
+        return 200, [("content-type", "application/octet-stream")], chunks
+
+    if endpoint == "status":
+        return argument or 200, [("content-length", "0")], []
+
+    if endpoint == "upload":
+        body = str(body_size).encode()
+        return 200, [("content-type", "text/plain"), ("content-length", str(len(body)))], [body]
+
+    return 404, [("content-length", "0")], []
+
+
+class Http1Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self) -> None:
+        length = int(self.headers.get("content-length") or 0)
+        remaining = length
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, CHUNK_SIZE)))
+
+        status, headers, chunks = route(self.command, self.path, length)
+        self.send_response(status)
+        chunked = not any(name == "content-length" for name, _ in headers)
+        for name, value in headers:
+            self.send_header(name, value)
+        if chunked:
+            self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        for chunk in chunks:
+            if chunked:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            else:
+                self.wfile.write(chunk)
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_HEAD = do_OPTIONS = _handle
+
+
+class Http2Connection:
+    """Minimal HTTP/2 server connection based on the h2 package, including flow control for large bodies."""
+
+    def __init__(self, sock: ssl.SSLSocket) -> None:
+        self.sock = sock
+        self.conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        self.requests = {}
+        self.pending = {}
+
+    def run(self) -> None:
+        self.conn.initiate_connection()
+        self.sock.sendall(self.conn.data_to_send())
+        while True:
+            data = self.sock.recv(65535)
+            if not data:
+                return
+            for event in self.conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    self.requests[event.stream_id] = [dict(event.headers), 0]
+                elif isinstance(event, h2.events.DataReceived):
+                    self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    self.requests[event.stream_id][1] += len(event.data)
+                elif isinstance(event, h2.events.StreamEnded):
+                    self._respond(event.stream_id)
+                elif isinstance(event, h2.events.StreamReset):
+                    self.pending.pop(event.stream_id, None)
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    return
+            self._flush()
+            self.sock.sendall(self.conn.data_to_send())
+
+    def _respond(self, stream_id: int) -> None:
+        headers, body_size = self.requests.pop(stream_id)
+        status, response_headers, chunks = route(headers[":method"], headers[":path"], body_size)
+        self.conn.send_headers(stream_id, [(":status", str(status))] + response_headers)
+        if headers[":method"] == "HEAD":
+            self.conn.end_stream(stream_id)
+            return
+        self.pending[stream_id] = [b"".join(chunks), 0]
+
+    def _flush(self) -> None:
+        for stream_id, pending in list(self.pending.items()):
+            body, offset = pending
+            while offset < len(body):
+                window = min(self.conn.local_flow_control_window(stream_id), self.conn.max_outbound_frame_size)
+                if window <= 0:
+                    break
+                self.conn.send_data(stream_id, body[offset:offset + window])
+                offset += window
+            pending[1] = offset
+            if offset >= len(body):
+                self.conn.end_stream(stream_id)
+                del self.pending[stream_id]
+
+
+class TLSServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], cert_file: str, key_file: str, http2: bool = True) -> None:
+        super().__init__(address, None)
+        self.ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.ssl_context.load_cert_chain(cert_file, key_file)
+        self.ssl_context.set_alpn_protocols(["h2", "http/1.1"] if http2 and h2 is not None else ["http/1.1"])
+
+    def finish_request(self, request: socket.socket, client_address) -> None:
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            tls_socket = self.ssl_context.wrap_socket(request, server_side=True)
+        except (ssl.SSLError, OSError):
+            return
+        try:
+            if tls_socket.selected_alpn_protocol() == "h2":
+                Http2Connection(tls_socket).run()
+            else:
+                Http1Handler(tls_socket, client_address, self)
+        except (ConnectionError, ssl.SSLError, OSError):
+            pass
+
+
+def start_server(port: int = 0, http2: bool = True, cert_dir: Optional[str] = None) -> TLSServer:
+    """Starts the server in a background thread and returns it, the port is ``server.server_address[1]``."""
+    cert_dir = cert_dir or tempfile.mkdtemp(prefix="tls-client-bench-")
+    cert_file, key_file = generate_certificate(cert_dir)
+    server = TLSServer(("127.0.0.1", port), cert_file, key_file, http2=http2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--no-http2", action="store_true")
+    args = parser.parse_args()
+
+    server = start_server(args.port, http2=not args.no_http2)
+    print(f"https://127.0.0.1:{server.server_address[1]} (http2: {h2 is not None and not args.no_http2})", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Long-running soak test for memory, file descriptor, thread and Go session leaks.
+
+Drives a mix of buffered requests, streams, redirects, cookies, failing requests and session churn against the local
+benchmark server, samples the process over time and fails (exit code 1) if a resource grows past its threshold::
+
+    python -m benchmarks.soak --requests 200000 --concurrency 8 --output soak.json
+    python -m benchmarks.soak --transport fake --requests 500000   # Python side only, no shared library needed
+"""
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from json import loads
+from typing import List, Optional, Set
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import tls_client  # noqa: E402
+from tls_client.exceptions import TLSClientException  # noqa: E402
+from tls_client.transport import FakeTransport, Transport, build_envelope, get_default_transport  # noqa: E402
+
+
+class SessionCountingTransport(Transport):
+    """Wraps a backend and counts the Go sessions which were used but not destroyed yet."""
+
+    def __init__(self, transport: Transport) -> None:
+        self.transport = transport
+        self._lock = threading.Lock()
+        self._live: Set[str] = set()
+
+    @property
+    def live_sessions(self) -> int:
+        with self._lock:
+            return len(self._live)
+
+    def request(self, payload: bytes) -> bytes:
+        session_id = loads(payload)["sessionId"]
+        with self._lock:
+            self._live.add(session_id)
+        return self.transport.request(payload)
+
+    def get_cookies_from_session(self, payload: bytes) -> bytes:
+        return self.transport.get_cookies_from_session(payload)
+
+    def add_cookies_to_session(self, payload: bytes) -> bytes:
+        return self.transport.add_cookies_to_session(payload)
+
+    def destroy_session(self, payload: bytes) -> bytes:
+        with self._lock:
+            self._live.discard(loads(payload)["sessionId"])
+        return self.transport.destroy_session(payload)
+
+    def destroy_all(self) -> bytes:
+        with self._lock:
+            self._live.clear()
+        return self.transport.destroy_all()
+
+    def free_memory(self, response_id: str) -> None:
+        self.transport.free_memory(response_id)
+
+
+def fake_handler(payload: dict) -> dict:
+    """Mimics the endpoints of the benchmark server for the fake transport."""
+    path = "/" + payload["requestUrl"].split("/", 3)[-1]
+    parts = path.strip("/").split("/")
+    argument = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+    if parts[0] == "redirect":
+        location = f"/redirect/{argument - 1}" if argument > 1 else "/bytes/0"
+        return build_envelope(payload, 302, {"Location": location})
+    if parts[0] == "cookies":
+        return build_envelope(payload, headers={"Set-Cookie": [f"cookie{i}=value{i}; Path=/" for i in range(argument)]})
+    if payload["requestUrl"].startswith("https://127.0.0.1:1/"):
+        envelope = build_envelope(payload, 0)
+        envelope["body"] = "dial tcp 127.0.0.1:1: connect: connection refused"
+        return envelope
+    return build_envelope(payload, body=b"x" * argument)
+
+
+# --- Sampling ---------------------------------------------------------------------------------------------------------
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def open_fds() -> int:
+    for directory in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(directory))
+        except OSError:
+            continue
+    return -1
+
+
+def os_threads() -> int:
+    """Threads of the process, including the threads of the Go runtime."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("Threads:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return threading.active_count()
+
+
+class Sampler(threading.Thread):
+    def __init__(self, transport: SessionCountingTransport, spool_dir: str, interval: float) -> None:
+        super().__init__(daemon=True)
+        self.transport = transport
+        self.spool_dir = spool_dir
+        self.interval = interval
+        self.samples: List[dict] = []
+        self.completed = 0
+        self._stop_event = threading.Event()
+
+    def sample(self) -> dict:
+        sample = {
+            "time": time.monotonic(),
+            "requests": self.completed,
+            "rss_mb": rss_mb(),
+            "fds": open_fds(),
+            "python_threads": threading.active_count(),
+            "os_threads": os_threads(),
+            "live_go_sessions": self.transport.live_sessions,
+            "spool_files": len(os.listdir(self.spool_dir)),
+        }
+        self.samples.append(sample)
+        return sample
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            sample = self.sample()
+            print(" ".join(f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                           for key, value in sample.items() if key != "time"), flush=True)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+# --- Workload ---------------------------------------------------------------------------------------------------------
+
+def workload(base_url: str) -> itertools.cycle:
+    """Request mix, one entry per request: (kind, url)."""
+    return itertools.cycle([
+        ("get", f"{base_url}/bytes/1024"),
+        ("get", f"{base_url}/bytes/102400"),
+        ("get", f"{base_url}/redirect/3"),
+        ("get", f"{base_url}/cookies/5"),
+        ("stream", f"{base_url}/stream/262144"),
+        ("get", f"{base_url}/status/503"),
+        ("error", "https://127.0.0.1:1/refused"),
+        ("get", f"{base_url}/bytes/0"),
+    ])
+
+
+def check(samples: List[dict], thresholds: dict) -> List[str]:
+    """Compares the start (after warm-up) with the end of the run, returns the violated thresholds."""
+    if len(samples) < 4:
+        return []
+    steady = samples[len(samples) // 10:]
+    quarter = max(1, len(steady) // 4)
+    failures = []
+    for key, limit in thresholds.items():
+        start = statistics.median(sample[key] for sample in steady[:quarter])
+        end = statistics.median(sample[key] for sample in steady[-quarter:])
+        if end - start > limit:
+            failures.append(f"{key} grew by {end - start:.1f} (from {start:.1f} to {end:.1f}, limit {limit})")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--session-churn", type=int, default=500, help="requests per session before it is replaced")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between samples")
+    parser.add_argument("--transport", choices=("cffi", "fake"), default="cffi")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=50.0)
+    parser.add_argument("--max-fd-growth", type=float, default=20)
+    parser.add_argument("--max-thread-growth", type=float, default=10)
+    parser.add_argument("--max-session-growth", type=float, default=None,
+                        help="default: concurrency, every worker holds one live session")
+    parser.add_argument("--max-spool-files", type=float, default=5)
+    parser.add_argument("--output", help="write the samples as JSON to this file")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.transport == "fake":
+        base_url = "https://soak.local"
+        transport = SessionCountingTransport(FakeTransport(handler=fake_handler))
+    else:
+        from .server import start_server
+        server = start_server()
+        base_url = f"https://127.0.0.1:{server.server_address[1]}"
+        transport = SessionCountingTransport(get_default_transport())
+
+    # streamed responses are spooled to the working directory
+    spool_dir = tempfile.mkdtemp(prefix="tls-client-soak-")
+    os.chdir(spool_dir)
+
+    sampler = Sampler(transport, spool_dir, args.interval)
+    sampler.sample()
+    sampler.start()
+
+    requests = workload(base_url)
+    requests_lock = threading.Lock()
+    counter = itertools.count()
+    errors = {"expected": 0, "unexpected": 0}
+
+    def worker() -> None:
+        session = tls_client.Session(transport=transport)
+        handled = 0
+        while next(counter) < args.requests:
+            with requests_lock:
+                kind, url = next(requests)
+            try:
+                if kind == "stream":
+                    response = session.get(url, verify=False, stream=True)
+                    for _ in response.iter_content(64 * 1024):
+                        pass
+                else:
+                    session.get(url, verify=False)
+            except TLSClientException:
+                errors["expected" if kind == "error" else "unexpected"] += 1
+            sampler.completed += 1
+            handled += 1
+            if handled % args.session_churn == 0:
+                session.close()
+                session = tls_client.Session(transport=transport)
+        session.close()
+
+    started = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(args.concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(args.concurrency)]:
+            future.result()
+    duration = time.monotonic() - started
+
+    # give streaming threads a moment to finish before the final sample
+    time.sleep(min(args.interval, 2.0))
+    sampler.stop()
+    sampler.sample()
+    if server is not None:
+        server.shutdown()
+
+    thresholds = {
+        "rss_mb": args.max_rss_growth_mb,
+        "fds": args.max_fd_growth,
+        "os_threads": args.max_thread_growth,
+        "live_go_sessions": args.max_session_growth if args.max_session_growth is not None else args.concurrency,
+        "spool_files": args.max_spool_files,
+    }
+    failures = check(sampler.samples, thresholds)
+
+    print(f"{sampler.completed} requests in {duration:.1f}s ({sampler.completed / duration:.0f} req/s), "
+          f"errors: {errors}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "errors": errors, "samples": sampler.samples, "failures": failures}, f,
+                      indent=2)
+    for failure in failures:
+        print(f"LEAK {failure}")
+    return 1 if failures or errors["unexpected"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
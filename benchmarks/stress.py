@@ -0,0 +1,113 @@
+"""Stress test of one Session shared by many threads, meant to be run on the free-threaded build of CPython as well.
+
+Every thread sends requests with its own per-request cookie and header through the same session (with redirects),
+while another thread keeps changing the cookie jar. The in-process FakeTransport checks that every request carried
+exactly its own cookie, the client checks that every response belongs to its request, and at the end the session
+jar must hold the cookies set by the server but none of the per-request cookies. Exits with 1 on any mismatch::
+
+    python -m benchmarks.stress --threads 32 --requests 2000
+    python3.13t -X gil=0 -m benchmarks.stress --threads 64
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import threading
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tls_client  # noqa: E402
+from tls_client.cookies import create_cookie  # noqa: E402
+from tls_client.transport import FakeTransport, build_envelope  # noqa: E402
+
+
+def handler(payload: dict) -> dict:
+    path = payload["requestUrl"].split("/", 3)[-1]
+    thread, _, index = path.rpartition("/")[2].partition("-")
+    cookies = [cookie for cookie in payload["requestCookies"] if cookie["name"] == "request"]
+    headers = {key.lower(): value for key, value in payload["headers"].items()}
+    tag = f"{thread}-{index}"
+    if len(cookies) != 1 or cookies[0]["value"] != tag or headers.get("x-request") != tag:
+        return build_envelope(payload, 500, body=b"request state of another request")
+    if path.startswith("redirect/"):
+        return build_envelope(payload, 307, {"Location": f"/final/{tag}"})
+    return build_envelope(payload, 200, {"Set-Cookie": f"thread-{thread}={index}; Path=/"}, tag.encode())
+
+
+def worker(session: tls_client.Session, thread: int, requests: int, errors: List[str]) -> None:
+    for index in range(requests):
+        tag = f"{thread}-{index}"
+        path = "redirect" if index % 4 == 0 else "final"
+        try:
+            response = session.post(f"https://stress.local/{path}/{tag}", data=b"x" * 64,
+                                    cookies={"request": tag}, headers={"X-Request": tag})
+        except Exception as e:
+            errors.append(f"{tag}: {type(e).__name__}: {e}")
+            continue
+        if response.status_code != 200 or response.content != tag.encode():
+            errors.append(f"{tag}: {response.status_code} {response.content[:60]!r}")
+
+
+def churn(session: tls_client.Session, stop: threading.Event) -> int:
+    """Changes the session cookie jar while the requests are running."""
+    changes = 0
+    while not stop.is_set():
+        session.cookies.set_cookie(create_cookie("churn", str(changes), domain="stress.local"))
+        if changes % 2:
+            session.cookies.clear("stress.local", "/", "churn")
+        len(session.cookies)
+        changes += 1
+    return changes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per thread")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    errors: List[str] = []
+    stop = threading.Event()
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.threads + 1) as executor:
+        churned = executor.submit(churn, session, stop)
+        futures = [executor.submit(worker, session, thread, args.requests, errors) for thread in range(args.threads)]
+        for future in futures:
+            future.result()
+        stop.set()
+        changes = churned.result()
+    elapsed = time.perf_counter() - start
+
+    names = {cookie.name for cookie in session.cookies}
+    if "request" in names:
+        errors.append("per-request cookie ended up in the session cookie jar")
+    missing = [thread for thread in range(args.threads) if f"thread-{thread}" not in names]
+    if missing:
+        errors.append(f"cookies set by the server are missing for threads {missing[:10]}")
+    session.close()
+
+    total = args.threads * args.requests
+    result = {
+        "python": sys.version.split()[0], "gil_enabled": gil_enabled, "threads": args.threads, "requests": total,
+        "seconds": elapsed, "rps": total / elapsed, "jar_changes": changes, "errors": len(errors),
+    }
+    print(f"python {result['python']} (GIL {'enabled' if gil_enabled else 'disabled'}), {args.threads} threads: "
+          f"{total} requests in {elapsed:.2f}s ({result['rps']:.0f} req/s), {changes} jar changes, "
+          f"{len(errors)} errors")
+    for error in errors[:20]:
+        print(f"  {error}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
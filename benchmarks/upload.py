@@ -0,0 +1,127 @@
+"""Peak RSS of multipart uploads, a hand built ``bytes`` body (``data=``) against the streaming encoder (``files=``).
+
+Every mode runs in its own process since the peak RSS of a process never decreases. The default transport discards
+the request payload, so only the Python side is measured; ``--transport cffi`` uploads to the local benchmark server
+and includes the copies made by the shared library::
+
+    python -m benchmarks.upload --size-mb 100
+    python -m benchmarks.upload --size-mb 100 --transport cffi
+"""
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MB = 1024 * 1024
+
+MODES = ("baseline", "bytes", "files")
+
+
+def worker(mode: str, path: str, transport_name: str, base_url: Optional[str]) -> dict:
+    sys.path.insert(0, ROOT_DIR)
+    import tls_client
+    from tls_client.transport import Transport, get_default_transport
+
+    from .run import peak_rss_mb
+
+    class DiscardTransport(Transport):
+        """Accepts the payload like the shared library would, without keeping or decoding it."""
+
+        def request(self, payload) -> bytes:
+            self.payload_size = len(payload)
+            return json.dumps({
+                "id": "discard", "status": 200, "target": base_url, "headers": {}, "cookies": {}, "body": "data:;base64,"
+            }).encode()
+
+        def destroy_session(self, payload: bytes) -> bytes:
+            return json.dumps({"id": "discard", "success": True}).encode()
+
+    transport = DiscardTransport() if transport_name == "discard" else get_default_transport()
+    session = tls_client.Session(transport=transport)
+    url = f"{base_url}/upload"
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == "bytes":
+        # the way uploads had to be built before files= existed
+        boundary = uuid.uuid4().hex
+        with open(path, "rb") as f:
+            body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"upload.bin\"\r\n\r\n"
+                    .encode() + f.read() + f"\r\n--{boundary}--\r\n".encode())
+        session.post(url, data=body, verify=False,
+                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        del body
+    elif mode == "files":
+        session.post(url, files={"file": pathlib.Path(path)}, verify=False)
+    elapsed = time.perf_counter() - start
+    session.close()
+
+    return {"mode": mode, "seconds": elapsed, "peak_rss_mb": peak_rss_mb(), "rss_before_mb": baseline}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--transport", choices=("discard", "cffi"), default="discard")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        spec = json.loads(args.worker)
+        print(json.dumps(worker(spec["mode"], spec["path"], spec["transport"], spec["base_url"])))
+        return 0
+
+    server = None
+    base_url = "https://upload.local"
+    if args.transport == "cffi":
+        from .server import start_server
+        server = start_server()
+        base_url = f"https://127.0.0.1:{server.server_address[1]}"
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="tls-client-upload-") as directory:
+        path = os.path.join(directory, "upload.bin")
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(MB))
+
+        for mode in MODES:
+            spec = {"mode": mode, "path": path, "transport": args.transport, "base_url": base_url}
+            process = subprocess.run(
+                [sys.executable, "-m", "benchmarks.upload", "--worker", json.dumps(spec)],
+                cwd=ROOT_DIR, capture_output=True, text=True,
+            )
+            if process.returncode != 0:
+                print(f"{mode}: failed: {process.stderr.strip().splitlines()[-1:]}", file=sys.stderr)
+                continue
+            results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+    if server is not None:
+        server.shutdown()
+
+    from .run import format_mb
+
+    baseline = next((result["peak_rss_mb"] for result in results if result["mode"] == "baseline"), 0.0)
+    print(f"{'mode':<10}{'peak RSS MB':>13}{'over baseline':>15}{'seconds':>9}")
+    for result in results:
+        peak = result["peak_rss_mb"]
+        # peak RSS isn't available on Windows
+        over = peak - baseline if peak is not None and baseline is not None else None
+        print(f"{result['mode']:<10}{format_mb(peak, 13)}{format_mb(over, 15)}{result['seconds']:>9.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"size_mb": args.size_mb, "transport": args.transport, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
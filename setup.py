@@ -27,7 +27,7 @@ setup(
     license=about["__license__"],
     long_description=readme,
     long_description_content_type="text/markdown",
-    packages=find_packages(),
+    packages=find_packages(exclude=("tests", "tests.*", "benchmarks", "benchmarks.*")),
     include_package_data=True,
     package_data={
         '': ['*'],
@@ -0,0 +1,52 @@
+import threading
+
+import tls_client
+from tls_client.coalescing import RequestCoalescer
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def test_concurrent_identical_requests_are_sent_once():
+    transport = FakeTransport(handler=lambda payload: build_envelope(payload, 200, body=b"config"), latency=0.2)
+    session = tls_client.Session(transport=transport)
+    session.coalescer = RequestCoalescer()
+
+    barrier = threading.Barrier(8)
+    responses = []
+
+    def get():
+        barrier.wait()
+        responses.append(session.get("https://config.example.com/"))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert transport.requests == 1
+    assert [response.content for response in responses] == [b"config"] * 8
+    # every caller gets its own response object
+    assert len({id(response) for response in responses}) == 8
+
+
+def test_requests_with_a_body_are_not_coalesced():
+    transport = FakeTransport(latency=0.05)
+    session = tls_client.Session(transport=transport)
+    session.coalescer = RequestCoalescer()
+
+    threads = [threading.Thread(target=session.post, args=("https://api.example.com/",), kwargs={"data": "x"})
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert transport.requests == 4
+
+
+def test_hosts_outside_the_allow_list_are_not_coalesced():
+    coalescer = RequestCoalescer(hosts=["config.example.com"])
+
+    assert coalescer.should_coalesce("GET", "https://config.example.com/a")
+    assert not coalescer.should_coalesce("GET", "https://other.example.com/a")
+    assert not coalescer.should_coalesce("POST", "https://config.example.com/a")
@@ -0,0 +1,40 @@
+import base64
+import gzip
+
+import tls_client
+from tls_client.compression import RequestCompressor
+from tls_client.structures import CaseInsensitiveDict
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def test_large_bodies_are_compressed():
+    requests = []
+
+    def handler(payload):
+        requests.append((payload["headers"].get("Content-Encoding"), base64.b64decode(payload["requestBody"])))
+        return build_envelope(payload, 200)
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.compressor = RequestCompressor("gzip", threshold=100)
+    body = b"event," * 1000
+
+    session.post("https://ingest.example.com/", data=body)
+    session.post("https://ingest.example.com/", data=b"small")
+
+    assert requests[0][0] == "gzip"
+    assert gzip.decompress(requests[0][1]) == body
+    assert requests[1] == (None, b"small")
+
+
+def test_hosts_and_overrides():
+    compressor = RequestCompressor("gzip", threshold=0, hosts=["ingest.example.com"])
+    compressor.configure_host("deflate.example.com", encoding="deflate")
+    headers = CaseInsensitiveDict()
+
+    assert compressor.compress("POST", "https://ingest.example.com/", headers, b"x")[1] == "gzip"
+    assert compressor.compress("POST", "https://deflate.example.com/", headers, b"x")[1] == "deflate"
+    assert compressor.compress("POST", "https://other.example.com/", headers, b"x") == (b"x", None)
+    assert compressor.compress("GET", "https://ingest.example.com/", headers, b"x") == (b"x", None)
+    # bodies which are encoded already are sent as they are
+    encoded = CaseInsensitiveDict({"Content-Encoding": "br"})
+    assert compressor.compress("POST", "https://ingest.example.com/", encoded, b"x") == (b"x", None)
@@ -0,0 +1,81 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import tls_client
+from tls_client.exceptions import TLSClientConnectionRefused, TLSClientDeadlineExceeded
+from tls_client.retry import Retry
+from tls_client.timeouts import Deadline
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def error_envelope(payload, message):
+    return {"id": "fake", "sessionId": payload["sessionId"], "status": 0, "target": "", "headers": None,
+            "cookies": None, "body": message}
+
+
+def payload_timeout(payload):
+    if "timeoutMilliseconds" in payload:
+        return payload["timeoutMilliseconds"] / 1000
+    return payload["timeoutSeconds"]
+
+
+def test_deadline_caps_the_timeout():
+    deadline = Deadline(1.0)
+
+    assert deadline.timeout(30) <= 1.0
+    assert deadline.timeout(0.5) == 0.5
+    assert not deadline.expired()
+    with pytest.raises(TLSClientDeadlineExceeded):
+        Deadline(-1).timeout(30)
+
+
+def test_deadline_at_an_absolute_time():
+    deadline = Deadline.coerce(datetime.now(timezone.utc) + timedelta(seconds=2))
+
+    assert 1.5 < deadline.remaining() <= 2.0
+    assert Deadline.coerce(deadline) is deadline
+
+
+def test_request_timeout_is_capped_by_the_deadline():
+    timeouts = []
+
+    def handler(payload):
+        timeouts.append(payload_timeout(payload))
+        return build_envelope(payload, 200)
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.get("https://api.example.com/", timeout=30, deadline=0.5)
+
+    assert 0 < timeouts[0] <= 0.5
+
+
+def test_retries_stop_at_the_deadline():
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        return error_envelope(payload, "dial tcp 127.0.0.1:443: connect: connection refused")
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.retry = Retry(total=5, backoff_factor=1, jitter=False, budget=None)
+
+    start = time.perf_counter()
+    with pytest.raises(TLSClientDeadlineExceeded) as info:
+        session.get("https://api.example.com/", deadline=0.2)
+    assert time.perf_counter() - start < 0.2
+    assert isinstance(info.value.__cause__, TLSClientConnectionRefused)
+    assert len(calls) == 1
+
+
+def test_timeout_after_the_deadline_is_reported_as_deadline_exceeded():
+    def handler(payload):
+        time.sleep(payload_timeout(payload))
+        return error_envelope(payload, "context deadline exceeded (Client.Timeout exceeded while awaiting headers)")
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+
+    with pytest.raises(TLSClientDeadlineExceeded):
+        session.get("https://api.example.com/", deadline=0.05)
+
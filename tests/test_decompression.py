@@ -0,0 +1,56 @@
+import gzip
+import zlib
+
+import pytest
+
+import tls_client
+from tls_client.compression import brotli, iter_decoded, parse_content_encoding
+from tls_client.exceptions import TLSClientException
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def chunked(data, size=1):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+def test_parse_content_encoding():
+    assert parse_content_encoding("gzip, br") == ["gzip", "br"]
+    assert parse_content_encoding(["identity"]) == []
+    assert parse_content_encoding(None) == []
+
+
+@pytest.mark.parametrize("coding, encoded", [
+    ("gzip", gzip.compress(b"hello world" * 100)),
+    ("deflate", zlib.compress(b"hello world" * 100)),
+])
+def test_bodies_are_decoded_over_small_chunks(coding, encoded):
+    assert b"".join(iter_decoded(chunked(encoded), [coding])) == b"hello world" * 100
+
+
+@pytest.mark.parametrize("coding", [
+    "gzip", "deflate", pytest.param("br", marks=pytest.mark.skipif(brotli is None, reason="needs brotli"))
+])
+def test_bodies_which_are_not_encoded_pass_through(coding):
+    # e.g. already decoded by the shared library
+    assert b"".join(iter_decoded(chunked(b"plain text body"), [coding])) == b"plain text body"
+
+
+def test_corrupt_gzip_raises():
+    encoded = gzip.compress(b"hello world" * 100)
+    corrupt = encoded[:20] + bytes(100) + encoded[120:]
+
+    with pytest.raises(TLSClientException):
+        b"".join(iter_decoded(chunked(corrupt, 16), ["gzip"]))
+
+
+def test_lazy_decompression_decodes_on_access():
+    encoded = gzip.compress(b'{"ok": true}')
+    session = tls_client.Session(
+        transport=FakeTransport(handler=lambda payload: build_envelope(payload, 200, {"Content-Encoding": "gzip"},
+                                                                        encoded)),
+        lazy_decompression=True,
+    )
+    response = session.get("https://api.example.com/")
+
+    assert response.raw_bytes == encoded
+    assert response.json() == {"ok": True}
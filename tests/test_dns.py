@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+import tls_client
+from tls_client.dns import DNSCache, format_local_address, is_ip_address
+from tls_client.exceptions import TLSClientDeadlineExceeded
+from tls_client.timeouts import Deadline
+from tls_client.transport import FakeTransport, build_envelope
+
+
+class Resolver:
+    def __init__(self, addresses, delay=0.0):
+        self.addresses = addresses
+        self.delay = delay
+        self.lookups = []
+
+    def __call__(self, host):
+        self.lookups.append(host)
+        time.sleep(self.delay)
+        return list(self.addresses)
+
+
+def test_requests_connect_to_the_cached_address():
+    payloads = []
+    session = tls_client.Session(transport=FakeTransport(
+        handler=lambda payload: payloads.append(payload) or build_envelope(payload, 200)
+    ))
+    resolver = Resolver(["203.0.113.7"])
+    session.dns_cache = DNSCache(resolver=resolver)
+
+    response = session.get("https://api.example.com/path?q=1")
+    session.get("https://API.example.com/other")
+
+    assert resolver.lookups == ["api.example.com"]
+    assert payloads[0]["requestUrl"] == "https://203.0.113.7/path?q=1"
+    assert payloads[0]["serverNameOverwrite"] == "api.example.com"
+    assert payloads[0]["requestHostOverride"] == "api.example.com"
+    # the response reports the url which was requested
+    assert response.url == "https://api.example.com/path?q=1"
+    assert session.dns_cache.hits == 1
+
+
+def test_requests_through_a_proxy_are_not_pinned():
+    payloads = []
+    session = tls_client.Session(transport=FakeTransport(
+        handler=lambda payload: payloads.append(payload) or build_envelope(payload, 200)
+    ))
+    session.dns_cache = DNSCache(resolver=Resolver(["203.0.113.7"]))
+
+    session.get("https://api.example.com/", proxy="http://proxy:8080")
+
+    assert payloads[0]["requestUrl"] == "https://api.example.com/"
+
+
+def test_failed_lookups_are_cached_for_the_negative_ttl():
+    resolver = Resolver([])
+    cache = DNSCache(resolver=resolver, negative_ttl=30)
+
+    assert cache.lookup("missing.example.com") is None
+    assert cache.lookup("missing.example.com") is None
+    assert resolver.lookups == ["missing.example.com"]
+
+
+def test_pinned_and_ip_hosts_are_not_resolved():
+    resolver = Resolver(["203.0.113.7"])
+    cache = DNSCache(resolver=resolver)
+    cache.pin("login.example.com", "198.51.100.1")
+
+    assert cache.lookup("login.example.com") == "198.51.100.1"
+    assert cache.lookup("192.0.2.1") is None
+    assert resolver.lookups == []
+
+
+def test_address_family_is_respected():
+    cache = DNSCache(resolver=Resolver(["2001:db8::1", "203.0.113.7"]))
+
+    assert cache.lookup("api.example.com") == "2001:db8::1"
+    assert cache.lookup("api.example.com", ipv6=False) == "203.0.113.7"
+
+
+def test_lookup_respects_the_deadline():
+    cache = DNSCache(resolver=Resolver(["203.0.113.7"], delay=0.5))
+
+    start = time.perf_counter()
+    with pytest.raises(TLSClientDeadlineExceeded):
+        cache.lookup("slow.example.com", deadline=Deadline(0.05))
+    assert time.perf_counter() - start < 0.3
+
+
+def test_helpers():
+    assert is_ip_address("[2001:db8::1]")
+    assert not is_ip_address("example.com")
+    assert format_local_address("192.0.2.1") == "192.0.2.1:0"
+    assert format_local_address("2001:db8::1") == "[2001:db8::1]:0"
+    assert format_local_address(None) is None
@@ -0,0 +1,46 @@
+import pytest
+
+from tls_client.exceptions import (
+    TLSClientConnectionRefused, TLSClientConnectionReset, TLSClientDNSError, TLSClientException, TLSClientProxyError,
+    TLSClientTimeout, TLSClientTLSError, classify_error
+)
+
+
+@pytest.mark.parametrize("message, expected", [
+    ('failed to do request: Get "https://api.example.com/": dial tcp 203.0.113.7:443: connect: connection refused',
+     TLSClientConnectionRefused),
+    ('failed to do request: Get "https://api.example.com/": context deadline exceeded (Client.Timeout exceeded '
+     'while awaiting headers)', TLSClientTimeout),
+    ('failed to do request: Get "https://api.example.com/": dial tcp: lookup api.example.com on 127.0.0.53:53: '
+     'no such host', TLSClientDNSError),
+    ('failed to do request: Get "https://api.example.com/": tls: failed to verify certificate: x509: certificate '
+     'signed by unknown authority', TLSClientTLSError),
+    ('failed to do request: Get "https://api.example.com/": proxyconnect tcp: dial tcp 198.51.100.1:8080: connect: '
+     'connection refused', TLSClientProxyError),
+    ('failed to do request: Get "https://api.example.com/": EOF', TLSClientConnectionReset),
+    ("something unexpected", TLSClientException),
+])
+def test_errors_are_classified(message, expected):
+    assert type(classify_error(message)) is expected
+
+
+@pytest.mark.parametrize("message, expected", [
+    # the url and hostnames of the request contain the patterns of other errors
+    ('failed to do request: Post "https://dns-api.example.com/x": read tcp 10.0.0.2:51234->203.0.113.7:443: read: '
+     'connection reset by peer', TLSClientConnectionReset),
+    ('failed to do request: Get "https://api.example.com/v1/certificates": EOF', TLSClientConnectionReset),
+    ('failed to do request: Get "https://geofence.example.com/": dial tcp 203.0.113.7:443: connect: connection '
+     'refused', TLSClientConnectionRefused),
+    ('failed to do request: Get "https://proxy.example.com/timeout": EOF', TLSClientConnectionReset),
+    ('failed to do request: Get "https://timeout.example.com/": dial tcp: lookup timeout.example.com on '
+     '127.0.0.53:53: no such host', TLSClientDNSError),
+    ("Get https://handshake.example.com/eof: connection refused", TLSClientConnectionRefused),
+])
+def test_the_request_url_is_not_matched(message, expected):
+    assert type(classify_error(message)) is expected
+
+
+def test_the_message_is_kept():
+    message = 'failed to do request: Get "https://api.example.com/": EOF'
+
+    assert str(classify_error(message)) == message
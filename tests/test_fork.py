@@ -0,0 +1,71 @@
+import tls_client
+from tls_client.cookies import RequestsCookieJar, create_cookie
+from tls_client.structures import CaseInsensitiveDict
+from tls_client.transport import FakeTransport
+
+
+def test_cookie_jar_fork_is_copy_on_write():
+    jar = RequestsCookieJar()
+    jar.set("sid", "parent", domain="example.com", path="/")
+    forked = jar.fork()
+
+    # the cookies are shared until either jar is changed
+    assert forked._cookies is jar._cookies
+    assert forked.get("sid") == "parent"
+
+    forked.set_cookie(create_cookie("sid", "fork", domain="example.com", path="/"))
+    forked.set("extra", "1", domain="example.com", path="/")
+    assert jar.get("sid") == "parent"
+    assert "extra" not in jar
+    assert forked.get("sid") == "fork"
+
+    jar.clear()
+    assert len(jar) == 0
+    assert len(forked) == 2
+
+
+def test_changing_the_parent_jar_does_not_change_the_fork():
+    jar = RequestsCookieJar()
+    jar.set("sid", "parent", domain="example.com", path="/")
+    forked = jar.fork()
+
+    jar.set("sid", "changed", domain="example.com", path="/")
+    assert forked.get("sid") == "parent"
+
+
+def test_case_insensitive_dict_fork_is_copy_on_write():
+    headers = CaseInsensitiveDict({"User-Agent": "parent", "Accept": "*/*"})
+    forked = headers.fork()
+    assert forked._store is headers._store
+
+    forked["user-agent"] = "fork"
+    del forked["Accept"]
+    assert headers == {"User-Agent": "parent", "Accept": "*/*"}
+    assert forked == {"User-Agent": "fork"}
+
+    headers["X-Parent"] = "1"
+    assert "X-Parent" not in forked
+
+
+def test_session_fork_diverges_from_the_parent():
+    transport = FakeTransport()
+    transport.add_response("https://app.example.com/login", headers={"Set-Cookie": "sid=fork; Path=/"})
+    session = tls_client.Session(transport=transport)
+    session.headers["X-Team"] = "parent"
+    session.cookies.set("theme", "dark", domain="app.example.com", path="/")
+    session.params["lang"] = "en"
+
+    forked = session.fork()
+    assert forked._session_id != session._session_id
+    assert forked.transport is session.transport
+    assert forked.headers["X-Team"] == "parent"
+    assert forked.cookies.get("theme") == "dark"
+
+    forked.get("https://app.example.com/login")
+    forked.headers["X-Team"] = "fork"
+    forked.params["lang"] = "de"
+
+    assert forked.cookies.get("sid") == "fork"
+    assert "sid" not in session.cookies
+    assert session.headers["X-Team"] == "parent"
+    assert session.params == {"lang": "en"}
@@ -0,0 +1,61 @@
+import time
+
+import tls_client
+from tls_client.hedging import Hedger
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def test_slow_request_is_hedged_on_a_separate_session():
+    primary = []
+
+    def handler(payload):
+        if not primary:
+            # the first attempt hangs, the hedge is answered right away
+            primary.append(payload["sessionId"])
+            time.sleep(0.5)
+            return build_envelope(payload, 200, body=b"primary")
+        return build_envelope(payload, 200, body=payload["sessionId"].encode())
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.hedger = Hedger(delay=0.05, percentile=None, max_hedge_ratio=1.0)
+    start = time.perf_counter()
+    response = session.get("https://api.example.com/")
+
+    assert time.perf_counter() - start < 0.4
+    assert response.content == session._hedge_session_id.encode()
+    assert primary == [session._session_id]
+    assert session.hedger.hedged == 1
+    assert session.hedger.hedge_wins == 1
+
+
+def test_fast_request_is_not_hedged():
+    transport = FakeTransport()
+    session = tls_client.Session(transport=transport)
+    session.hedger = Hedger(delay=0.5, percentile=None, max_hedge_ratio=1.0)
+
+    assert session.get("https://api.example.com/").status_code == 200
+    assert transport.requests == 1
+    assert session.hedger.hedged == 0
+
+
+def test_only_idempotent_methods_are_hedged():
+    hedger = Hedger(delay=0.05, percentile=None)
+
+    assert hedger.should_hedge("GET")
+    assert not hedger.should_hedge("POST")
+
+
+def test_hedge_proxies_rotate():
+    hedger = Hedger(delay=0.05, proxies=["http://proxy-2:8080", "http://proxy-3:8080"])
+
+    assert [hedger.hedge_proxy("http://proxy-1:8080") for _ in range(3)] == [
+        "http://proxy-2:8080", "http://proxy-3:8080", "http://proxy-2:8080"
+    ]
+
+
+def test_learned_delay_follows_the_latency_percentile():
+    hedger = Hedger(delay=1.0, percentile=0.5, min_samples=10, min_delay=0.0)
+    for _ in range(20):
+        hedger.record_latency(0.2)
+
+    assert abs(hedger.hedge_delay() - 0.2) < 0.05
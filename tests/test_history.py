@@ -0,0 +1,69 @@
+import tls_client
+from tls_client.response import RequestRecord
+from tls_client.transport import FakeTransport
+
+
+def redirect_chain(hops):
+    transport = FakeTransport()
+    for hop in range(hops):
+        transport.add_response(f"https://app.example.com/{hop}", status=302, headers={"Location": f"/{hop + 1}"},
+                               body=f"hop {hop}".encode())
+    transport.add_response(f"https://app.example.com/{hops}", body=b"final")
+    return tls_client.Session(transport=transport)
+
+
+def test_request_record_references_the_request_as_given():
+    session = tls_client.Session(transport=FakeTransport())
+    body = b"x" * 1024
+
+    response = session.post("https://api.example.com/upload", data=body, headers={"X-Upload": "1"})
+    record = response.request
+
+    assert isinstance(record, RequestRecord)
+    assert (record.method, record.url) == ("POST", "https://api.example.com/upload")
+    assert record.headers["X-Upload"] == "1"
+    assert record.body is body
+    assert response.request is record
+
+
+def test_every_hop_records_its_own_request():
+    response = redirect_chain(2).get("https://app.example.com/0")
+
+    assert [hop.request.url for hop in response.history] == ["https://app.example.com/0", "https://app.example.com/1"]
+    assert response.request.url == "https://app.example.com/2"
+
+
+def test_max_history_keeps_the_most_recent_hops():
+    session = redirect_chain(5)
+    session.max_history = 2
+
+    response = session.get("https://app.example.com/0")
+
+    assert response.content == b"final"
+    assert [hop.url for hop in response.history] == ["https://app.example.com/3", "https://app.example.com/4"]
+    # the hops which dropped out of the history are released, earlier hops don't keep them either
+    assert all(len(hop.history) <= 2 for hop in response.history)
+
+
+def test_max_history_zero_keeps_no_hops():
+    session = redirect_chain(3)
+    session.max_history = 0
+
+    assert session.get("https://app.example.com/0").history == []
+
+
+def test_history_bodies_are_kept_by_default():
+    response = redirect_chain(2).get("https://app.example.com/0")
+
+    assert [hop.content for hop in response.history] == [b"hop 0", b"hop 1"]
+
+
+def test_history_bodies_can_be_dropped():
+    session = redirect_chain(2)
+    session.keep_history_bodies = False
+
+    response = session.get("https://app.example.com/0")
+
+    assert [hop.content for hop in response.history] == [b"", b""]
+    assert [hop.status_code for hop in response.history] == [302, 302]
+    assert response.content == b"final"
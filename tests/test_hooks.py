@@ -0,0 +1,70 @@
+import pytest
+
+import tls_client
+from tls_client.exceptions import TLSClientConnectionRefused
+from tls_client.hooks import HOOKS, default_hooks
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def make_session():
+    transport = FakeTransport()
+    transport.add_response("https://example.com/start", 302, {"Location": "/end"})
+    transport.add_response("https://example.com/end", 200, body=b"done")
+    return tls_client.Session(transport=transport)
+
+
+def test_default_hooks():
+    assert default_hooks() == {event: [] for event in HOOKS}
+
+
+def test_hooks_see_every_hop():
+    session = make_session()
+    events = []
+    session.hooks["on_request"].append(lambda payload: events.append(("request", payload["requestUrl"])))
+    session.hooks["on_response"].append(lambda response: events.append(("response", response.status_code)))
+    session.hooks["on_redirect"].append(lambda response, url: events.append(("redirect", url)))
+
+    assert session.get("https://example.com/start").content == b"done"
+    assert events == [
+        ("request", "https://example.com/start"),
+        ("response", 302),
+        ("redirect", "https://example.com/end"),
+        ("request", "https://example.com/end"),
+        ("response", 200),
+    ]
+
+
+def test_on_error_gets_the_typed_exception():
+    session = tls_client.Session(transport=FakeTransport(handler=lambda payload: {
+        "id": "fake", "sessionId": payload["sessionId"], "status": 0, "target": "", "headers": None,
+        "cookies": None, "body": "dial tcp 203.0.113.7:443: connect: connection refused",
+    }))
+    errors = []
+    session.hooks["on_error"].append(lambda error, payload: errors.append((error, payload["requestUrl"])))
+
+    with pytest.raises(TLSClientConnectionRefused) as info:
+        session.get("https://example.com/")
+    assert errors == [(info.value, "https://example.com/")]
+
+
+def test_hooks_can_modify_the_request_payload():
+    payloads = []
+    session = tls_client.Session(transport=FakeTransport(
+        handler=lambda payload: payloads.append(payload) or build_envelope(payload, 200)
+    ))
+    session.hooks["on_request"].append(lambda payload: payload["headers"].update({"X-Trace": "1"}))
+
+    session.get("https://example.com/")
+
+    assert payloads[0]["headers"]["X-Trace"] == "1"
+
+
+def test_timings_cover_every_phase():
+    response = make_session().get("https://example.com/end")
+
+    phases = ("build_payload", "encode", "transport", "decode", "cookies", "build_response")
+    assert all(response.timings[phase] >= 0 for phase in phases)
+    assert response.timings["total"] == sum(response.timings[phase] for phase in phases)
+    assert response.elapsed.total_seconds() > 0
+    assert response.request_size > 0
+    assert response.response_size > 0
@@ -0,0 +1,129 @@
+import threading
+import time
+from json import loads
+
+import tls_client
+from tls_client.lifecycle import SessionRegistry
+from tls_client.transport import FakeTransport, build_envelope
+
+
+class DestroyRecordingTransport(FakeTransport):
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.destroyed = []
+
+    def destroy_session(self, payload: bytes) -> bytes:
+        self.destroyed.append(loads(payload)["sessionId"])
+        return super().destroy_session(payload)
+
+
+def make_session(registry, transport):
+    session = tls_client.Session(transport=transport)
+    session.registry = registry
+    return session
+
+
+def test_least_recently_used_session_is_evicted():
+    registry = SessionRegistry(max_sessions=2)
+    transport = DestroyRecordingTransport()
+    first, second, third = (make_session(registry, transport) for _ in range(3))
+
+    first.get("https://api.example.com/")
+    second.get("https://api.example.com/")
+    first.get("https://api.example.com/")
+    third.get("https://api.example.com/")
+
+    assert transport.destroyed == [second._session_id]
+    assert registry.evicted == 1
+    assert registry.live_sessions == 2
+    # an evicted session keeps working, its Go state is recreated by the next request
+    assert second.get("https://api.example.com/").status_code == 200
+    assert transport.destroyed == [second._session_id, first._session_id]
+
+
+def test_idle_sessions_are_reaped():
+    registry = SessionRegistry(idle_ttl=0.05, reap_interval=0.02)
+    transport = DestroyRecordingTransport()
+    session = make_session(registry, transport)
+    try:
+        session.get("https://api.example.com/")
+        deadline = time.monotonic() + 2
+        while not registry.reaped and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert registry.reaped == 1
+        assert registry.live_sessions == 0
+        assert transport.destroyed == [session._session_id]
+    finally:
+        registry.shutdown()
+
+
+def test_extra_go_sessions_count_towards_the_limit():
+    registry = SessionRegistry(max_sessions=2)
+    transport = DestroyRecordingTransport()
+    first, second = make_session(registry, transport), make_session(registry, transport)
+
+    first.get("https://api.example.com/")
+    registry.acquire(first)
+    registry.add_go_session(first, f"{first._session_id}-hedge")
+    registry.release(first)
+    assert registry.live_sessions == 2
+
+    second.get("https://api.example.com/")
+    assert registry.live_sessions == 1
+    assert transport.destroyed == [first._session_id]
+
+
+def test_closing_a_session_while_the_registry_lock_is_held_does_not_deadlock():
+    # Session.__del__ closes the session, the garbage collector may run it while the same thread holds the lock
+    registry = SessionRegistry()
+    session = make_session(registry, FakeTransport())
+    session.get("https://api.example.com/")
+    closed = threading.Event()
+
+    def close_under_lock():
+        with registry._lock:
+            session.close()
+        closed.set()
+
+    threading.Thread(target=close_under_lock, daemon=True).start()
+
+    assert closed.wait(2)
+    assert registry.live_sessions == 0
+
+
+def test_go_state_is_destroyed_without_the_lock_and_requests_of_the_session_wait_for_it():
+    registry = SessionRegistry(max_sessions=1)
+    events = []
+    destroying = threading.Event()
+
+    class SlowDestroyTransport(FakeTransport):
+        def destroy_session(self, payload: bytes) -> bytes:
+            if loads(payload)["sessionId"] == first._session_id:
+                events.append(("destroy", registry._lock.locked()))
+                destroying.set()
+                time.sleep(0.2)
+                events.append(("destroyed", registry._lock.locked()))
+            return super().destroy_session(payload)
+
+    def handler(payload):
+        if payload["sessionId"] == first._session_id:
+            events.append(("request", None))
+        return build_envelope(payload)
+
+    transport = SlowDestroyTransport(handler=handler)
+    first, second = make_session(registry, transport), make_session(registry, transport)
+    first.get("https://api.example.com/")
+    events.clear()
+
+    def request_during_eviction():
+        destroying.wait(2)
+        first.get("https://api.example.com/")
+
+    thread = threading.Thread(target=request_during_eviction)
+    thread.start()
+    second.get("https://api.example.com/")
+    thread.join(2)
+
+    assert events == [("destroy", False), ("destroyed", False), ("request", None)]
@@ -0,0 +1,143 @@
+import gc
+import json
+import threading
+import weakref
+
+import pytest
+
+import tls_client
+from tls_client.exceptions import TLSClientConnectionRefused
+from tls_client.metrics import LatencyHistogram, MetricsCollector
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def test_histogram_percentiles_are_within_the_precision():
+    histogram = LatencyHistogram(precision_bits=7)
+    for value in range(1, 10_001):
+        histogram.record(value)
+
+    assert histogram.count == 10_000
+    assert histogram.min == 1
+    assert histogram.max == 10_000
+    assert histogram.percentile(50) == pytest.approx(5_000, rel=0.016)
+    assert histogram.percentile(99) == pytest.approx(9_900, rel=0.016)
+    assert histogram.percentile(100) == 10_000
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_histogram_merge_equals_recording_everything():
+    left, right, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for value in range(0, 5_000, 7):
+        left.record(value)
+        combined.record(value)
+    for value in range(3_000, 90_000, 13):
+        right.record(value)
+        combined.record(value)
+
+    merged = LatencyHistogram().merge(left).merge(right)
+
+    assert merged.to_dict() == combined.to_dict()
+    assert [merged.percentile(p) for p in (10, 50, 90, 99)] == [combined.percentile(p) for p in (10, 50, 90, 99)]
+    with pytest.raises(ValueError):
+        merged.merge(LatencyHistogram(precision_bits=5))
+
+
+def test_histogram_round_trips_through_json():
+    histogram = LatencyHistogram()
+    for value in (5, 500, 50_000):
+        histogram.record(value)
+
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+
+    assert restored.to_dict() == histogram.to_dict()
+    assert histogram.cumulative_counts([10, 1_000, 100_000]) == [1, 2, 3]
+
+
+def make_session(handler):
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.metrics = MetricsCollector()
+    return session
+
+
+def test_requests_are_recorded_per_host():
+    statuses = {"/ok": 200, "/missing": 404}
+
+    def handler(payload):
+        path = "/" + payload["requestUrl"].split("/", 3)[3]
+        if path == "/down":
+            return {"id": "fake", "sessionId": payload["sessionId"], "status": 0, "target": "", "headers": None,
+                    "cookies": None, "body": "dial tcp 203.0.113.7:443: connect: connection refused"}
+        if path == "/redirect":
+            return build_envelope(payload, 302, {"Location": "/ok"})
+        return build_envelope(payload, statuses[path], body=b"x" * 100)
+
+    session = make_session(handler)
+    session.get("https://api.example.com/ok")
+    session.get("https://api.example.com/missing")
+    session.get("https://api.example.com/redirect")
+    session.post("https://api.example.com/ok", data=b"y" * 50)
+    with pytest.raises(TLSClientConnectionRefused):
+        session.get("https://api.example.com/down")
+
+    metrics = session.metrics.snapshot()["api.example.com"]
+    assert metrics["requests"] == 6
+    assert metrics["status_classes"] == {"2xx": 3, "4xx": 1, "3xx": 1}
+    assert metrics["errors"] == {"TLSClientConnectionRefused": 1}
+    assert metrics["redirects"] == 1
+    assert metrics["in_flight"] == 0
+    assert metrics["latency_us"]["count"] == 6
+    # body bytes, not the size of the payloads crossing the FFI
+    assert metrics["bytes_in"] == 400
+    assert metrics["bytes_out"] == 50
+
+
+def test_spilled_bodies_count_as_received_bytes():
+    session = make_session(lambda payload: build_envelope(payload, 200, body=b"x" * 10_000))
+    session.spill_threshold = 1024
+
+    assert session.get("https://files.example.com/").spilled
+    assert session.metrics.snapshot()["files.example.com"]["bytes_in"] == 10_000
+
+
+def test_shards_of_exited_threads_are_merged():
+    collector = MetricsCollector()
+
+    def record():
+        for _ in range(10):
+            collector.request_finished(collector.request_started("https://api.example.com/"), 1_000_000)
+
+    threads = [threading.Thread(target=record) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gc.collect()
+
+    assert len(collector._shards) <= 1
+    assert collector.snapshot()["api.example.com"]["requests"] == 200
+    assert collector.histogram("API.example.com").count == 200
+
+
+def test_threads_do_not_keep_the_collector_alive():
+    collector = MetricsCollector()
+    collector.request_started("https://api.example.com/")
+    reference = weakref.ref(collector)
+
+    del collector
+    gc.collect()
+
+    assert reference() is None
+
+
+def test_openmetrics_export():
+    collector = MetricsCollector(export_buckets=(0.01, 0.1))
+    host = collector.request_started("https://api.example.com/")
+    collector.request_finished(host, 50_000_000)
+
+    text = collector.to_openmetrics()
+
+    assert 'tls_client_requests_total{host="api.example.com"} 1' in text
+    assert 'tls_client_request_duration_seconds_bucket{host="api.example.com",le="0.01"} 0' in text
+    assert 'tls_client_request_duration_seconds_bucket{host="api.example.com",le="0.1"} 1' in text
+    assert 'tls_client_request_duration_seconds_count{host="api.example.com"} 1' in text
+    assert text.endswith("# EOF\n")
@@ -0,0 +1,74 @@
+import base64
+import io
+import json
+from email.parser import BytesParser
+
+import pytest
+
+import tls_client
+from tls_client.multipart import MultipartEncoder
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def parse(content_type, body):
+    message = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+    return [
+        (part.get_param("name", header="content-disposition"), part.get_filename(), part.get("Content-Type"),
+         part.get_payload(decode=True))
+        for part in message.get_payload()
+    ]
+
+
+def make_session():
+    requests = []
+
+    def handler(payload):
+        requests.append((payload["headers"]["Content-Type"], base64.b64decode(payload["requestBody"])))
+        return build_envelope(payload, 200)
+
+    return tls_client.Session(transport=FakeTransport(handler=handler)), requests
+
+
+def test_files_and_fields_are_sent_as_multipart(tmp_path):
+    path = tmp_path / "report.csv"
+    path.write_bytes(b"a,b\n1,2\n")
+    session, requests = make_session()
+
+    session.post("https://upload.example.com/", data={"name": "report"}, files={
+        "path": path,
+        "object": ("data.bin", io.BytesIO(b"\x00\x01"), "application/octet-stream"),
+        "content": ("notes.txt", "hello", "text/plain"),
+    })
+
+    content_type, body = requests[0]
+    assert content_type.startswith("multipart/form-data; boundary=")
+    assert parse(content_type, body) == [
+        ("name", None, None, b"report"),
+        ("path", "report.csv", None, b"a,b\n1,2\n"),
+        ("object", "data.bin", "application/octet-stream", b"\x00\x01"),
+        ("content", "notes.txt", "text/plain", b"hello"),
+    ]
+
+
+def test_body_can_be_produced_more_than_once(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"x" * 100_000)
+    encoder = MultipartEncoder(fields={"name": "video"}, files={"file": path}, chunk_size=1000)
+
+    first = encoder.to_bytes()
+    assert encoder.to_bytes() == first
+    assert len(first) == encoder.content_length
+
+
+def test_encode_payload_matches_base64_of_the_body():
+    encoder = MultipartEncoder(files={"file": ("a.bin", bytes(range(256)) * 100)}, chunk_size=1000)
+    payload = encoder.encode_payload({"requestUrl": "https://upload.example.com/"})
+
+    assert base64.b64decode(json.loads(payload)["requestBody"]) == encoder.to_bytes()
+
+
+def test_data_has_to_be_fields_when_files_are_given():
+    session, _ = make_session()
+
+    with pytest.raises(ValueError):
+        session.post("https://upload.example.com/", data="raw", files={"file": b"x"})
@@ -0,0 +1,81 @@
+import os
+import time
+
+import pytest
+
+import tls_client
+from tls_client.exceptions import TLSClientConnectionRefused
+from tls_client.pool import ProcessPool
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def handler(payload):
+    # https://<host>/<size>[/slow]
+    parts = payload["requestUrl"].split("/")
+    if parts[2] == "down.example.com":
+        return {"id": "fake", "sessionId": payload["sessionId"], "status": 0, "target": "", "headers": None,
+                "cookies": None, "body": "dial tcp 127.0.0.1:443: connect: connection refused"}
+    if parts[-1] == "slow":
+        time.sleep(0.2)
+    return build_envelope(payload, 200, {"Set-Cookie": f"pid={os.getpid()}; Path=/"}, b"x" * int(parts[3]))
+
+
+def session_factory():
+    # module level, the factory is pickled for the worker processes
+    return tls_client.Session(transport=FakeTransport(handler=handler))
+
+
+def shared_memory_blocks():
+    try:
+        return set(os.listdir("/dev/shm"))
+    except OSError:
+        return set()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPool(workers=2, session_factory=session_factory, threads=4, shm_threshold=1024) as pool:
+        yield pool
+
+
+def test_responses_come_back_from_the_workers(pool):
+    response = pool.get("https://api.example.com/10")
+
+    assert response.status_code == 200
+    assert response.content == b"x" * 10
+    assert response.cookies.get("pid") != str(os.getpid())
+
+
+def test_large_bodies_are_passed_through_shared_memory(pool):
+    before = shared_memory_blocks()
+
+    assert pool.get("https://api.example.com/1000000").content == b"x" * 1000000
+    assert shared_memory_blocks() - before == set()
+
+
+def test_errors_are_raised_in_the_parent(pool):
+    with pytest.raises(TLSClientConnectionRefused):
+        pool.get("https://down.example.com/0")
+
+
+def test_host_affinity_routes_a_host_to_one_worker(pool):
+    futures = [pool.submit("GET", "https://affinity.example.com/1") for _ in range(10)]
+
+    assert len({future.result().cookies.get("pid") for future in futures}) == 1
+
+
+def test_cancelled_requests_release_their_shared_memory(pool):
+    before = shared_memory_blocks()
+    futures = [pool.submit("GET", "https://cancel.example.com/100000/slow") for _ in range(4)]
+    cancelled = [future.cancel() for future in futures]
+
+    # the pool keeps working after the responses of the cancelled requests arrived
+    time.sleep(1.0)
+    assert pool.get("https://cancel.example.com/10").status_code == 200
+    assert all(cancelled)
+    assert shared_memory_blocks() - before == set()
+
+
+def test_unknown_affinity_is_rejected():
+    with pytest.raises(ValueError):
+        ProcessPool(workers=1, session_factory=session_factory, affinity="random")
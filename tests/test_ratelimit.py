@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+import tls_client
+from tls_client.exceptions import TLSClientDeadlineExceeded
+from tls_client.ratelimit import HostRateLimiter, TokenBucket, parse_retry_after
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_token_bucket_spaces_out_requests():
+    bucket = TokenBucket(rate=10, burst=1)
+    now = time.monotonic()
+
+    assert bucket.reserve(now) == 0.0
+    assert bucket.reserve(now) == pytest.approx(0.1)
+    bucket.cancel()
+    assert bucket.reserve(now) == pytest.approx(0.1)
+
+
+def test_concurrency_is_capped_per_origin():
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def handler(payload):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return build_envelope(payload, 200)
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.rate_limiter = HostRateLimiter(max_concurrency=2)
+
+    threads = [threading.Thread(target=session.get, args=("https://api.example.com/",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert active[1] == 2
+    assert session.rate_limiter.snapshot()["https://api.example.com"]["active"] == 0
+
+
+def test_backpressure_cuts_the_rate_and_honours_retry_after():
+    session = tls_client.Session(transport=FakeTransport(
+        handler=lambda payload: build_envelope(payload, 429, {"Retry-After": "30"})
+    ))
+    session.rate_limiter = limiter = HostRateLimiter(rate=10)
+
+    assert session.get("https://api.example.com/").status_code == 429
+    snapshot = limiter.snapshot()["https://api.example.com"]
+    assert snapshot["rate"] == 5
+    assert snapshot["blocked_for"] > 29
+
+
+def test_deadline_fails_fast_instead_of_waiting_for_retry_after():
+    session = tls_client.Session(transport=FakeTransport(
+        handler=lambda payload: build_envelope(payload, 503, {"Retry-After": "30"})
+    ))
+    session.rate_limiter = limiter = HostRateLimiter()
+    session.get("https://api.example.com/")
+
+    start = time.perf_counter()
+    with pytest.raises(TLSClientDeadlineExceeded):
+        session.get("https://api.example.com/", deadline=0.5)
+    assert time.perf_counter() - start < 0.1
+    # the slot wasn't taken
+    assert limiter.snapshot()["https://api.example.com"]["active"] == 0
@@ -0,0 +1,70 @@
+import tls_client
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def login_handler(requests):
+    def handler(payload):
+        requests.append(payload)
+        if payload["requestUrl"].endswith("/login"):
+            return build_envelope(payload, 303, {"Location": "/home", "Set-Cookie": "sid=abc; Path=/"})
+        if payload["requestUrl"].endswith("/old"):
+            return build_envelope(payload, 308, {"Location": "https://new.example.com/upload"})
+        return build_envelope(payload, 200, body=payload["requestUrl"].encode())
+    return handler
+
+
+def test_cookies_of_redirect_responses_are_stored_and_the_chain_is_recorded():
+    requests = []
+    session = tls_client.Session(transport=FakeTransport(handler=login_handler(requests)))
+
+    response = session.post("https://app.example.com/login", data={"user": "name"})
+
+    assert response.url == "https://app.example.com/home"
+    assert [hop.status_code for hop in response.history] == [303]
+    assert response.history[0].url == "https://app.example.com/login"
+    assert session.cookies.get("sid") == "abc"
+    # a 303 is followed with a GET without body
+    assert [(payload["requestMethod"], payload.get("requestBody")) for payload in requests] == [
+        ("POST", "user=name"), ("GET", None)
+    ]
+
+    session.get("https://app.example.com/profile")
+    assert {"name": "sid", "value": "abc"}.items() <= requests[-1]["requestCookies"][0].items()
+
+
+def test_307_and_308_keep_method_and_body():
+    requests = []
+    session = tls_client.Session(transport=FakeTransport(handler=login_handler(requests)))
+
+    response = session.put("https://app.example.com/old", data=b"payload")
+
+    assert response.text == "https://new.example.com/upload"
+    assert [(payload["requestMethod"], payload["requestUrl"]) for payload in requests] == [
+        ("PUT", "https://app.example.com/old"), ("PUT", "https://new.example.com/upload")
+    ]
+    assert requests[1]["requestBody"] == requests[0]["requestBody"]
+
+
+def test_redirects_are_not_followed_when_disabled():
+    requests = []
+    session = tls_client.Session(transport=FakeTransport(handler=login_handler(requests)))
+
+    response = session.post("https://app.example.com/login", allow_redirects=False)
+
+    assert response.status_code == 303
+    assert response.history == []
+    assert len(requests) == 1
+    assert session.cookies.get("sid") == "abc"
+
+
+def test_history_of_every_hop_ends_before_it():
+    transport = FakeTransport()
+    for hop in range(3):
+        transport.add_response(f"https://app.example.com/{hop}", status=302, headers={"Location": f"/{hop + 1}"})
+    session = tls_client.Session(transport=transport)
+
+    response = session.get("https://app.example.com/0")
+
+    assert response.url == "https://app.example.com/3"
+    assert [hop.url for hop in response.history] == [f"https://app.example.com/{hop}" for hop in range(3)]
+    assert [len(hop.history) for hop in response.history] == [0, 1, 2]
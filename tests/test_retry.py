@@ -0,0 +1,93 @@
+import pytest
+
+import tls_client
+from tls_client.exceptions import (
+    TLSClientConnectionRefused, TLSClientConnectionReset, TLSClientTimeout, TLSClientTLSError
+)
+from tls_client.retry import Retry
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def error_envelope(payload, message):
+    return {"id": "fake", "sessionId": payload["sessionId"], "status": 0, "target": "", "headers": None,
+            "cookies": None, "body": message}
+
+
+def failing(failures, message="dial tcp 127.0.0.1:443: connect: connection refused"):
+    calls = []
+
+    def handler(payload):
+        calls.append(payload["requestMethod"])
+        if len(calls) <= failures:
+            return error_envelope(payload, message)
+        return build_envelope(payload, 200, body=b"ok")
+
+    return handler, calls
+
+
+def test_connection_errors_are_retried():
+    handler, calls = failing(2)
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.retry = Retry(total=3, backoff_factor=0, budget=None)
+
+    assert session.get("https://api.example.com/").content == b"ok"
+    assert len(calls) == 3
+
+
+def test_retries_are_limited_by_total():
+    handler, calls = failing(10)
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.retry = Retry(total=2, backoff_factor=0, budget=None)
+
+    with pytest.raises(TLSClientConnectionRefused):
+        session.get("https://api.example.com/")
+    assert len(calls) == 3
+
+
+def test_status_forcelist_is_retried():
+    statuses = [503, 503, 200]
+    session = tls_client.Session(transport=FakeTransport(
+        handler=lambda payload: build_envelope(payload, statuses.pop(0), {"Retry-After": "0"})
+    ))
+    session.retry = Retry(total=3, backoff_factor=0, budget=None)
+
+    assert session.get("https://api.example.com/").status_code == 200
+    assert statuses == []
+
+
+def test_tls_errors_are_not_retried():
+    handler, calls = failing(10, "tls: failed to verify certificate: x509: certificate signed by unknown authority")
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.retry = Retry(total=3, backoff_factor=0, budget=None)
+
+    with pytest.raises(TLSClientTLSError):
+        session.get("https://api.example.com/")
+    assert len(calls) == 1
+
+
+def test_non_idempotent_methods_are_not_retried_after_a_timeout():
+    handler, calls = failing(10, "context deadline exceeded (Client.Timeout exceeded while awaiting headers)")
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.retry = Retry(total=3, backoff_factor=0, budget=None)
+
+    with pytest.raises(TLSClientTimeout):
+        session.post("https://api.example.com/", data="x")
+    assert calls == ["POST"]
+
+
+def test_backoff_is_capped():
+    retry = Retry(backoff_factor=1, backoff_max=3, jitter=False)
+
+    assert [retry.backoff(attempt) for attempt in (1, 2, 3, 4)] == [1, 2, 3, 3]
+
+
+def test_post_is_not_resent_because_of_its_url():
+    # a reset after the request was sent, the hostname must not make it look like a DNS error (never sent)
+    handler, calls = failing(10, 'failed to do request: Post "https://dns-api.example.com/x": read tcp '
+                                 '10.0.0.2:51234->203.0.113.7:443: read: connection reset by peer')
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.retry = Retry(total=3, backoff_factor=0, budget=None)
+
+    with pytest.raises(TLSClientConnectionReset):
+        session.post("https://dns-api.example.com/x", data="x")
+    assert calls == ["POST"]
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import threading
+
+import pytest
+
+import tls_client
+from tls_client.coalescing import RequestCoalescer
+from tls_client.exceptions import TLSClientBodyTooLarge
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def spool_files():
+    return {name for name in os.listdir(tempfile.gettempdir()) if name.startswith("tls-client-")}
+
+
+def make_session(body, spill_threshold=1024):
+    session = tls_client.Session(transport=FakeTransport(
+        handler=lambda payload: build_envelope(payload, 200, {"Content-Type": "text/plain"}, body)
+    ))
+    session.spill_threshold = spill_threshold
+    return session
+
+
+def test_large_bodies_are_mapped_from_a_file():
+    before = spool_files()
+    body = bytes(range(256)) * 64
+    response = make_session(body).get("https://files.example.com/")
+
+    assert response.spilled
+    assert isinstance(response.content, memoryview)
+    assert response.content == body
+    assert response.body_size == len(body)
+    # the temporary file is removed right away, the open file keeps the data
+    assert spool_files() - before == set()
+
+    raw = response.raw
+    raw.seek(256)
+    buffer = bytearray(256)
+    assert raw.readinto(buffer) == 256
+    assert bytes(buffer) == body[256:512]
+
+    with response:
+        assert b"".join(response.iter_content(1000)) == body
+    assert raw.closed
+
+
+def test_small_bodies_are_read_into_memory():
+    response = make_session(b"small").get("https://files.example.com/")
+
+    assert not response.spilled
+    assert response.content == b"small"
+    assert response.text == "small"
+
+
+def test_spilled_bodies_are_checked_against_max_body_size():
+    before = spool_files()
+    session = make_session(b"x" * 10_000)
+
+    with pytest.raises(TLSClientBodyTooLarge) as info:
+        session.get("https://files.example.com/", max_body_size=5_000)
+    assert info.value.size == 10_000
+    assert spool_files() - before == set()
+
+
+def test_requests_are_not_coalesced_with_spilling():
+    transport = FakeTransport(handler=lambda payload: build_envelope(payload, 200, body=b"x" * 4096), latency=0.1)
+    session = tls_client.Session(transport=transport)
+    session.spill_threshold = 1024
+    session.coalescer = RequestCoalescer()
+
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(session.get("https://files.example.com/")))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    responses[0].close()
+
+    # each response owns its file, closing one doesn't affect the other
+    assert transport.requests == 2
+    assert responses[1].content == b"x" * 4096
@@ -0,0 +1,76 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tls_client
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def echo_cookies(payload):
+    cookies = sorted(f"{cookie['name']}={cookie['value']}" for cookie in payload["requestCookies"])
+    return build_envelope(payload, 200, body="; ".join(cookies).encode())
+
+
+def test_request_cookies_are_sent_but_not_stored():
+    session = tls_client.Session(transport=FakeTransport(handler=echo_cookies))
+    session.cookies.set("theme", "dark", domain="api.example.com", path="/")
+
+    response = session.get("https://api.example.com/", cookies={"token": "abc"})
+
+    assert response.text == "theme=dark; token=abc"
+    assert "token" not in session.cookies
+    assert session.get("https://api.example.com/").text == "theme=dark"
+
+
+def test_request_cookies_replace_session_cookies_with_the_same_name():
+    session = tls_client.Session(transport=FakeTransport(handler=echo_cookies))
+    session.cookies.set("theme", "dark")
+
+    assert session.get("https://api.example.com/", cookies={"theme": "light"}).text == "theme=light"
+    assert session.cookies.get("theme") == "dark"
+
+
+def test_concurrent_requests_only_send_their_own_cookies():
+    session = tls_client.Session(transport=FakeTransport(handler=echo_cookies))
+    start = threading.Barrier(8)
+
+    def request(index):
+        start.wait()
+        return [session.get("https://api.example.com/", cookies={"user": str(index)}).text for _ in range(50)]
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(request, range(8)))
+
+    for index, texts in enumerate(results):
+        assert set(texts) == {f"user={index}"}
+    assert len(session.cookies) == 0
+
+
+def test_cookies_set_by_concurrent_responses_are_all_stored():
+    def handler(payload):
+        name = payload["requestUrl"].rsplit("/", 1)[1]
+        return build_envelope(payload, 200, {"Set-Cookie": f"{name}=1; Path=/"})
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda index: session.get(f"https://api.example.com/c{index}"), range(200)))
+
+    assert sorted(cookie.name for cookie in session.cookies) == sorted(f"c{index}" for index in range(200))
+
+
+def test_concurrent_redirects_keep_their_own_headers():
+    def handler(payload):
+        if payload["requestUrl"].endswith("/start"):
+            return build_envelope(payload, 302, {"Location": "/end"})
+        return build_envelope(payload, 200, body=payload["headers"]["X-Caller"].encode())
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+
+    def request(index):
+        response = session.get("https://api.example.com/start", headers={"X-Caller": str(index)})
+        return response.text, len(response.history)
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(request, range(100)))
+
+    assert results == [(str(index), 1) for index in range(100)]
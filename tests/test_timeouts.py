@@ -0,0 +1,84 @@
+import pytest
+
+import tls_client
+from tls_client.exceptions import TLSClientConnectionRefused, TLSClientTimeout
+from tls_client.timeouts import AdaptiveTimeout, timeout_payload
+from tls_client.transport import FakeTransport, build_envelope
+
+
+def payload_timeout(payload):
+    if "timeoutMilliseconds" in payload:
+        return payload["timeoutMilliseconds"] / 1000
+    return payload["timeoutSeconds"]
+
+
+def test_timeout_payload():
+    assert timeout_payload(30) == {"timeoutSeconds": 30}
+    assert timeout_payload(0.25) == {"timeoutMilliseconds": 250}
+    assert timeout_payload(0.0001) == {"timeoutMilliseconds": 1}
+
+
+def test_millisecond_timeouts_are_sent():
+    payloads = []
+
+    def handler(payload):
+        payloads.append(payload)
+        return build_envelope(payload, 200)
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.get("https://api.example.com/", timeout=0.08)
+    session.timeout = 5
+    session.get("https://api.example.com/")
+
+    assert payloads[0]["timeoutMilliseconds"] == 80
+    assert "timeoutSeconds" not in payloads[0]
+    assert payloads[1]["timeoutSeconds"] == 5
+
+
+def test_adaptive_timeout_learns_from_latencies():
+    adaptive = AdaptiveTimeout(percentile=0.99, factor=3, min_timeout=0.01, min_samples=10)
+    assert adaptive.timeout_for("https://api.example.com/", 30) == 30
+
+    for _ in range(10):
+        adaptive.record("https://api.example.com/a", 0.1)
+
+    assert adaptive.timeout_for("https://api.example.com/b", 30) == pytest.approx(0.3, rel=0.05)
+    assert adaptive.timeout_for("https://other.example.com/", 30) == 30
+
+
+def test_adaptive_timeout_stays_within_the_bounds():
+    adaptive = AdaptiveTimeout(factor=3, min_timeout=0.5, max_timeout=2, min_samples=5)
+    for _ in range(5):
+        adaptive.record("https://fast.example.com/", 0.001)
+        adaptive.record("https://slow.example.com/", 10)
+
+    assert adaptive.timeout_for("https://fast.example.com/", 30) == 0.5
+    assert adaptive.timeout_for("https://slow.example.com/", 30) == 2
+
+
+def test_only_timeouts_are_recorded_as_errors():
+    adaptive = AdaptiveTimeout(min_samples=1)
+
+    adaptive.record("https://api.example.com/", 5, error=TLSClientConnectionRefused("connection refused"))
+    assert adaptive.timeout_for("https://api.example.com/", 30) == 30
+
+    adaptive.record("https://api.example.com/", 5, error=TLSClientTimeout("Client.Timeout exceeded"))
+    assert adaptive.timeout_for("https://api.example.com/", 30) == pytest.approx(15, rel=0.05)
+
+
+def test_session_uses_the_learned_timeout_unless_one_is_given():
+    timeouts = []
+
+    def handler(payload):
+        timeouts.append(payload_timeout(payload))
+        return build_envelope(payload, 200)
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    session.adaptive_timeout = AdaptiveTimeout(min_samples=3, min_timeout=1)
+    for _ in range(4):
+        session.get("https://api.example.com/")
+    session.get("https://api.example.com/", timeout=7)
+
+    assert timeouts[:3] == [session.timeout] * 3
+    assert timeouts[3] == 1
+    assert timeouts[4] == 7
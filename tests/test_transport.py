@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+import tls_client
+from tls_client.exceptions import TLSClientException
+from tls_client.transport import FakeTransport, RecordingTransport, ReplayTransport
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / "recording.jsonl"
+    backend = FakeTransport()
+    backend.add_response("https://api.example.com/a", body=b"first", headers={"Content-Type": "text/plain"})
+    backend.add_response("https://api.example.com/b", status=201, body=b'{"ok": true}', method="POST",
+                         headers={"Content-Type": "application/json", "X-Trace": "1"})
+
+    session = tls_client.Session(transport=RecordingTransport(str(path), backend))
+    session.get("https://api.example.com/a", headers={"X-Test": "yes"})
+    session.post("https://api.example.com/b", json={"name": "value"})
+    return path
+
+
+def test_recording_appends_one_line_per_request(recording):
+    records = [json.loads(line) for line in recording.read_text(encoding="utf-8").splitlines()]
+
+    assert [(record["request"]["method"], record["request"]["url"]) for record in records] == [
+        ("GET", "https://api.example.com/a"),
+        ("POST", "https://api.example.com/b"),
+    ]
+    assert records[0]["request"]["headers"]["X-Test"] == "yes"
+    assert records[1]["response"]["status"] == 201
+
+
+def test_replay_returns_the_recorded_responses(recording):
+    session = tls_client.Session(transport=ReplayTransport(str(recording)))
+
+    response = session.get("https://api.example.com/a")
+    assert response.status_code == 200
+    assert response.text == "first"
+
+    response = session.post("https://api.example.com/b", json={"name": "value"})
+    assert response.status_code == 201
+    assert response.json() == {"ok": True}
+    assert response.headers["X-Trace"] == "1"
+
+
+def test_replay_plays_repeated_recordings_in_order_and_repeats_the_last(tmp_path):
+    path = tmp_path / "recording.jsonl"
+    backend = FakeTransport()
+    session = tls_client.Session(transport=RecordingTransport(str(path), backend))
+    for body in (b"one", b"two"):
+        backend.add_response("https://api.example.com/counter", body=body)
+        session.get("https://api.example.com/counter")
+
+    session = tls_client.Session(transport=ReplayTransport(str(path)))
+    assert [session.get("https://api.example.com/counter").content for _ in range(3)] == [b"one", b"two", b"two"]
+
+
+def test_replay_fails_requests_without_recording(recording):
+    session = tls_client.Session(transport=ReplayTransport(str(recording)))
+
+    with pytest.raises(TLSClientException, match="no recorded response"):
+        session.get("https://api.example.com/missing")
+    # requests are matched by method too
+    with pytest.raises(TLSClientException, match="no recorded response"):
+        session.get("https://api.example.com/b")
@@ -0,0 +1,64 @@
+import time
+
+import tls_client
+from tls_client.exceptions import TLSClientConnectionRefused
+from tls_client.transport import FakeTransport, build_envelope
+from tls_client.warmup import origin_url
+
+
+def test_origin_url():
+    assert origin_url("api.example.com") == "https://api.example.com/"
+    assert origin_url("api.example.com:8443") == "https://api.example.com:8443/"
+    assert origin_url("http://cdn.example.com/assets/app.js?v=1") == "http://cdn.example.com/"
+
+
+def test_preconnect_requests_every_origin_once_without_storing_cookies():
+    requests = []
+
+    def handler(payload):
+        requests.append((payload["requestMethod"], payload["requestUrl"]))
+        if "down" in payload["requestUrl"]:
+            return {"id": "fake", "sessionId": payload["sessionId"], "status": 0, "target": "", "headers": None,
+                    "cookies": None, "body": "dial tcp 203.0.113.7:443: connect: connection refused"}
+        return build_envelope(payload, 301, {"Location": "/login", "Set-Cookie": "sid=abc"})
+
+    session = tls_client.Session(transport=FakeTransport(handler=handler))
+    errors = session.preconnect(["api.example.com", "https://api.example.com/v1", "down.example.com"], parallel=2)
+
+    assert sorted(requests) == [("HEAD", "https://api.example.com/"), ("HEAD", "https://down.example.com/")]
+    assert errors["https://api.example.com/"] is None
+    assert isinstance(errors["https://down.example.com/"], TLSClientConnectionRefused)
+    # redirects aren't followed and cookies aren't stored
+    assert len(session.cookies) == 0
+
+
+def test_keep_warm_preconnects_every_interval_until_stopped():
+    transport = FakeTransport()
+    session = tls_client.Session(transport=transport)
+
+    warmer = session.keep_warm(["api.example.com", "cdn.example.com"], interval=0.02)
+    deadline = time.monotonic() + 2
+    while warmer.rounds < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert warmer.running
+    assert warmer.rounds >= 2
+    assert warmer.failures == 0
+    assert warmer.last_errors == {"https://api.example.com/": None, "https://cdn.example.com/": None}
+
+    session.close()
+    warmer._thread.join(1)
+    assert not warmer.running
+
+
+def test_keep_warm_replaces_the_previous_warmer():
+    session = tls_client.Session(transport=FakeTransport())
+
+    first = session.keep_warm(["api.example.com"], interval=10)
+    second = session.keep_warm(["cdn.example.com"], interval=10)
+
+    assert session.warmer is second
+    assert second.hosts == ["https://cdn.example.com/"]
+    first._thread.join(1)
+    assert not first.running
+    session.close()
@@ -0,0 +1,239 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+from urllib.parse import urlsplit
+
+from .exceptions import (
+    TLSClientCircuitOpen, TLSClientConnectionError, TLSClientDeadlineExceeded, TLSClientException, TLSClientProxyError,
+    TLSClientTimeout
+)
+from .response import Response
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _Circuit:
+    def __init__(self, window: int) -> None:
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.window = window
+        # one [second, calls, failures, slow calls] bucket per second of the window
+        self.buckets = [[0, 0, 0, 0] for _ in range(window)]
+        self.probes = 0
+        self.probe_successes = 0
+
+    def add(self, now: int, failed: bool, slow: bool) -> None:
+        bucket = self.buckets[now % self.window]
+        if bucket[0] != now:
+            bucket[0], bucket[1], bucket[2], bucket[3] = now, 0, 0, 0
+        bucket[1] += 1
+        bucket[2] += failed
+        bucket[3] += slow
+
+    def totals(self, now: int) -> Tuple[int, int, int]:
+        calls = failures = slow = 0
+        for second, bucket_calls, bucket_failures, bucket_slow in self.buckets:
+            if now - second < self.window:
+                calls += bucket_calls
+                failures += bucket_failures
+                slow += bucket_slow
+        return calls, failures, slow
+
+    def reset(self) -> None:
+        for bucket in self.buckets:
+            bucket[0] = bucket[1] = bucket[2] = bucket[3] = 0
+        self.probes = 0
+        self.probe_successes = 0
+
+
+class CircuitBreaker:
+    """Per-host and per-proxy circuit breaker, so requests to an origin (or through a proxy) which is down fail fast
+    instead of waiting for the timeout.
+
+    Outcomes are counted over a sliding ``window`` of seconds. Once ``min_calls`` were seen and the share of failures
+    reaches ``error_threshold`` (or the share of calls slower than ``slow_call_duration`` seconds reaches
+    ``slow_call_threshold``) the circuit opens: requests raise ``TLSClientCircuitOpen`` without calling the TLS
+    client. After ``open_duration`` seconds it is half-open and lets ``half_open_probes`` requests through, it closes
+    once all of them succeeded and opens again on the first failure.
+
+    Failures are ``failure_errors`` and ``failure_status_codes`` for the host. Proxy errors only count for the circuit
+    of the proxy, every other outcome shows that the proxy works.
+
+    Example:
+        session.circuit_breaker = CircuitBreaker(error_threshold=0.5, min_calls=20, open_duration=15)
+    """
+
+    def __init__(self,
+                 error_threshold: float = 0.5,
+                 slow_call_threshold: Optional[float] = None,
+                 slow_call_duration: Optional[float] = None,
+                 min_calls: int = 20,
+                 window: int = 30,
+                 open_duration: float = 30.0,
+                 half_open_probes: int = 3,
+                 failure_errors: Tuple[Type[TLSClientException], ...] = (TLSClientTimeout, TLSClientConnectionError),
+                 failure_status_codes: Iterable[int] = (502, 503, 504),
+                 ) -> None:
+        # Share of failed calls in the window which opens the circuit
+        self.error_threshold = error_threshold
+        # Share of calls slower than slow_call_duration seconds which opens the circuit, None disables it
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_duration = slow_call_duration
+        # Calls in the window before the circuit may open
+        self.min_calls = min_calls
+        # Length of the sliding window in seconds
+        self.window = window
+        # Seconds the circuit stays open before probes are let through
+        self.open_duration = open_duration
+        # Requests let through while half-open, all of them must succeed to close the circuit
+        self.half_open_probes = half_open_probes
+        self.failure_errors = failure_errors
+        self.failure_status_codes = frozenset(failure_status_codes)
+
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+
+        # Requests rejected by an open circuit and number of times a circuit opened
+        self.rejected = 0
+        self.opened = 0
+
+    @staticmethod
+    def keys_for(url: str, proxy: Optional[str] = None) -> List[str]:
+        keys = [f"host:{(urlsplit(url).hostname or '').lower()}"]
+        if proxy:
+            parts = urlsplit(proxy)
+            keys.append(f"proxy:{parts.hostname or proxy}:{parts.port or ''}")
+        return keys
+
+    def _circuit(self, key: str) -> _Circuit:
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            with self._lock:
+                circuit = self._circuits.setdefault(key, _Circuit(self.window))
+        return circuit
+
+    def _allow(self, key: str, circuit: _Circuit, now: float) -> None:
+        # requires circuit.lock
+        if circuit.state == OPEN:
+            remaining = circuit.opened_at + self.open_duration - now
+            if remaining > 0:
+                raise TLSClientCircuitOpen(f"Circuit for {key} is open, retry in {remaining:.1f}s", key, remaining)
+            circuit.state = HALF_OPEN
+            circuit.probes = circuit.probe_successes = 0
+        if circuit.state == HALF_OPEN:
+            if circuit.probes >= self.half_open_probes:
+                raise TLSClientCircuitOpen(f"Circuit for {key} is half-open, waiting for its probes", key, 0.0)
+            circuit.probes += 1
+
+    def acquire(self, url: str, proxy: Optional[str] = None) -> List[str]:
+        """Checks the circuits of a request, raises TLSClientCircuitOpen if one of them doesn't let it through."""
+        keys = self.keys_for(url, proxy)
+        now = time.monotonic()
+        allowed: List[Tuple[_Circuit, str]] = []
+        try:
+            for key in keys:
+                circuit = self._circuit(key)
+                with circuit.lock:
+                    state = circuit.state
+                    self._allow(key, circuit, now)
+                allowed.append((circuit, state))
+        except TLSClientCircuitOpen:
+            # give back the probes taken from the circuits before
+            for circuit, _ in allowed:
+                with circuit.lock:
+                    if circuit.state == HALF_OPEN and circuit.probes:
+                        circuit.probes -= 1
+            with self._lock:
+                self.rejected += 1
+            raise
+        return keys
+
+    def _is_failure(self, key: str, response: Optional[Response], error: Optional[BaseException]) -> bool:
+        if key.startswith("proxy:"):
+            return isinstance(error, TLSClientProxyError)
+        if error is not None:
+            # requests cut short by their deadline don't count against the host
+            return isinstance(error, self.failure_errors) and not isinstance(
+                error, (TLSClientProxyError, TLSClientDeadlineExceeded))
+        return response is not None and response.status_code in self.failure_status_codes
+
+    def record(self,
+               keys: List[str],
+               duration: float,
+               response: Optional[Response] = None,
+               error: Optional[BaseException] = None
+               ) -> None:
+        """Records the outcome of a request which was let through by acquire, ``duration`` in seconds."""
+        if error is not None and not isinstance(error, TLSClientException):
+            # interrupted, no outcome
+            self.cancel(keys)
+            return
+
+        now = time.monotonic()
+        slow = self.slow_call_duration is not None and duration >= self.slow_call_duration
+        for key in keys:
+            failed = self._is_failure(key, response, error)
+            circuit = self._circuit(key)
+            with circuit.lock:
+                if circuit.state == HALF_OPEN:
+                    if failed or (slow and self.slow_call_threshold is not None):
+                        self._open(circuit, now)
+                    else:
+                        circuit.probe_successes += 1
+                        if circuit.probe_successes >= self.half_open_probes:
+                            circuit.state = CLOSED
+                            circuit.reset()
+                    continue
+                if circuit.state == OPEN:
+                    # sent before the circuit opened
+                    continue
+
+                second = int(now)
+                circuit.add(second, failed, slow)
+                calls, failures, slow_calls = circuit.totals(second)
+                if calls < self.min_calls:
+                    continue
+                if failures / calls >= self.error_threshold or (
+                        self.slow_call_threshold is not None and slow_calls / calls >= self.slow_call_threshold):
+                    self._open(circuit, now)
+
+    def cancel(self, keys: List[str]) -> None:
+        """Gives back the probe slots of a request which was let through by acquire but not sent."""
+        for key in keys:
+            circuit = self._circuit(key)
+            with circuit.lock:
+                if circuit.state == HALF_OPEN and circuit.probes:
+                    circuit.probes -= 1
+
+    def _open(self, circuit: _Circuit, now: float) -> None:
+        # requires circuit.lock
+        circuit.state = OPEN
+        circuit.opened_at = now
+        circuit.reset()
+        with self._lock:
+            self.opened += 1
+
+    def state(self, url: str, proxy: Optional[str] = None) -> str:
+        """State of the host circuit of a url (or of the proxy circuit, if a proxy is given)."""
+        key = self.keys_for(url, proxy)[-1]
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            return CLOSED
+        with circuit.lock:
+            if circuit.state == OPEN and time.monotonic() - circuit.opened_at >= self.open_duration:
+                return HALF_OPEN
+            return circuit.state
+
+    def snapshot(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        with self._lock:
+            circuits = list(self._circuits.items())
+        snapshot = {}
+        for key, circuit in circuits:
+            with circuit.lock:
+                calls, failures, slow = circuit.totals(int(now))
+                snapshot[key] = {"state": circuit.state, "calls": calls, "failures": failures, "slow": slow}
+        return snapshot
@@ -0,0 +1,102 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .response import Response
+from .structures import CaseInsensitiveDict
+
+# Methods which are safe to share between callers by default
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class _InFlightCall:
+    """A request which is currently executed by a leader, followers wait for its result."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.followers = 0
+        self.responses: List[Response] = []
+        self.error: Optional[BaseException] = None
+
+
+class RequestCoalescer:
+    """Single-flight coalescing of identical, concurrently executed requests.
+
+    The first caller (leader) executes the request, every identical request arriving while the leader is still in
+    flight waits for its result instead of crossing the FFI again. Each caller receives its own ``Response`` object.
+
+    Example:
+        session.coalescer = RequestCoalescer(methods=["GET"], hosts=["config.example.com"])
+    """
+
+    def __init__(self,
+                 methods: Iterable[str] = IDEMPOTENT_METHODS,
+                 hosts: Optional[Iterable[str]] = None,
+                 ignored_headers: Iterable[str] = ()
+                 ) -> None:
+        # Methods which are coalesced
+        self.methods = frozenset(method.upper() for method in methods)
+
+        # Hosts which are coalesced, None coalesces every host
+        self.hosts = frozenset(host.lower() for host in hosts) if hosts is not None else None
+
+        # Headers which are not relevant for the identity of a request (e.g. tracing ids)
+        self.ignored_headers = frozenset(header.lower() for header in ignored_headers)
+
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Tuple, _InFlightCall] = {}
+
+    def should_coalesce(self, method: str, url: str) -> bool:
+        if method.upper() not in self.methods:
+            return False
+        if self.hosts is None:
+            return True
+        return (urlsplit(url).hostname or "").lower() in self.hosts
+
+    def build_key(self,
+                  method: str,
+                  url: str,
+                  headers: CaseInsensitiveDict,
+                  request_cookies: List[Dict],
+                  *extra
+                  ) -> Tuple:
+        header_key = tuple(sorted(
+            (key, str(value)) for key, value in headers.lower_items() if key not in self.ignored_headers
+        ))
+        cookie_key = tuple(sorted(
+            (cookie["domain"], cookie["path"], cookie["name"], cookie["value"]) for cookie in request_cookies
+        ))
+        return (method.upper(), url, header_key, cookie_key) + extra
+
+    def execute(self, key: Tuple, send: Callable[[], Response]) -> Response:
+        with self._lock:
+            call = self._in_flight.get(key)
+            if call is None:
+                call = self._in_flight[key] = _InFlightCall()
+                leader = True
+            else:
+                call.followers += 1
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            with self._lock:
+                return call.responses.pop()
+
+        response = None
+        try:
+            response = send()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # no new followers can join once the call is removed
+                del self._in_flight[key]
+                if response is not None:
+                    # copies are taken before the leader hands the response to its caller
+                    call.responses = [response.copy() for _ in range(call.followers)]
+            call.event.set()
+        return response
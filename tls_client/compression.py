@@ -0,0 +1,242 @@
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from .exceptions import TLSClientException
+from .structures import CaseInsensitiveDict
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Methods whose bodies are compressed by default
+BODY_METHODS = ("POST", "PUT", "PATCH")
+
+
+def _gzip(data: bytes, level: Optional[int]) -> bytes:
+    # mtime stays 0, so equal bodies compress to equal bytes
+    compressor = zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _deflate(data: bytes, level: Optional[int]) -> bytes:
+    return zlib.compress(data, 6 if level is None else level)
+
+
+def _br(data: bytes, level: Optional[int]) -> bytes:
+    # quality 11 (the default of the brotli package) is far too slow for request bodies
+    return brotli.compress(data, quality=5 if level is None else level)
+
+
+def _zstd(data: bytes, level: Optional[int]) -> bytes:
+    return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+
+# Content-Encoding -> compress(data, level), encodings whose optional package isn't installed are left out
+ENCODERS: Dict[str, Callable[[bytes, Optional[int]], bytes]] = {"gzip": _gzip, "deflate": _deflate}
+if brotli is not None:
+    ENCODERS["br"] = _br
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd
+
+
+class RequestCompressor:
+    """Opt-in compression of request bodies with an automatic ``Content-Encoding`` header.
+
+    Bodies smaller than ``threshold`` bytes, bodies which already carry a ``Content-Encoding`` and multipart uploads
+    are sent as they are. ``br`` needs the ``brotli`` (or ``brotlicffi``) package and ``zstd`` the ``zstandard``
+    package. Only enable it for servers which accept compressed request bodies, most don't.
+
+    The body is compressed once per request, redirects (307/308), retries and hedged attempts resend the compressed
+    bytes. Compression runs on the thread which sends the request (in the worker process with a ``ProcessPool``),
+    zlib, brotli and zstandard release the GIL meanwhile, so large bodies don't stall other threads.
+
+    Example:
+        session.compressor = RequestCompressor("gzip", threshold=8192, hosts=["ingest.example.com"])
+        session.compressor.configure_host("zstd.example.com", encoding="zstd", level=6)
+    """
+
+    def __init__(self,
+                 encoding: str = "gzip",
+                 threshold: int = 1024,
+                 level: Optional[int] = None,
+                 hosts: Optional[Iterable[str]] = None,
+                 methods: Iterable[str] = BODY_METHODS
+                 ) -> None:
+        self._check_encoding(encoding)
+        self.encoding = encoding
+        # Minimum body size in bytes, smaller bodies don't get smaller enough to be worth the CPU time
+        self.threshold = threshold
+        # Compression level of the encoding, None uses a default suited for request bodies
+        self.level = level
+        # Hosts whose request bodies are compressed, None compresses for every host
+        self.hosts = frozenset(host.lower() for host in hosts) if hosts is not None else None
+        self.methods = frozenset(method.upper() for method in methods)
+
+        self._overrides: Dict[str, Optional[Tuple[str, Optional[int]]]] = {}
+
+    @staticmethod
+    def _check_encoding(encoding: str) -> None:
+        if encoding not in ENCODERS:
+            raise ValueError(
+                f"Unsupported request body encoding {encoding!r}, available: {', '.join(ENCODERS)} "
+                f"(br needs the brotli package, zstd the zstandard package)"
+            )
+
+    def configure_host(self,
+                       host: str,
+                       encoding: Optional[str] = None,
+                       level: Optional[int] = None,
+                       enabled: bool = True
+                       ) -> None:
+        """Overrides the encoding and level for a host, or disables compression for it."""
+        host = (urlsplit(host).hostname or host) if "://" in host else host
+        if not enabled:
+            self._overrides[host.lower()] = None
+            return
+        encoding = encoding or self.encoding
+        self._check_encoding(encoding)
+        self._overrides[host.lower()] = (encoding, level)
+
+    def _settings(self, method: str, url: str) -> Optional[Tuple[str, Optional[int]]]:
+        if method.upper() not in self.methods:
+            return None
+        host = (urlsplit(url).hostname or "").lower()
+        if host in self._overrides:
+            return self._overrides[host]
+        if self.hosts is not None and host not in self.hosts:
+            return None
+        return self.encoding, self.level
+
+    def compress(self,
+                 method: str,
+                 url: str,
+                 headers: CaseInsensitiveDict,
+                 body: Optional[Union[str, bytes, bytearray]]
+                 ) -> Tuple[Optional[Union[str, bytes, bytearray]], Optional[str]]:
+        """Returns the body to send and its encoding, or the unchanged body and None."""
+        if not isinstance(body, (str, bytes, bytearray)) or len(body) < self.threshold:
+            return body, None
+        if headers.get("Content-Encoding"):
+            return body, None
+        settings = self._settings(method, url)
+        if settings is None:
+            return body, None
+
+        encoding, level = settings
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        return ENCODERS[encoding](data, self.level if level is None else level), encoding
+
+
+# --- Decoding of response bodies ---------------------------------------------------------------------------------------
+
+def parse_content_encoding(value: Optional[Union[str, List[str]]]) -> List[str]:
+    """Codings of a Content-Encoding header in the order they were applied, without identity."""
+    if not value:
+        return []
+    if isinstance(value, list):
+        value = ",".join(value)
+    return [coding.strip().lower() for coding in value.split(",") if coding.strip().lower() not in ("", "identity")]
+
+
+def _decompressor(coding: str, magic: bytes) -> Optional[Tuple[Callable[[bytes], bytes], Callable[[], bytes]]]:
+    """Returns (decompress, flush) for a coding, None if ``magic`` (start of the data) shows it isn't encoded."""
+    if coding in ("gzip", "x-gzip"):
+        if not magic.startswith(b"\x1f\x8b"):
+            return None
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return decompressor.decompress, decompressor.flush
+    if coding == "deflate":
+        # deflate should be zlib wrapped, but some servers send raw deflate streams
+        wrapped = len(magic) >= 2 and magic[0] & 0x0F == 8 and (magic[0] << 8 | magic[1]) % 31 == 0
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS if wrapped else -zlib.MAX_WBITS)
+        return decompressor.decompress, decompressor.flush
+    if coding == "br":
+        if brotli is None:
+            raise TLSClientException("The response body is br encoded, decoding it needs the brotli package")
+        decompressor = brotli.Decompressor()
+        return getattr(decompressor, "process", None) or decompressor.decompress, lambda: b""
+    if coding == "zstd":
+        if zstandard is None:
+            raise TLSClientException("The response body is zstd encoded, decoding it needs the zstandard package")
+        if not magic.startswith(b"\x28\xb5\x2f\xfd"):
+            return None
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        return decompressor.decompress, decompressor.flush
+    # unknown codings are passed through as they are
+    return None
+
+
+# Codings without a magic number, a body which fails to decode before it produced any output is passed through as it
+# is
+_UNMARKED_CODINGS = ("br", "deflate")
+
+
+def _decode(chunks: Iterator[bytes], coding: str) -> Iterator[bytes]:
+    # the magic number check needs the first 4 bytes, which may be spread over several small chunks
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= 4:
+            break
+    functions = _decompressor(coding, head[:4])
+    if functions is None:
+        # already decoded (or not decodable), e.g. by the shared library
+        if head:
+            yield head
+        yield from chunks
+        return
+
+    decompress, flush = functions
+    unmarked = coding in _UNMARKED_CODINGS
+    # the input is kept until the decoder produced output, the error of a body which isn't encoded may only show up
+    # after a few chunks
+    consumed = [head]
+    try:
+        data = decompress(head)
+        while unmarked and not data:
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            consumed.append(chunk)
+            data = decompress(chunk)
+    except Exception as e:
+        if isinstance(e, TLSClientException):
+            raise
+        if not unmarked:
+            raise TLSClientException(f"Failed to decode {coding} response body: {e}") from e
+        yield from consumed
+        yield from chunks
+        return
+
+    try:
+        if data:
+            yield data
+        for chunk in chunks:
+            data = decompress(chunk)
+            if data:
+                yield data
+        data = flush()
+    except Exception as e:
+        if isinstance(e, TLSClientException):
+            raise
+        raise TLSClientException(f"Failed to decode {coding} response body: {e}") from e
+    if data:
+        yield data
+
+
+def iter_decoded(chunks: Iterable[bytes], codings: List[str]) -> Iterator[bytes]:
+    """Decodes a body incrementally, ``codings`` in the order they were applied (as in Content-Encoding)."""
+    decoded = iter(chunks)
+    for coding in reversed(codings):
+        decoded = _decode(decoded, coding)
+    return decoded
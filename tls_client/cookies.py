@@ -1,6 +1,6 @@
 import copy
 from http.client import HTTPMessage
-from http.cookiejar import Cookie, CookieJar
+from http.cookiejar import Cookie, CookieJar, deepvalues
 from typing import Any, MutableMapping, Union
 from urllib.parse import urlparse, urlunparse
 
@@ -121,6 +121,9 @@ class RequestsCookieJar(CookieJar, MutableMapping):
     .. warning:: dictionary operations that are normally O(1) may be O(n).
     """
 
+    # True while the cookies are shared with a fork, they are copied before the next change
+    _shared = False
+
     def get(self, name, default=None, domain=None, path=None):
         """Dict-like get() that also supports optional domain and path args in
         order to resolve naming collisions from using one cookie jar over
@@ -273,6 +276,12 @@ class RequestsCookieJar(CookieJar, MutableMapping):
         """
         remove_cookie_by_name(self, name)
 
+    def __iter__(self):
+        # iterates over a snapshot, other threads may change the jar meanwhile
+        with self._cookies_lock:
+            cookies = list(deepvalues(self._cookies))
+        return iter(cookies)
+
     def set_cookie(self, cookie, *args, **kwargs):
         if (
                 hasattr(cookie.value, "startswith")
@@ -280,7 +289,16 @@ class RequestsCookieJar(CookieJar, MutableMapping):
                 and cookie.value.endswith('"')
         ):
             cookie.value = cookie.value.replace('\\"', "")
-        return super().set_cookie(cookie, *args, **kwargs)
+        with self._cookies_lock:
+            if self._shared:
+                self._unshare()
+            return super().set_cookie(cookie, *args, **kwargs)
+
+    def clear(self, domain=None, path=None, name=None):
+        with self._cookies_lock:
+            if self._shared:
+                self._unshare()
+            return super().clear(domain, path, name)
 
     def update(self, other):
         """Updates this jar with cookies from another CookieJar or dict-like"""
@@ -359,6 +377,23 @@ class RequestsCookieJar(CookieJar, MutableMapping):
         new_cj.update(self)
         return new_cj
 
+    def fork(self):
+        """Return a copy of this RequestsCookieJar which shares the cookies with it until either jar is changed
+        (copy-on-write). Changing a jar replaces cookies, the shared Cookie objects themselves are never modified.
+        """
+        with self._cookies_lock:
+            new_cj = RequestsCookieJar(self.get_policy())
+            new_cj._cookies = self._cookies
+            new_cj._shared = self._shared = True
+        return new_cj
+
+    def _unshare(self):
+        # requires self._cookies_lock, copies the domain -> path -> name structure, not the cookies
+        self._cookies = {
+            domain: {path: dict(names) for path, names in paths.items()} for domain, paths in self._cookies.items()
+        }
+        self._shared = False
+
     def get_policy(self):
         """Return the CookiePolicy instance used."""
         return self._policy
@@ -0,0 +1,188 @@
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .exceptions import TLSClientDeadlineExceeded
+from .timeouts import Deadline
+
+
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return False
+    return True
+
+
+def format_local_address(address: Optional[str]) -> Optional[str]:
+    """Local address in the host:port form of the TLS client, port 0 lets the system pick one."""
+    if not address:
+        return None
+    if address.startswith("["):
+        return address if "]:" in address else f"{address}:0"
+    if address.count(":") == 1:
+        # IPv4 with a port
+        return address
+    return f"[{address}]:0" if ":" in address else f"{address}:0"
+
+
+def system_resolver(host: str) -> List[str]:
+    """Addresses of a host in the order of the system resolver (getaddrinfo)."""
+    addresses = []
+    for family, _, _, _, sockaddr in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP):
+        if family in (socket.AF_INET, socket.AF_INET6) and sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+class _Entry:
+    def __init__(self, addresses: List[str], resolved_at: float, expires_at: float) -> None:
+        self.addresses = addresses
+        self.resolved_at = resolved_at
+        self.expires_at = expires_at
+        # Background refresh in progress
+        self.refresh: Optional[Future] = None
+
+
+class DNSCache:
+    """Caches the addresses of hosts, so requests connect to a known IP instead of resolving DNS again.
+
+    Entries are refreshed in the background once ``refresh_after`` of their ``ttl`` passed, requests keep using the
+    cached address meanwhile. Failed lookups are cached for ``negative_ttl`` seconds, requests to such hosts are left
+    to the TLS client. Addresses can also be pinned, pinned hosts never expire.
+
+    A session with a DNS cache sends the request to the IP and keeps the hostname for the SNI (serverNameOverwrite)
+    and the Host header (requestHostOverride). Requests through a proxy are not pinned, the proxy resolves the host.
+
+    Example:
+        session.dns_cache = DNSCache(ttl=300)
+        session.dns_cache.prefetch(["api.example.com", "cdn.example.com"])
+        session.dns_cache.pin("login.example.com", "203.0.113.7")
+    """
+
+    def __init__(self,
+                 ttl: float = 300.0,
+                 negative_ttl: float = 30.0,
+                 refresh_after: float = 0.75,
+                 resolver: Callable[[str], List[str]] = system_resolver,
+                 max_workers: int = 8
+                 ) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # Fraction of the ttl after which an entry is refreshed in the background
+        self.refresh_after = refresh_after
+        # Called with a hostname, returns its addresses (most preferred first)
+        self.resolver = resolver
+
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._pins: Dict[str, str] = {}
+        # Lookups in progress, concurrent lookups of the same host wait for the same result
+        self._pending: Dict[str, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tls-client-dns")
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    def pin(self, host: str, address: str) -> None:
+        with self._lock:
+            self._pins[host.lower()] = address
+
+    def unpin(self, host: str) -> None:
+        with self._lock:
+            self._pins.pop(host.lower(), None)
+
+    def _resolve(self, host: str) -> List[str]:
+        try:
+            addresses = self.resolver(host)
+        except (OSError, UnicodeError):
+            addresses = []
+        now = time.monotonic()
+        with self._lock:
+            self._pending.pop(host, None)
+            entry = self._entries.get(host)
+            if not addresses:
+                self.failures += 1
+                if entry is not None and entry.addresses and now < entry.expires_at:
+                    # a failed refresh keeps the previous addresses until they expire
+                    entry.refresh = None
+                    return entry.addresses
+            self._entries[host] = _Entry(addresses, now, now + (self.ttl if addresses else self.negative_ttl))
+        return addresses
+
+    def _submit(self, host: str) -> Future:
+        # requires self._lock
+        future = self._pending.get(host)
+        if future is None:
+            future = self._pending[host] = self._executor.submit(self._resolve, host)
+        return future
+
+    def prefetch(self, hosts: Iterable[str], wait: bool = False) -> None:
+        """Resolves hosts in the background (in parallel), e.g. the known hosts of a job before it starts."""
+        with self._lock:
+            futures = [self._submit(host.lower()) for host in hosts if not is_ip_address(host)]
+        if wait:
+            for future in futures:
+                future.result()
+
+    def lookup(self,
+               host: str,
+               ipv4: bool = True,
+               ipv6: bool = True,
+               deadline: Optional[Deadline] = None
+               ) -> Optional[str]:
+        """Address to connect to for a host, None if it couldn't be resolved (or is an IP address already). Raises
+        TLSClientDeadlineExceeded if the resolution doesn't finish before ``deadline``."""
+        host = host.lower()
+        if is_ip_address(host):
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            pinned = self._pins.get(host)
+            if pinned is not None:
+                return pinned
+
+            entry = self._entries.get(host)
+            if entry is not None and now < entry.expires_at:
+                self.hits += 1
+                stale = now - entry.resolved_at > self.ttl * self.refresh_after
+                if entry.addresses and stale and entry.refresh is None:
+                    self.refreshes += 1
+                    entry.refresh = self._submit(host)
+                addresses = entry.addresses
+                future = None
+            else:
+                self.misses += 1
+                future = self._submit(host)
+
+        if future is not None:
+            try:
+                addresses = future.result(None if deadline is None else max(0.0, deadline.remaining()))
+            except FutureTimeoutError:
+                raise TLSClientDeadlineExceeded(f"Deadline exceeded while resolving {host}") from None
+
+        for address in addresses:
+            if (ipv4 and ":" not in address) or (ipv6 and ":" in address):
+                return address
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {"addresses": list(entry.addresses), "expires_in": entry.expires_at - now}
+                for host, entry in self._entries.items()
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
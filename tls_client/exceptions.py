@@ -1,2 +1,98 @@
+import re
+
+
 class TLSClientException(IOError):
     """General error with the TLS client"""
+
+
+class TLSClientTimeout(TLSClientException):
+    """The request timed out"""
+
+
+class TLSClientDeadlineExceeded(TLSClientTimeout):
+    """The deadline of the request (across its redirects and retries) passed"""
+
+
+class TLSClientConnectionError(TLSClientException):
+    """The connection to the remote host could not be established or was lost"""
+
+
+class TLSClientConnectionRefused(TLSClientConnectionError):
+    """The remote host refused the connection"""
+
+
+class TLSClientConnectionReset(TLSClientConnectionError):
+    """The connection was reset or closed unexpectedly"""
+
+
+class TLSClientDNSError(TLSClientConnectionError):
+    """The hostname could not be resolved"""
+
+
+class TLSClientProxyError(TLSClientConnectionError):
+    """The proxy could not be reached or refused the request"""
+
+
+class TLSClientTLSError(TLSClientException):
+    """The TLS handshake or the certificate verification failed. Not a connection error, so it isn't retried by
+    default: the same certificate fails again."""
+
+
+class TLSClientResponseAborted(TLSClientException):
+    """The response was rejected by the header predicate (accept_headers) or its size (max_body_size). Streamed
+    responses are rejected before their body is downloaded, buffered ones after the TLS client spooled the body to
+    disk but before it is read into memory."""
+
+    def __init__(self, message, url=None, status_code=None, headers=None, size=None):
+        super().__init__(message)
+        self.url = url
+        self.status_code = status_code
+        # Headers received so far (CaseInsensitiveDict)
+        self.headers = headers
+        # Body bytes received so far, None if unknown
+        self.size = size
+
+
+class TLSClientBodyTooLarge(TLSClientResponseAborted):
+    """The response body exceeds max_body_size"""
+
+
+class TLSClientCircuitOpen(TLSClientException):
+    """The circuit breaker of the host or proxy is open, the request was not sent"""
+
+    def __init__(self, message, key=None, retry_after=None):
+        super().__init__(message)
+        # Circuit which rejected the request, "host:<hostname>" or "proxy:<host>:<port>"
+        self.key = key
+        # Seconds until the circuit lets probe requests through
+        self.retry_after = retry_after
+
+
+# Substrings of the Go error messages, checked in order. The first match decides the exception type.
+_ERROR_PATTERNS = (
+    (TLSClientProxyError, ("proxyconnect", "proxy responded", "socks connect", "proxy authentication", "proxy:")),
+    (TLSClientTimeout, ("timeout", "deadline exceeded", "timed out")),
+    (TLSClientDNSError, ("no such host", "server misbehaving", "dns", "lookup ")),
+    (TLSClientConnectionRefused, ("connection refused", "actively refused")),
+    (TLSClientTLSError, ("tls:", "x509:", "certificate", "handshake", "bad record mac")),
+    (TLSClientConnectionReset, (
+        "connection reset", "broken pipe", "eof", "forcibly closed", "goaway", "connection was aborted",
+        "use of closed network connection", "stream error",
+    )),
+    (TLSClientConnectionError, ("dial tcp", "network is unreachable", "no route to host", "connect:")),
+)
+
+
+# Parts of a Go error message which come from the request rather than the error: the (quoted) url of the request,
+# e.g. 'Post "https://dns-api.example.com/x": EOF', and the host of a failed lookup
+_REQUEST_PARTS = re.compile(r'"[^"]*"|\b[a-z][a-z0-9+.-]*://\S+|(?<=lookup )\S+', re.IGNORECASE)
+
+
+def classify_error(message: str) -> TLSClientException:
+    """Maps a raw Go error message of the TLS client to a typed exception. Only the error itself is matched, not the
+    url or the hostnames in the message."""
+    lowered = _REQUEST_PARTS.sub("", message).lower()
+    for exception_class, patterns in _ERROR_PATTERNS:
+        if any(pattern in lowered for pattern in patterns):
+            return exception_class(message)
+    return TLSClientException(message)
@@ -0,0 +1,217 @@
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .coalescing import IDEMPOTENT_METHODS
+from .exceptions import TLSClientDeadlineExceeded
+from .timeouts import Deadline
+
+
+class Hedger:
+    """Hedged requests: a second copy of an idempotent request is sent if the first one is slow.
+
+    The hedge is sent after a fixed ``delay`` or, once enough samples were collected, after the learned
+    ``percentile`` of the observed latencies. It runs on a separate Go session (its own connections) and on the next
+    proxy of ``proxies`` if given. The first successful response wins, the late one is discarded.
+
+    A request which can't be hedged (the hedge ratio is used up) runs on the calling thread. Otherwise the first
+    attempt gets a thread of its own, so hedging never limits how many requests run at once, and hedges run on a pool
+    of ``max_workers`` threads.
+
+    Example:
+        session.hedger = Hedger(delay=0.5, percentile=0.95, proxies=["http://proxy-2:8080", "http://proxy-3:8080"])
+    """
+
+    def __init__(self,
+                 delay: Optional[float] = 1.0,
+                 percentile: Optional[float] = 0.95,
+                 min_delay: float = 0.01,
+                 max_delay: Optional[float] = None,
+                 methods: Iterable[str] = IDEMPOTENT_METHODS,
+                 proxies: Optional[List[str]] = None,
+                 max_hedge_ratio: float = 0.1,
+                 window: int = 1000,
+                 min_samples: int = 50,
+                 max_workers: int = 32,
+                 ) -> None:
+        if delay is None and percentile is None:
+            raise ValueError("Either a delay or a latency percentile is required for hedging")
+
+        # Hedge delay in seconds, used until enough latencies were observed (or always, if percentile is None)
+        self.delay = delay
+        # Latency percentile after which a hedge is sent, e.g. 0.95
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+        self.methods = frozenset(method.upper() for method in methods)
+
+        # Alternative proxies for hedges, None sends hedges over the proxy of the original request
+        self.proxies = proxies
+        self._proxy_cycle = itertools.cycle(proxies) if proxies else None
+
+        # Upper bound for hedges / requests, so hedging can't double the load during an outage
+        self.max_hedge_ratio = max_hedge_ratio
+
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._learned_delay: Optional[float] = None
+        self._samples_since_update = 0
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tls-client-hedge")
+
+        # Metrics
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.discarded = 0
+
+    def should_hedge(self, method: str) -> bool:
+        return method.upper() in self.methods
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            delay = self._learned_delay if self._learned_delay is not None else self.delay
+            if delay is None:
+                # no fixed delay and not enough samples yet, wait for the longest latency seen so far
+                delay = max(self._latencies, default=self.max_delay or 1.0)
+        delay = max(self.min_delay, delay)
+        if self.max_delay is not None:
+            delay = min(self.max_delay, delay)
+        return delay
+
+    def hedge_proxy(self, proxy: str) -> str:
+        if self._proxy_cycle is None:
+            return proxy
+        with self._lock:
+            for _ in range(len(self.proxies)):
+                candidate = next(self._proxy_cycle)
+                if candidate != proxy:
+                    return candidate
+        return proxy
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            self._samples_since_update += 1
+            if self.percentile is None or len(self._latencies) < self.min_samples:
+                return
+            if self._learned_delay is not None and self._samples_since_update < self.min_samples:
+                return
+            samples = sorted(self._latencies)
+            self._learned_delay = samples[min(len(samples) - 1, int(len(samples) * self.percentile))]
+            self._samples_since_update = 0
+
+    def execute(self,
+                send: Callable[[], Any],
+                send_hedge: Callable[[], Any],
+                discard: Optional[Callable[[Any], None]] = None,
+                deadline: Optional[Deadline] = None
+                ) -> Any:
+        """Runs ``send`` and, if it is slow, ``send_hedge``. Returns the result of the first successful call, the
+        result of the other one is passed to ``discard`` once it is available. Raises TLSClientDeadlineExceeded if
+        neither succeeded before ``deadline``."""
+        with self._lock:
+            self.requests += 1
+            hedge_allowed = self.hedged < self.requests * self.max_hedge_ratio
+
+        if not hedge_allowed:
+            started = time.perf_counter()
+            result = send()
+            self.record_latency(time.perf_counter() - started)
+            return result
+
+        primary: Future = Future()
+        # started right away instead of being queued, so the hedge delay only counts the time of the request
+        started = time.perf_counter()
+        threading.Thread(
+            target=self._run_primary, args=(primary, send, started), name="tls-client-hedge-primary", daemon=True
+        ).start()
+
+        delay = self.hedge_delay()
+        if deadline is not None:
+            delay = min(delay, max(0.0, deadline.remaining()))
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        if deadline is not None and deadline.expired():
+            raise self._abandon([primary], discard)
+
+        hedge = self._executor.submit(send_hedge)
+        with self._lock:
+            self.hedged += 1
+
+        pending = {primary, hedge}
+        winner = None
+        error = None
+        while pending and winner is None:
+            timeout = None if deadline is None else max(0.0, deadline.remaining())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # the hedge may still be queued behind other hedges
+                raise self._abandon(pending, discard)
+            for future in done:
+                if future.exception() is None:
+                    winner = future
+                    break
+                error = future.exception()
+
+        if winner is None:
+            raise error
+
+        with self._lock:
+            if winner is hedge:
+                self.hedge_wins += 1
+            else:
+                self.primary_wins += 1
+        loser = primary if winner is hedge else hedge
+        loser.add_done_callback(lambda future: self._discard(future, discard))
+        return winner.result()
+
+    def _abandon(self,
+                 futures: Iterable[Future],
+                 discard: Optional[Callable[[Any], None]]
+                 ) -> TLSClientDeadlineExceeded:
+        """Gives up the attempts still running (or queued) at the deadline, their results are discarded."""
+        for future in futures:
+            if not future.cancel():
+                future.add_done_callback(lambda done: self._discard(done, discard))
+        return TLSClientDeadlineExceeded("Deadline exceeded while waiting for a hedged request")
+
+    def _run_primary(self, future: Future, send: Callable[[], Any], started: float) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = send()
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        self.record_latency(time.perf_counter() - started)
+        future.set_result(result)
+
+    def _discard(self, future: Future, discard: Optional[Callable[[Any], None]]) -> None:
+        with self._lock:
+            self.discarded += 1
+        if discard is not None and not future.cancelled() and future.exception() is None:
+            discard(future.result())
+
+    def stats(self) -> Dict[str, float]:
+        hedge_delay = self.hedge_delay()
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "primary_wins": self.primary_wins,
+                "discarded": self.discarded,
+                "hedge_delay": hedge_delay,
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,26 @@
+"""Event hooks of a session.
+
+Available hooks:
+
+``on_request``:
+    The request payload, right before it is handed to the TLS client. ``hook(request_payload)``
+``on_response``:
+    The response of every request, including redirect hops. ``hook(response)``
+``on_redirect``:
+    A redirect which is about to be followed. ``hook(response, next_url)``
+``on_error``:
+    The exception of a failed request. ``hook(exception, request_payload)``
+"""
+from typing import Any, Callable, Dict, List
+
+HOOKS = ["on_request", "on_response", "on_redirect", "on_error"]
+
+
+def default_hooks() -> Dict[str, List[Callable]]:
+    return {event: [] for event in HOOKS}
+
+
+def dispatch_hook(key: str, hooks: Dict[str, List[Callable]], *hook_data: Any) -> None:
+    """Dispatches a hook to every registered callback."""
+    for hook in hooks.get(key) or ():
+        hook(*hook_data)
@@ -0,0 +1,208 @@
+import atexit
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from .sessions import Session
+    from .transport import Transport
+
+
+class SessionRegistry:
+    """Tracks the sessions which hold state in the TLS client shared library.
+
+    The Go state of a session (connections, TLS session cache) is created by its first request and freed by
+    ``destroySession``. The registry bounds the number of live Go sessions: if ``max_sessions`` is exceeded the least
+    recently used idle session is destroyed, and sessions idle for longer than ``idle_ttl`` seconds are reaped in the
+    background. The extra Go sessions of a session (hedges, pinned DNS addresses) count towards ``max_sessions`` and
+    are destroyed with it. An evicted session keeps working, its Go state is recreated by its next request (cookies
+    are sent with every request, only open connections are lost). The FFI calls destroying a session run without the
+    registry lock. At exit ``destroyAll`` is called once and sessions are no longer closed one by one through the FFI.
+
+    Example:
+        tls_client.lifecycle.default_registry.configure(max_sessions=500, idle_ttl=300)
+    """
+
+    def __init__(self,
+                 max_sessions: Optional[int] = None,
+                 idle_ttl: Optional[float] = None,
+                 reap_interval: float = 30.0
+                 ) -> None:
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.reap_interval = reap_interval
+
+        # Set once the interpreter shuts down, sessions must not call into the shared library afterwards
+        self.finalizing = False
+
+        self._lock = threading.Lock()
+        # notified when a session was evicted, its next request waits until the Go state is destroyed
+        self._evicted = threading.Condition(self._lock)
+        # ids of the closed sessions, unregister runs from __del__ (the garbage collector may run while self._lock is
+        # held by the same thread) and only queues them, they are removed under the lock by the next registry call
+        self._unregistered: Deque[str] = deque()
+        # session id -> weak reference, in least recently used order
+        self._live: "OrderedDict[str, weakref.ref]" = OrderedDict()
+        # session id -> ids of the extra Go sessions it created (hedge session, per-host DNS sessions)
+        self._extra: Dict[str, Set[str]] = {}
+        self._transports: "weakref.WeakSet[Transport]" = weakref.WeakSet()
+        self._reaper: Optional[threading.Thread] = None
+        self._reaper_stop = threading.Event()
+
+        self.evicted = 0
+        self.reaped = 0
+
+        atexit.register(self.shutdown)
+
+    def configure(self,
+                  max_sessions: Optional[int] = None,
+                  idle_ttl: Optional[float] = None,
+                  reap_interval: Optional[float] = None
+                  ) -> None:
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        if reap_interval is not None:
+            self.reap_interval = reap_interval
+        self._evict()
+
+    @property
+    def live_sessions(self) -> int:
+        """Number of live Go sessions, including the extra sessions of hedges and pinned DNS addresses."""
+        with self._lock:
+            self._drain_unregistered()
+            return self._count()
+
+    def _drain_unregistered(self) -> None:
+        # requires self._lock
+        while self._unregistered:
+            session_id = self._unregistered.popleft()
+            self._live.pop(session_id, None)
+            self._extra.pop(session_id, None)
+
+    def _count(self) -> int:
+        # requires self._lock
+        return len(self._live) + sum(len(extra) for extra in self._extra.values())
+
+    def acquire(self, session: "Session") -> None:
+        """Marks a session as used, called before it sends a request."""
+        with self._lock:
+            self._drain_unregistered()
+            while session._evicting:
+                self._evicted.wait()
+            session._active_requests += 1
+            session._last_used = time.monotonic()
+            session_id = session._session_id
+            if session_id in self._live:
+                self._live.move_to_end(session_id)
+            else:
+                self._live[session_id] = weakref.ref(session)
+                self._transports.add(session.transport)
+            over_limit = self.max_sessions is not None and self._count() > self.max_sessions
+        if over_limit:
+            self._evict()
+        if self.idle_ttl is not None and self._reaper is None:
+            self._start_reaper()
+
+    def add_go_session(self, session: "Session", go_session_id: str) -> None:
+        """Registers an extra Go session created by a session in use (between acquire and release)."""
+        with self._lock:
+            self._drain_unregistered()
+            if session._session_id not in self._live:
+                return
+            extra = self._extra.setdefault(session._session_id, set())
+            if go_session_id in extra:
+                return
+            extra.add(go_session_id)
+            over_limit = self.max_sessions is not None and self._count() > self.max_sessions
+        if over_limit:
+            self._evict()
+
+    def release(self, session: "Session") -> None:
+        with self._lock:
+            session._active_requests -= 1
+            session._last_used = time.monotonic()
+
+    def unregister(self, session: "Session") -> None:
+        # called from Session.__del__, must not take self._lock
+        self._unregistered.append(session._session_id)
+
+    def _evict(self, now: Optional[float] = None) -> None:
+        victims: List[Tuple["Session", bool]] = []
+        with self._lock:
+            self._drain_unregistered()
+            excess = self._count() - self.max_sessions if self.max_sessions is not None else 0
+            for session_id, reference in list(self._live.items()):
+                session = reference()
+                if session is None:
+                    del self._live[session_id]
+                    excess -= 1 + len(self._extra.pop(session_id, ()))
+                    continue
+                if session._active_requests:
+                    continue
+                idle = now is not None and self.idle_ttl is not None and now - session._last_used > self.idle_ttl
+                if excess > 0 or idle:
+                    del self._live[session_id]
+                    victims.append((session, excess > 0))
+                    if excess > 0:
+                        excess -= 1 + len(self._extra.get(session_id, ()))
+                elif now is None:
+                    # least recently used first, the remaining sessions are more recent
+                    break
+
+        for session, evicted in victims:
+            with self._lock:
+                # a request which started after the session was chosen registered it again, it must keep its state
+                if session._active_requests or session._session_id in self._live:
+                    continue
+                self._extra.pop(session._session_id, None)
+                session._evicting = True
+            # the FFI call runs without the lock, requests of the session wait in acquire until it is done
+            try:
+                session._destroy_go_state()
+            finally:
+                with self._lock:
+                    session._evicting = False
+                    if evicted:
+                        self.evicted += 1
+                    else:
+                        self.reaped += 1
+                    self._evicted.notify_all()
+
+    def _start_reaper(self) -> None:
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, name="tls-client-session-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self) -> None:
+        while not self._reaper_stop.wait(self.reap_interval):
+            if self.idle_ttl is not None:
+                self._evict(time.monotonic())
+
+    def shutdown(self) -> None:
+        """Destroys every Go session at once, called at exit."""
+        if self.finalizing:
+            return
+        self.finalizing = True
+        self._reaper_stop.set()
+        with self._lock:
+            transports = list(self._transports)
+            self._live.clear()
+            self._extra.clear()
+        for transport in transports:
+            try:
+                transport.destroy_all()
+            except Exception:
+                pass
+
+
+# Registry of every session which isn't given its own
+default_registry = SessionRegistry()
+
+
+def is_finalizing(registry: Optional[SessionRegistry]) -> bool:
+    return sys.is_finalizing() or (registry is not None and registry.finalizing)
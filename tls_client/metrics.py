@@ -0,0 +1,320 @@
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .response import Response
+
+# Bucket boundaries (seconds) used for the OpenMetrics export of the latency histograms
+DEFAULT_EXPORT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).netloc or url).lower()
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of integer values (microseconds by default).
+
+    Values below ``2 ** precision_bits`` are recorded exactly, larger values within a relative error of
+    ``2 ** -(precision_bits - 1)`` (~1.6% with the default of 7 bits). Histograms with the same precision can be merged,
+    also across processes through ``to_dict`` / ``from_dict``.
+    """
+
+    def __init__(self, precision_bits: int = 7) -> None:
+        self.precision_bits = precision_bits
+        self._sub_buckets = 1 << precision_bits
+        self._half = self._sub_buckets >> 1
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def _index(self, value: int) -> int:
+        if value < self._sub_buckets:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return self._sub_buckets + (shift - 1) * self._half + (value >> shift) - self._half
+
+    def _bounds(self, index: int) -> Tuple[int, int]:
+        if index < self._sub_buckets:
+            return index, index
+        shift, offset = divmod(index - self._sub_buckets, self._half)
+        shift += 1
+        mantissa = offset + self._half
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        value = max(0, int(value))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        if other.precision_bits != self.precision_bits:
+            raise ValueError("Histograms with different precision can't be merged")
+        for index, count in list(other.counts.items()):
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def percentile(self, percentile: float) -> Optional[int]:
+        """Returns the value at ``percentile`` (0-100), the upper bound of its bucket capped by the maximum."""
+        if not self.count:
+            return None
+        threshold = max(1, int(round(self.count * percentile / 100.0)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                return min(self._bounds(index)[1], self.max)
+        return self.max
+
+    def cumulative_counts(self, bounds: Iterable[int]) -> List[int]:
+        """Number of recorded values lower or equal to each of the (sorted) ``bounds``."""
+        items = sorted((self._bounds(index)[1], count) for index, count in self.counts.items())
+        result = []
+        seen = 0
+        position = 0
+        for bound in bounds:
+            while position < len(items) and items[position][0] <= bound:
+                seen += items[position][1]
+                position += 1
+            result.append(seen)
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "precision_bits": self.precision_bits,
+            "counts": dict(self.counts),
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls(data["precision_bits"])
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class _HostMetrics:
+    def __init__(self, precision_bits: int) -> None:
+        self.requests = 0
+        self.errors: Dict[str, int] = {}
+        self.status_classes: Dict[str, int] = {}
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.redirects = 0
+        self.in_flight = 0
+        self.latency = LatencyHistogram(precision_bits)
+
+
+class _ShardHolder:
+    # only referenced by the thread-local of its thread, its shard is retired once the thread is gone
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self) -> None:
+        self.shard: Dict[str, _HostMetrics] = {}
+
+
+def _merge_shard(total: Dict[str, _HostMetrics], shard: Dict[str, _HostMetrics], precision_bits: int) -> None:
+    for host, metrics in list(shard.items()):
+        merged = total.get(host)
+        if merged is None:
+            merged = total[host] = _HostMetrics(precision_bits)
+        merged.requests += metrics.requests
+        merged.bytes_out += metrics.bytes_out
+        merged.bytes_in += metrics.bytes_in
+        merged.redirects += metrics.redirects
+        merged.in_flight += metrics.in_flight
+        for key, count in list(metrics.errors.items()):
+            merged.errors[key] = merged.errors.get(key, 0) + count
+        for key, count in list(metrics.status_classes.items()):
+            merged.status_classes[key] = merged.status_classes.get(key, 0) + count
+        merged.latency.merge(metrics.latency)
+
+
+def _retire(collector: "weakref.ref[MetricsCollector]", shard: Dict[str, _HostMetrics]) -> None:
+    # the finalizers of the thread shards only hold a weak reference, they don't keep the collector alive
+    collector = collector()
+    if collector is not None:
+        collector._retire(shard)
+
+
+class MetricsCollector:
+    """Aggregated per-host request metrics.
+
+    Every thread records into its own shard, so recording never takes a lock. ``snapshot`` and ``to_openmetrics``
+    merge the shards of all threads. The shard of a thread which exited is folded into one retired aggregate. A
+    collector can be shared between sessions.
+
+    Example:
+        session.metrics = MetricsCollector()
+        ...
+        print(session.metrics.to_openmetrics())
+    """
+
+    def __init__(self, precision_bits: int = 7, export_buckets: Iterable[float] = DEFAULT_EXPORT_BUCKETS) -> None:
+        self.precision_bits = precision_bits
+        self.export_buckets = tuple(sorted(export_buckets))
+        self._local = threading.local()
+        self._shards: List[Dict[str, _HostMetrics]] = []
+        # metrics of the threads which exited
+        self._retired: Dict[str, _HostMetrics] = {}
+        self._shards_lock = threading.Lock()
+
+    def _host(self, host: str) -> _HostMetrics:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._local.holder = _ShardHolder()
+            with self._shards_lock:
+                self._shards.append(holder.shard)
+            weakref.finalize(holder, _retire, weakref.ref(self), holder.shard)
+        shard = holder.shard
+        metrics = shard.get(host)
+        if metrics is None:
+            metrics = shard[host] = _HostMetrics(self.precision_bits)
+        return metrics
+
+    def request_started(self, url: str) -> str:
+        host = host_of(url)
+        metrics = self._host(host)
+        metrics.requests += 1
+        metrics.in_flight += 1
+        return host
+
+    def request_finished(self,
+                         host: str,
+                         duration_ns: int,
+                         response: Optional[Response] = None,
+                         error: Optional[BaseException] = None
+                         ) -> None:
+        metrics = self._host(host)
+        metrics.in_flight -= 1
+        metrics.latency.record(duration_ns // 1000)
+        if response is not None:
+            status_class = f"{response.status_code // 100}xx"
+            metrics.status_classes[status_class] = metrics.status_classes.get(status_class, 0) + 1
+            metrics.bytes_out += response.request_body_size
+            metrics.bytes_in += response.body_size
+        if error is not None:
+            error_type = type(error).__name__
+            metrics.errors[error_type] = metrics.errors.get(error_type, 0) + 1
+
+    def record_redirect(self, url: str) -> None:
+        self._host(host_of(url)).redirects += 1
+
+    def _retire(self, shard: Dict[str, _HostMetrics]) -> None:
+        with self._shards_lock:
+            self._shards = [other for other in self._shards if other is not shard]
+            _merge_shard(self._retired, shard, self.precision_bits)
+
+    def _merged(self) -> Dict[str, _HostMetrics]:
+        merged: Dict[str, _HostMetrics] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+            _merge_shard(merged, self._retired, self.precision_bits)
+
+        for shard in shards:
+            _merge_shard(merged, shard, self.precision_bits)
+        return merged
+
+    def histogram(self, host: str) -> LatencyHistogram:
+        """Merged latency histogram (microseconds) of a host."""
+        metrics = self._merged().get(host.lower())
+        return metrics.latency if metrics is not None else LatencyHistogram(self.precision_bits)
+
+    def snapshot(self) -> Dict[str, dict]:
+        result = {}
+        for host, metrics in self._merged().items():
+            latency = metrics.latency
+            result[host] = {
+                "requests": metrics.requests,
+                "errors": metrics.errors,
+                "status_classes": metrics.status_classes,
+                "bytes_out": metrics.bytes_out,
+                "bytes_in": metrics.bytes_in,
+                "redirects": metrics.redirects,
+                "in_flight": metrics.in_flight,
+                "latency_us": {
+                    "count": latency.count,
+                    "min": latency.min,
+                    "max": latency.max,
+                    "mean": latency.total / latency.count if latency.count else None,
+                    "p50": latency.percentile(50),
+                    "p90": latency.percentile(90),
+                    "p99": latency.percentile(99),
+                    "p999": latency.percentile(99.9),
+                },
+                "histogram": latency.to_dict(),
+            }
+        return result
+
+    def to_openmetrics(self, prefix: str = "tls_client") -> str:
+        merged = self._merged()
+        lines = []
+
+        def family(name: str, metric_type: str, help_text: str) -> None:
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+
+        family("requests", "counter", "Requests sent to the TLS client, including redirect hops and retries.")
+        for host, metrics in merged.items():
+            lines.append(f'{prefix}_requests_total{{host="{host}"}} {metrics.requests}')
+
+        family("responses", "counter", "Responses by status class.")
+        for host, metrics in merged.items():
+            for status_class, count in sorted(metrics.status_classes.items()):
+                lines.append(f'{prefix}_responses_total{{host="{host}",status_class="{status_class}"}} {count}')
+
+        family("errors", "counter", "Failed requests by exception type.")
+        for host, metrics in merged.items():
+            for error_type, count in sorted(metrics.errors.items()):
+                lines.append(f'{prefix}_errors_total{{host="{host}",type="{error_type}"}} {count}')
+
+        family("sent_bytes", "counter", "Bytes of request bodies (as sent, after compression).")
+        for host, metrics in merged.items():
+            lines.append(f'{prefix}_sent_bytes_total{{host="{host}"}} {metrics.bytes_out}')
+
+        family("received_bytes", "counter", "Bytes of response bodies (as received, before lazy decompression).")
+        for host, metrics in merged.items():
+            lines.append(f'{prefix}_received_bytes_total{{host="{host}"}} {metrics.bytes_in}')
+
+        family("redirects", "counter", "Followed redirects.")
+        for host, metrics in merged.items():
+            lines.append(f'{prefix}_redirects_total{{host="{host}"}} {metrics.redirects}')
+
+        family("in_flight", "gauge", "Requests currently executed by the TLS client.")
+        for host, metrics in merged.items():
+            lines.append(f'{prefix}_in_flight{{host="{host}"}} {metrics.in_flight}')
+
+        family("request_duration_seconds", "histogram", "Duration of the TLS client requests.")
+        for host, metrics in merged.items():
+            latency = metrics.latency
+            bounds = [int(bucket * 1_000_000) for bucket in self.export_buckets]
+            for bucket, count in zip(self.export_buckets, latency.cumulative_counts(bounds)):
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{host="{host}",le="{bucket}"}} {count}')
+            lines.append(f'{prefix}_request_duration_seconds_bucket{{host="{host}",le="+Inf"}} {latency.count}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{host="{host}"}} {latency.count}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{host="{host}"}} {latency.total / 1_000_000}')
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
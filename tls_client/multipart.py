@@ -0,0 +1,208 @@
+import binascii
+import io
+import os
+import threading
+import uuid
+from json import dumps
+from typing import Any, BinaryIO, Iterator, List, Optional, Tuple, Union
+
+# Size of the blocks read from files, a multiple of 3 so every block encodes to base64 without padding
+CHUNK_SIZE = 3 * 64 * 1024
+
+
+def _quote(value: str) -> str:
+    # HTML5 escaping of multipart parameters, like browsers (and urllib3) do
+    return value.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+def _to_bytes(value: Any) -> bytes:
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return str(value).encode("utf-8")
+
+
+class _FilePart:
+    """Content of a part which is read from a path or a file object when the body is produced."""
+
+    def __init__(self, source: Union[os.PathLike, BinaryIO]) -> None:
+        if isinstance(source, os.PathLike):
+            self.path: Optional[str] = os.fspath(source)
+            self.file: Optional[BinaryIO] = None
+            self.start = 0
+            self.length = os.path.getsize(self.path)
+            return
+
+        self.path = None
+        self.file = source
+        try:
+            self.start = source.tell()
+            self.length = source.seek(0, io.SEEK_END) - self.start
+            source.seek(self.start)
+        except (AttributeError, OSError, ValueError):
+            # not seekable, the content has to be buffered to know its length and to send it more than once
+            self.file = io.BytesIO(source.read())
+            self.start = 0
+            self.length = len(self.file.getvalue())
+
+    def __len__(self) -> int:
+        return self.length
+
+    def iter_chunks(self, buffer: bytearray) -> Iterator[memoryview]:
+        view = memoryview(buffer)
+        if self.path is not None:
+            f = open(self.path, "rb", buffering=0)
+        else:
+            f = self.file
+            f.seek(self.start)
+        try:
+            remaining = self.length
+            while remaining > 0:
+                read = f.readinto(view[:min(remaining, len(view))])
+                if not read:
+                    raise IOError(f"file ended {remaining} bytes before its expected length")
+                remaining -= read
+                yield view[:read]
+        finally:
+            if self.path is not None:
+                f.close()
+
+
+class MultipartEncoder:
+    """Produces a multipart/form-data body incrementally, without loading the files it uploads into memory.
+
+    ``fields`` and ``files`` take the same values as with requests. File contents can be file objects, ``str`` or
+    ``bytes`` contents and additionally ``os.PathLike`` paths (e.g. ``pathlib.Path``), which are opened whenever the
+    body is produced. The length of the body is known upfront, so the request payload for the TLS client can be
+    allocated once and filled in place. The body can be produced more than once (redirects, retries).
+
+    Example:
+        session.post("https://example.com/upload", files={"file": pathlib.Path("video.mp4")})
+        session.post("https://example.com/upload", data={"name": "video"}, files={
+            "file": ("video.mp4", open("video.mp4", "rb"), "video/mp4")
+        })
+    """
+
+    def __init__(self,
+                 fields: Optional[Union[dict, List[Tuple[str, Any]]]] = None,
+                 files: Optional[Union[dict, List[Tuple[str, Any]]]] = None,
+                 boundary: Optional[str] = None,
+                 chunk_size: int = CHUNK_SIZE
+                 ) -> None:
+        self.boundary = boundary or uuid.uuid4().hex
+        self.chunk_size = chunk_size - chunk_size % 3 or 3
+        self._boundary = self.boundary.encode("ascii")
+        # every part is a header block followed by its content (bytes or a _FilePart)
+        self._parts: List[Tuple[bytes, Union[bytes, _FilePart]]] = []
+        # file objects are shared between every production of the body
+        self._lock = threading.Lock()
+
+        for name, value in self._items(fields):
+            for item in value if isinstance(value, (list, tuple)) else [value]:
+                self._add_part(name, None, _to_bytes(item), None, None)
+
+        for name, value in self._items(files):
+            filename, content_type, headers = None, None, None
+            if isinstance(value, (list, tuple)):
+                if len(value) == 2:
+                    filename, value = value
+                elif len(value) == 3:
+                    filename, value, content_type = value
+                else:
+                    filename, value, content_type, headers = value
+            if isinstance(value, (str, bytes, bytearray)):
+                content: Union[bytes, _FilePart] = _to_bytes(value)
+                filename = name if filename is None else filename
+            else:
+                content = _FilePart(value)
+                if filename is None:
+                    filename = os.fspath(value) if content.path else getattr(value, "name", None)
+                    filename = os.path.basename(filename) if isinstance(filename, str) else name
+            self._add_part(name, filename, content, content_type, headers)
+
+        self._closing = b"--" + self._boundary + b"--\r\n"
+        self.content_length = sum(len(header) + len(content) + 2 for header, content in self._parts)
+        self.content_length += len(self._closing)
+
+    @staticmethod
+    def _items(values: Optional[Union[dict, List[Tuple[str, Any]]]]) -> List[Tuple[str, Any]]:
+        if values is None:
+            return []
+        if isinstance(values, dict):
+            return list(values.items())
+        return list(values)
+
+    def _add_part(self,
+                  name: str,
+                  filename: Optional[str],
+                  content: Union[bytes, _FilePart],
+                  content_type: Optional[str],
+                  headers: Optional[dict]
+                  ) -> None:
+        disposition = f'form-data; name="{_quote(str(name))}"'
+        if filename is not None:
+            disposition += f'; filename="{_quote(str(filename))}"'
+        lines = [f"--{self.boundary}", f"Content-Disposition: {disposition}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines.extend(f"{key}: {value}" for key, value in (headers or {}).items())
+        self._parts.append((("\r\n".join(lines) + "\r\n\r\n").encode("utf-8"), content))
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self.content_length
+
+    def __iter__(self) -> Iterator[Union[bytes, memoryview]]:
+        """Yields the body in blocks, views into a reused buffer are only valid until the next block."""
+        buffer = bytearray(self.chunk_size)
+        with self._lock:
+            for header, content in self._parts:
+                yield header
+                if isinstance(content, bytes):
+                    yield content
+                else:
+                    yield from content.iter_chunks(buffer)
+                yield b"\r\n"
+            yield self._closing
+
+    def to_bytes(self) -> bytes:
+        return b"".join(bytes(chunk) for chunk in self)
+
+    def encode_payload(self, request_payload: dict) -> bytearray:
+        """Encodes the request payload for the TLS client with this body as base64 ``requestBody``.
+
+        The payload is allocated once with its final size and the body is base64 encoded into it block by block,
+        instead of holding the body, its base64 encoding and the JSON document as separate copies.
+        """
+        marker = f"multipart-{uuid.uuid4().hex}"
+        document = dumps(dict(request_payload, requestBody=marker)).encode("utf-8")
+        prefix, suffix = document.split(f'"{marker}"'.encode("ascii"), 1)
+
+        encoded_length = (self.content_length + 2) // 3 * 4
+        payload = bytearray(len(prefix) + encoded_length + len(suffix) + 2)
+        position = len(prefix)
+        payload[:position] = prefix
+        payload[position] = ord('"')
+        position += 1
+
+        # base64 works on groups of 3 bytes, the remainder of a block is carried over to the next one
+        carry = b""
+        for chunk in self:
+            if carry:
+                chunk = carry + bytes(chunk)
+            usable = len(chunk) - len(chunk) % 3
+            if usable:
+                encoded = binascii.b2a_base64(chunk[:usable], newline=False)
+                payload[position:position + len(encoded)] = encoded
+                position += len(encoded)
+            carry = bytes(chunk[usable:])
+        if carry:
+            encoded = binascii.b2a_base64(carry, newline=False)
+            payload[position:position + len(encoded)] = encoded
+            position += len(encoded)
+
+        payload[position] = ord('"')
+        payload[position + 1:] = suffix
+        return payload
@@ -0,0 +1,310 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .exceptions import TLSClientException
+from .response import Response
+from .sessions import Session
+
+AFFINITIES = ("host", "session", None)
+
+
+# --- Worker process ---------------------------------------------------------------------------------------------------
+
+def _pack(response: Response, shm_threshold: int) -> Tuple[dict, Any]:
+    """Metadata and body of a response, bodies of shm_threshold bytes and more are written to shared memory."""
+    meta = {
+        "url": response.url,
+        "status_code": response.status_code,
+        "headers": response.headers,
+        "encoding": response.encoding,
+        "cookies": response.cookies,
+        "elapsed": response.elapsed,
+        "timings": response.timings,
+        "request_size": response.request_size,
+        "response_size": response.response_size,
+        "request_body_size": response.request_body_size,
+    }
+    body = response.content
+    if len(body) < shm_threshold:
+        # spilled bodies are memoryviews of a mapped file
+        return meta, bytes(body)
+    shm = SharedMemory(create=True, size=len(body))
+    try:
+        shm.buf[:len(body)] = body
+    finally:
+        shm.close()
+    # the parent unlinks the block once it copied the body
+    return meta, (shm.name, len(body))
+
+
+def _worker_main(conn: Connection, session_factory: Callable[[], Session], threads: int, shm_threshold: int) -> None:
+    sessions: Dict[Hashable, Session] = {}
+    sessions_lock = threading.Lock()
+    send_lock = threading.Lock()
+
+    def session_for(key: Hashable) -> Session:
+        with sessions_lock:
+            session = sessions.get(key)
+            if session is None:
+                session = sessions[key] = session_factory()
+            return session
+
+    def run(request_id: int, session_key: Hashable, method: str, url: str, kwargs: dict) -> None:
+        try:
+            response = session_for(session_key).execute_request(method, url, **kwargs)
+            message = (request_id, _pack(response, shm_threshold), None)
+        except Exception as e:
+            message = (request_id, None, e)
+        with send_lock:
+            try:
+                conn.send(message)
+            except Exception as e:
+                # e.g. an exception which can't be pickled
+                conn.send((request_id, None, TLSClientException(f"{type(e).__name__}: {e}")))
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="tls-client-pool") as executor:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            executor.submit(run, *message)
+
+    for session in sessions.values():
+        session.close()
+    conn.close()
+
+
+# --- Parent process ---------------------------------------------------------------------------------------------------
+
+def _discard(body: Any) -> None:
+    """Unlinks the shared memory block of a response nobody waits for."""
+    if isinstance(body, tuple):
+        try:
+            shm = SharedMemory(name=body[0])
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+
+
+def _unpack(meta: dict, body: Any) -> Response:
+    if isinstance(body, tuple):
+        name, size = body
+        shm = SharedMemory(name=name)
+        try:
+            body = bytes(shm.buf[:size])
+        finally:
+            shm.close()
+            shm.unlink()
+
+    response = Response()
+    response.url = meta["url"]
+    response.status_code = meta["status_code"]
+    response.headers = meta["headers"]
+    response.encoding = meta["encoding"]
+    response.cookies = meta["cookies"]
+    response.elapsed = meta["elapsed"]
+    response.timings = meta["timings"]
+    response.request_size = meta["request_size"]
+    response.response_size = meta["response_size"]
+    response.request_body_size = meta["request_body_size"]
+    response.body_size = len(body)
+    response._content = body
+    return response
+
+
+class _Worker:
+    def __init__(self, context, session_factory: Callable[[], Session], threads: int, shm_threshold: int) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, session_factory, threads, shm_threshold),
+            name="tls-client-pool-worker", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+        self.send_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.futures: Dict[int, Future] = {}
+        self.reader = threading.Thread(target=self._read, name="tls-client-pool-reader", daemon=True)
+        self.reader.start()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self.futures)
+
+    def send(self, request_id: int, future: Future, message: tuple) -> None:
+        with self.lock:
+            self.futures[request_id] = future
+        try:
+            with self.send_lock:
+                self.conn.send(message)
+        except BaseException:
+            with self.lock:
+                self.futures.pop(request_id, None)
+            raise
+
+    def _read(self) -> None:
+        while True:
+            try:
+                request_id, packed, error = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self.lock:
+                future = self.futures.pop(request_id, None)
+            # a cancelled future can't be resolved anymore
+            if future is None or not future.set_running_or_notify_cancel():
+                # the shared memory block of the body would outlive the request otherwise
+                if packed is not None:
+                    _discard(packed[1])
+                continue
+            if error is not None:
+                future.set_exception(error)
+                continue
+            try:
+                future.set_result(_unpack(*packed))
+            except Exception as e:
+                future.set_exception(e)
+
+        # the worker exited, requests in flight won't be answered
+        with self.lock:
+            futures, self.futures = self.futures, {}
+        for future in futures.values():
+            if future.set_running_or_notify_cancel():
+                future.set_exception(TLSClientException(f"Worker process exited (exit code {self.process.exitcode})"))
+
+    def stop(self, timeout: Optional[float]) -> None:
+        try:
+            with self.send_lock:
+                self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        # the reader sees the end of the pipe once the worker is gone
+        self.reader.join(timeout)
+        self.conn.close()
+
+
+class ProcessPool:
+    """Runs sessions in worker processes, each with its own interpreter and Go runtime, to scale the Python side of
+    requests (payload, JSON, base64, cookies, Response objects) past one core.
+
+    Requests are routed by ``affinity``: ``"host"`` sends every request to a host to the same worker (its
+    connections are reused), ``"session"`` routes by the ``session_key`` of the request and ``None`` picks the worker
+    with the fewest requests in flight. Each worker keeps one session per ``session_key`` (created with
+    ``session_factory``, which must be picklable), so cookies stay in the worker and are not shared with the parent.
+    Response bodies of ``shm_threshold`` bytes and more are passed back through shared memory instead of the pipe.
+
+    Streaming, hooks and redirect history are not available for requests sent through the pool.
+
+    Rate limiters, circuit breakers and retry budgets of the sessions live in each worker and are not shared between
+    workers. With ``"host"`` affinity the per-host limits hold, as every request to a host goes through one worker.
+    With ``"session"`` or ``None`` a host is served by several workers, so each cap is multiplied by the number of
+    workers: divide the limits by ``workers`` in ``session_factory`` or use ``"host"`` affinity. Limits across all
+    hosts (e.g. a global retry budget) are always per worker.
+
+    Example:
+        with ProcessPool(workers=4, session_factory=functools.partial(Session, "chrome_120")) as pool:
+            futures = [pool.submit("GET", url) for url in urls]
+            responses = [future.result() for future in futures]
+    """
+
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 session_factory: Callable[[], Session] = Session,
+                 affinity: Optional[str] = "host",
+                 threads: int = 8,
+                 shm_threshold: int = 64 * 1024,
+                 start_method: str = "spawn"
+                 ) -> None:
+        if affinity not in AFFINITIES:
+            raise ValueError(f"Unknown affinity {affinity!r}, expected one of {AFFINITIES}")
+        self.affinity = affinity
+        # Requests executed concurrently by each worker (the FFI call releases the GIL)
+        self.threads = threads
+        self.shm_threshold = shm_threshold
+
+        # fork isn't safe once the Go runtime of the shared library was started in this process
+        context = multiprocessing.get_context(start_method)
+        self._workers: List[_Worker] = [
+            _Worker(context, session_factory, threads, shm_threshold) for _ in range(workers or os.cpu_count() or 1)
+        ]
+        self._request_ids = itertools.count()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def workers(self) -> int:
+        return len(self._workers)
+
+    def _route(self, url: str, session_key: Optional[Hashable]) -> _Worker:
+        if self.affinity == "session" and session_key is not None:
+            key = repr(session_key)
+        elif self.affinity == "host":
+            key = (urlsplit(url).hostname or "").lower()
+        else:
+            return min(self._workers, key=lambda worker: worker.in_flight)
+        return self._workers[zlib.crc32(key.encode("utf-8")) % len(self._workers)]
+
+    def submit(self, method: str, url: str, session_key: Optional[Hashable] = None, **kwargs: Any) -> Future:
+        """Sends a request (arguments of Session.execute_request) to a worker, returns a Future of its Response."""
+        if self._closed:
+            raise RuntimeError("The process pool is closed")
+        if kwargs.get("stream"):
+            raise ValueError("Streaming is not supported by the process pool")
+        future: Future = Future()
+        request_id = next(self._request_ids)
+        self._route(url, session_key).send(request_id, future, (request_id, session_key, method, url, kwargs))
+        return future
+
+    def request(self, method: str, url: str, **kwargs: Any) -> Response:
+        return self.submit(method, url, **kwargs).result()
+
+    def get(self, url: str, **kwargs: Any) -> Response:
+        return self.request("GET", url, **kwargs)
+
+    def options(self, url: str, **kwargs: Any) -> Response:
+        return self.request("OPTIONS", url, **kwargs)
+
+    def head(self, url: str, **kwargs: Any) -> Response:
+        kwargs.setdefault("allow_redirects", False)
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url: str, data: Any = None, json: Any = None, **kwargs: Any) -> Response:
+        return self.request("POST", url, data=data, json=json, **kwargs)
+
+    def put(self, url: str, data: Any = None, json: Any = None, **kwargs: Any) -> Response:
+        return self.request("PUT", url, data=data, json=json, **kwargs)
+
+    def patch(self, url: str, data: Any = None, json: Any = None, **kwargs: Any) -> Response:
+        return self.request("PATCH", url, data=data, json=json, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        """Stops the workers after the requests in flight finished, their sessions are closed."""
+        if self._closed:
+            return
+        self._closed = True
+        for worker in self._workers:
+            worker.stop(timeout)
@@ -0,0 +1,259 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from .exceptions import TLSClientDeadlineExceeded
+from .response import Response
+from .timeouts import Deadline
+
+# Status codes which signal that the origin wants us to slow down
+BACKPRESSURE_STATUS_CODES = (429, 503)
+
+
+def origin_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds from now."""
+    if not value:
+        return None
+    if isinstance(value, list):
+        value = value[0]
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket which hands out reservations, so waiting callers are served in arrival order."""
+
+    def __init__(self, rate: Optional[float], burst: Optional[float] = None) -> None:
+        # Tokens per second, None means unlimited
+        self.rate = rate
+        self.burst = burst
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        if self.burst is not None:
+            return self.burst
+        return max(1.0, self.rate or 1.0)
+
+    def reserve(self, now: float) -> float:
+        """Takes one token and returns the seconds the caller has to wait before it may be used."""
+        if self.rate is None:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def set_rate(self, rate: Optional[float], now: float) -> None:
+        if self.rate is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.rate = rate
+        if rate is None:
+            self.tokens = self.capacity
+
+    def cancel(self) -> None:
+        """Gives back the token of a reservation which won't be used."""
+        if self.rate is not None:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class _HostState:
+    def __init__(self, rate: Optional[float], burst: Optional[float], max_concurrency: Optional[int]) -> None:
+        self.lock = threading.Lock()
+        self.bucket = TokenBucket(rate, burst)
+        self.configured_rate = rate
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.slot_released = threading.Condition(self.lock)
+        self.blocked_until = 0.0
+        self.last_adjusted = time.monotonic()
+        self.last_decrease = 0.0
+        # requests started within the current one-second window, used to derive a rate when none is configured
+        self.window_start = self.last_adjusted
+        self.window_count = 0
+        self.observed_rate = 0.0
+
+
+class HostRateLimiter:
+    """Per-origin token-bucket rate limits and concurrency caps which adapt to 429/503 responses.
+
+    The rate of an origin is cut by ``decrease_factor`` whenever it answers with 429 or 503 and requests are paused
+    for the duration of ``Retry-After``. Afterwards the rate recovers by ``recovery_rate`` requests per second for
+    every second without backpressure (AIMD), up to ``max_rate`` or the configured rate.
+
+    Example:
+        session.rate_limiter = HostRateLimiter(rate=None, max_concurrency=16)
+        session.rate_limiter.configure_host("https://api.example.com", rate=50, max_concurrency=4)
+    """
+
+    def __init__(self,
+                 rate: Optional[float] = None,
+                 burst: Optional[float] = None,
+                 max_concurrency: Optional[int] = None,
+                 min_rate: float = 0.5,
+                 max_rate: Optional[float] = None,
+                 decrease_factor: float = 0.5,
+                 recovery_rate: float = 0.5,
+                 max_retry_after: float = 300.0,
+                 ) -> None:
+        # Default requests per second for every origin, None starts unlimited and only limits after backpressure
+        self.rate = rate
+        self.burst = burst
+        # Default maximum number of concurrent requests per origin, None is unlimited
+        self.max_concurrency = max_concurrency
+
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.decrease_factor = decrease_factor
+        self.recovery_rate = recovery_rate
+        # Upper bound for honoured Retry-After values, so a broken header can't stall the client forever
+        self.max_retry_after = max_retry_after
+
+        self._lock = threading.Lock()
+        self._overrides: Dict[str, dict] = {}
+        self._hosts: Dict[str, _HostState] = {}
+
+    def configure_host(self,
+                       origin: str,
+                       rate: Optional[float] = None,
+                       burst: Optional[float] = None,
+                       max_concurrency: Optional[int] = None
+                       ) -> None:
+        origin = origin_of(origin) if "://" in origin else origin.lower()
+        with self._lock:
+            self._overrides[origin] = {"rate": rate, "burst": burst, "max_concurrency": max_concurrency}
+            state = self._hosts.get(origin)
+        if state is not None:
+            with state.lock:
+                state.configured_rate = rate
+                state.bucket.burst = burst
+                state.bucket.set_rate(rate, time.monotonic())
+                state.max_concurrency = max_concurrency
+                state.slot_released.notify_all()
+
+    def _state(self, origin: str) -> _HostState:
+        state = self._hosts.get(origin)
+        if state is None:
+            with self._lock:
+                state = self._hosts.get(origin)
+                if state is None:
+                    settings = self._overrides.get(origin, {
+                        "rate": self.rate, "burst": self.burst, "max_concurrency": self.max_concurrency
+                    })
+                    state = self._hosts[origin] = _HostState(**settings)
+        return state
+
+    def acquire(self, url: str, deadline: Optional[Deadline] = None) -> str:
+        """Blocks until a request to the origin of ``url`` may be sent. Returns the origin for ``release``.
+
+        Raises TLSClientDeadlineExceeded (without taking a slot) if the request can't be sent before ``deadline``.
+        """
+        origin = origin_of(url)
+        state = self._state(origin)
+
+        with state.lock:
+            if state.max_concurrency is not None:
+                while state.active >= state.max_concurrency:
+                    if deadline is None:
+                        state.slot_released.wait()
+                        continue
+                    remaining = deadline.remaining()
+                    if remaining <= 0:
+                        raise TLSClientDeadlineExceeded(f"Deadline exceeded while waiting for a slot of {origin}")
+                    state.slot_released.wait(remaining)
+
+            now = time.monotonic()
+            delay = max(state.bucket.reserve(now), state.blocked_until - now)
+            if deadline is not None and delay > 0 and delay >= deadline.remaining():
+                state.bucket.cancel()
+                # a slot which was freed for this request is passed on
+                state.slot_released.notify()
+                raise TLSClientDeadlineExceeded(f"Deadline exceeded, requests to {origin} are delayed by {delay:.3f}s")
+            state.active += 1
+
+            if now - state.window_start >= 1.0:
+                state.observed_rate = state.window_count / (now - state.window_start)
+                state.window_start = now
+                state.window_count = 0
+            state.window_count += 1
+
+        if delay > 0:
+            time.sleep(delay)
+        return origin
+
+    def release(self, origin: str, response: Optional[Response] = None) -> None:
+        """Frees the concurrency slot of a request and adapts the rate to its response."""
+        state = self._state(origin)
+        with state.lock:
+            state.active -= 1
+            state.slot_released.notify()
+            if response is None:
+                return
+
+            now = time.monotonic()
+            if response.status_code in BACKPRESSURE_STATUS_CODES:
+                self._decrease(state, response, now)
+            elif state.bucket.rate is not None and now >= state.blocked_until:
+                self._recover(state, now)
+
+    def _decrease(self, state: _HostState, response: Response, now: float) -> None:
+        # don't cut the rate again for every response of the burst which was already in flight
+        if now - state.last_decrease >= 1.0:
+            current = state.bucket.rate
+            if current is None:
+                current = max(state.observed_rate, state.window_count / max(now - state.window_start, 1.0))
+            state.bucket.set_rate(max(self.min_rate, current * self.decrease_factor), now)
+            state.last_decrease = now
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            state.blocked_until = max(state.blocked_until, now + min(retry_after, self.max_retry_after))
+        # recovery starts once the origin accepts requests again
+        state.last_adjusted = max(now, state.blocked_until)
+
+    def _recover(self, state: _HostState, now: float) -> None:
+        elapsed = max(0.0, now - state.last_adjusted)
+        state.last_adjusted = now
+        rate = state.bucket.rate + elapsed * self.recovery_rate
+
+        ceiling = state.configured_rate if state.configured_rate is not None else self.max_rate
+        if ceiling is not None and rate >= ceiling:
+            rate = ceiling
+        elif ceiling is None and state.observed_rate and rate > 2 * state.observed_rate:
+            # the origin no longer pushes back at twice the traffic it currently gets, lift the limit again
+            rate = None
+        state.bucket.set_rate(rate, now)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            origin: {
+                "rate": state.bucket.rate,
+                "active": state.active,
+                "blocked_for": max(0.0, state.blocked_until - time.monotonic()),
+            }
+            for origin, state in hosts.items()
+        }
@@ -1,8 +1,12 @@
 import base64
+import copy
+import io
 import json
+import mmap
 import os
 import time
-from typing import Union
+import weakref
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
 
 from requests import HTTPError
 
@@ -11,13 +15,93 @@ try:
 except ImportError:
     import charset_normalizer as chardet
 
+from .compression import iter_decoded, parse_content_encoding
 from .cookies import RequestsCookieJar, cookiejar_from_dict
+from .exceptions import TLSClientBodyTooLarge
 from .structures import CaseInsensitiveDict
 
 
+class RequestRecord:
+    """The request a response answers: method, url, headers and a reference to the body as it was given (not the
+    encoded payload sent to the TLS client)."""
+
+    __slots__ = ("method", "url", "headers", "body")
+
+    def __init__(self, method: str, url: str, headers: Optional[CaseInsensitiveDict] = None, body: Any = None):
+        self.method = method
+        self.url = url
+        self.headers = headers
+        self.body = body
+
+    def __repr__(self):
+        return f"<RequestRecord [{self.method}] {self.url}>"
+
+
 class Response:
     """object, which contains the response to an HTTP request."""
 
+    # Reason phrases, shared by every response
+    _http_status_code = {
+        100: 'Continue',
+        101: 'Switching Protocols',
+        102: 'Switching Protocols',
+        103: 'Switching Protocols',
+        200: 'OK',
+        201: 'Created',
+        202: 'Accepted',
+        203: 'Non-Authoritative Information',
+        204: 'No Content',
+        205: 'Reset Content',
+        206: 'Partial Content',
+        207: 'Partial Content',
+        208: 'Partial Content',
+        226: 'Partial Content',
+        300: 'Multiple Choices',
+        301: 'Moved Permanently',
+        302: 'Found',
+        303: 'See Other',
+        304: 'Not Modified',
+        307: 'Temporary Redirect',
+        308: 'Permanent Redirect',
+        400: 'Bad Request',
+        401: 'Unauthorized',
+        402: 'Payment Required',
+        403: 'Forbidden',
+        404: 'Not Found',
+        405: 'Method Not Allowed',
+        406: 'Not Acceptable',
+        407: 'Proxy Authentication Required',
+        408: 'Request Timeout',
+        409: 'Conflict',
+        410: 'Gone',
+        411: 'Length Required',
+        412: 'Precondition Failed',
+        413: 'Payload Too Large',
+        414: 'URI Too Long',
+        415: 'Unsupported Media Type',
+        416: 'Range Not Satisfiable',
+        417: 'Expectation Failed',
+        418: 'I\'m a teapot',
+        421: 'Misdirected Request',
+        422: 'Unprocessable Entity',
+        426: 'Upgrade Required',
+        428: 'Precondition Required',
+        429: 'Too Many Requests',
+        431: 'Request Header Fields Too Large',
+        451: 'Unavailable For Legal Reasons',
+        500: 'Internal Server Error',
+        501: 'Not Implemented',
+        502: 'Bad Gateway',
+        503: 'Service Unavailable',
+        504: 'Gateway Timeout',
+        505: 'HTTP Version Not Supported',
+        506: 'Variant Also Negotiates',
+        507: 'Insufficient Storage',
+        508: 'Loop Detected',
+        510: 'Not Extended',
+        511: 'Network Authentication Required'
+    }
+
     def __init__(self):
 
         # Reference of URL the response is coming from (especially useful with redirects)
@@ -34,83 +118,56 @@ class Response:
         # A CookieJar of Cookies the server sent back.
         self.cookies = cookiejar_from_dict({})
 
-        self.history: list[Response] = []
+        # Responses of the redirects which led to this response, sliced from the shared redirect chain on first access
+        self._history_chain: List[Optional[Response]] = []
+        self._history_length = 0
+        self._history: Optional[List[Response]] = None
+        # Hops released from the chain (max_history) are None
+        self._history_limit: Optional[int] = None
 
         self.elapsed = None
+
+        # Time spent in each phase of the request in nanoseconds (monotonic clock)
+        # Phases: build_payload, encode, transport, decode, cookies, build_response (includes body_decode), total
+        self.timings: Dict[str, int] = {}
+
+        # Size of the request payload / response envelope crossing the FFI and of the request and response bodies, in
+        # bytes
+        self.request_size = 0
+        self.response_size = 0
+        self.request_body_size = 0
+        self.body_size = 0
+
         self._content = False
+        self._content_consumed = False
+
+        # Body as received, still encoded with the codings of Content-Encoding (lazy decompression only)
+        self._raw_content: Optional[bytes] = None
+        # Body spilled to a temporary file (spill_threshold), content is a memoryview of the mapped file
+        self._spill_file: Optional[BinaryIO] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._raw: Optional[BinaryIO] = None
+        self._content_codings: List[str] = []
+        # Limit for the bytes produced by iter_content (streamed and lazily decoded bodies)
+        self._max_body_size: Optional[int] = None
 
         self.writing = True
-        self._request_payload = None
+        # (method, url, headers, body) of the request, turned into a RequestRecord on first access
+        self._request: Optional[Tuple[str, str, Any, Any]] = None
+        self._request_record: Optional[RequestRecord] = None
         self._file = None
         self._filepath = None
 
         self.reason = None
-        self._http_status_code = {
-            100: 'Continue',
-            101: 'Switching Protocols',
-            102: 'Switching Protocols',
-            103: 'Switching Protocols',
-            200: 'OK',
-            201: 'Created',
-            202: 'Accepted',
-            203: 'Non-Authoritative Information',
-            204: 'No Content',
-            205: 'Reset Content',
-            206: 'Partial Content',
-            207: 'Partial Content',
-            208: 'Partial Content',
-            226: 'Partial Content',
-            300: 'Multiple Choices',
-            301: 'Moved Permanently',
-            302: 'Found',
-            303: 'See Other',
-            304: 'Not Modified',
-            307: 'Temporary Redirect',
-            308: 'Permanent Redirect',
-            400: 'Bad Request',
-            401: 'Unauthorized',
-            402: 'Payment Required',
-            403: 'Forbidden',
-            404: 'Not Found',
-            405: 'Method Not Allowed',
-            406: 'Not Acceptable',
-            407: 'Proxy Authentication Required',
-            408: 'Request Timeout',
-            409: 'Conflict',
-            410: 'Gone',
-            411: 'Length Required',
-            412: 'Precondition Failed',
-            413: 'Payload Too Large',
-            414: 'URI Too Long',
-            415: 'Unsupported Media Type',
-            416: 'Range Not Satisfiable',
-            417: 'Expectation Failed',
-            418: 'I\'m a teapot',
-            421: 'Misdirected Request',
-            422: 'Unprocessable Entity',
-            426: 'Upgrade Required',
-            428: 'Precondition Required',
-            429: 'Too Many Requests',
-            431: 'Request Header Fields Too Large',
-            451: 'Unavailable For Legal Reasons',
-            500: 'Internal Server Error',
-            501: 'Not Implemented',
-            502: 'Bad Gateway',
-            503: 'Service Unavailable',
-            504: 'Gateway Timeout',
-            505: 'HTTP Version Not Supported',
-            506: 'Variant Also Negotiates',
-            507: 'Insufficient Storage',
-            508: 'Loop Detected',
-            510: 'Not Extended',
-            511: 'Network Authentication Required'
-        }
 
         # todo links, next, request
 
     def __enter__(self):
         return self
 
+    def __exit__(self, *args):
+        self.close()
+
     def __repr__(self):
         return f"<Response [{self.status_code}]>"
 
@@ -127,6 +184,52 @@ class Response:
     def __iter__(self):
         return self.iter_content(128)
 
+    def copy(self) -> "Response":
+        """Returns an independent copy of the response, the (immutable) body is shared. A spilled body is shared with
+        its file and mmap, closing one of the copies closes it for all of them."""
+        response = copy.copy(self)
+        response._headers = self._headers.copy()
+        response.cookies = self.cookies.copy()
+        response.history = self.history.copy()
+        response.timings = self.timings.copy()
+        return response
+
+    @property
+    def history(self) -> List["Response"]:
+        if self._history is None:
+            if self._history_limit is None:
+                self._history = self._history_chain[:self._history_length]
+            else:
+                start = max(0, self._history_length - self._history_limit)
+                chain = self._history_chain[start:self._history_length]
+                self._history = [response for response in chain if response is not None]
+        return self._history
+
+    @history.setter
+    def history(self, value: List["Response"]) -> None:
+        self._history = list(value)
+
+    def _link_history(self, chain: List[Optional["Response"]], limit: Optional[int] = None) -> None:
+        """Sets the history to the current content of ``chain`` (the redirect chain, which keeps growing), at most
+        the last ``limit`` hops"""
+        self._history_chain = chain
+        self._history_length = len(chain)
+        self._history_limit = limit
+        self._history = None
+
+    @property
+    def request(self) -> Optional[RequestRecord]:
+        """The request this response answers, built on first access"""
+        if self._request_record is None and self._request is not None:
+            self._request_record = RequestRecord(*self._request)
+            self._request = None
+        return self._request_record
+
+    @request.setter
+    def request(self, value: Optional[RequestRecord]) -> None:
+        self._request_record = value
+        self._request = None
+
     @property
     def headers(self):
         return self._headers
@@ -160,7 +263,11 @@ class Response:
     @property
     def apparent_encoding(self):
         """The apparent encoding, provided by the charset_normalizer or chardet libraries."""
-        encoding = chardet.detect(self.content)["encoding"]
+        content = self.content
+        if isinstance(content, memoryview):
+            # a sample is enough, detecting the encoding of a whole spilled body would read all of it
+            content = bytes(content[:64 * 1024])
+        encoding = chardet.detect(content)["encoding"]
         return encoding if encoding else "utf-8"
 
     def json(self, **kwargs):
@@ -169,7 +276,7 @@ class Response:
 
     @property
     def content(self):
-        """Content of the response, in bytes."""
+        """Content of the response, in bytes (a read-only memoryview of the mapped file if it was spilled to disk)."""
 
         if self._content is False:
             if self._content_consumed:
@@ -182,6 +289,65 @@ class Response:
         self._content_consumed = True
         return self._content
 
+    @property
+    def raw_bytes(self) -> bytes:
+        """Body as it was received, still encoded with lazy decompression (see ``content_codings``)."""
+        if self._raw_content is not None:
+            return self._raw_content
+        return self.content
+
+    @property
+    def raw(self) -> BinaryIO:
+        """Seekable binary file object of the body (supports read, readinto and seek), without copying a spilled body
+        into memory."""
+        if self._raw is None:
+            self._raw = self._spill_file if self._spill_file is not None else io.BytesIO(self.content or b"")
+        return self._raw
+
+    @property
+    def spilled(self) -> bool:
+        """True if the body was spilled to a temporary file instead of being held in memory."""
+        return self._spill_file is not None
+
+    def _spill(self, file: BinaryIO, path: str) -> None:
+        """Uses the body in ``file`` (a temporary file at ``path``) through a memory map instead of reading it"""
+        self._spill_file = file
+        self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._content = memoryview(self._mmap)
+        self.body_size = len(self._mmap)
+        try:
+            # the open file and the map keep the data, the file is gone once both are closed
+            os.remove(path)
+        except OSError:
+            # Windows can't remove open files
+            weakref.finalize(self, _remove_file, path)
+
+    def _drop_body(self) -> None:
+        """Releases the body, used for the redirect hops kept in the history"""
+        self.close()
+        self._content = b""
+        self._content_consumed = True
+        self._raw_content = None
+        self._content_codings = []
+
+    def close(self) -> None:
+        """Releases a spilled body, memoryviews of the content must not be used afterwards."""
+        if self._spill_file is None:
+            return
+        self._content = False
+        self._content_consumed = True
+        try:
+            self._mmap.close()
+        except BufferError:
+            # slices of the content are still in use, the map is closed once they are released
+            pass
+        self._spill_file.close()
+
+    @property
+    def content_codings(self) -> List[str]:
+        """Codings ``raw_bytes`` is encoded with, in the order they were applied."""
+        return list(self._content_codings)
+
     @property
     def text(self):
         encoding = self.encoding
@@ -227,7 +393,25 @@ class Response:
                     raise Exception("Could not open the file within 10 seconds")
 
     def iter_content(self, chunk_size=1024):
+        if self._spill_file is not None:
+            content = self.content
+            for offset in range(0, len(content), chunk_size):
+                yield content[offset:offset + chunk_size].tobytes()
+            return
+
+        if self._raw_content is not None:
+            # lazy decompression, decoded incrementally while the chunks are consumed
+            raw = self._raw_content
+            chunks = (raw[offset:offset + chunk_size] for offset in range(0, len(raw), chunk_size))
+            size = 0
+            for chunk in iter_decoded(chunks, self._content_codings):
+                size += len(chunk)
+                self._check_body_size(size)
+                yield chunk
+            return
+
         self.__open_file()
+        size = 0
         while True:
             chunk = self._file.read(chunk_size)
             while len(chunk) < chunk_size:
@@ -238,12 +422,27 @@ class Response:
                 elif not self.writing:
                     break
             if chunk:
+                size += len(chunk)
+                try:
+                    self._check_body_size(size)
+                except TLSClientBodyTooLarge:
+                    # the shared library can't be stopped, it keeps writing to the unlinked file until it is done
+                    self._file.close()
+                    os.remove(self._filepath)
+                    raise
                 yield chunk
             else:
                 break
         self._file.close()
         os.remove(self._filepath)
 
+    def _check_body_size(self, size: int) -> None:
+        if self._max_body_size is not None and size > self._max_body_size:
+            raise TLSClientBodyTooLarge(
+                f"Response body exceeds max_body_size ({self._max_body_size} bytes) for url: {self.url}",
+                url=self.url, status_code=self.status_code, headers=self.headers, size=size
+            )
+
     def iter_lines(self, chunk_size=128, delimiter=None):
         pending = None
 
@@ -307,32 +506,67 @@ def get_encoding_from_headers(headers):
         return "utf-8"
 
 
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
 def clean_dict(data):
     return {key: value for key, value in data.items() if value is not None and value != ''}
 
 
-def build_response(res: Union[dict, list], res_cookies: RequestsCookieJar, request_payload: dict, filepath=None) -> Response:
-    """Builds a Response object """
+def parse_headers(res_headers: Optional[Dict[str, List[str]]]) -> Dict[str, Union[str, List[str]]]:
+    """Headers of a response envelope, single values are unwrapped from their list"""
+    response_headers = {}
+    if res_headers is not None:
+        for header_key, header_value in res_headers.items():
+            if len(header_value) == 1:
+                response_headers[header_key] = header_value[0]
+            else:
+                response_headers[header_key] = header_value
+    return response_headers
+
+
+def build_response(res: Union[dict, list],
+                   res_cookies: RequestsCookieJar,
+                   request_payload: dict,
+                   filepath=None,
+                   content_codings: Optional[List[str]] = None,
+                   body: Optional[bytes] = None
+                   ) -> Response:
+    """Builds a Response object
+
+    With ``content_codings`` (lazy decompression) the body is expected to be still encoded, with ``content_codings``
+    and then the codings of its Content-Encoding header, and is only decoded when the content is accessed.
+    ``body`` replaces the body of the envelope (bodies spooled to a file by the shared library).
+    """
     response = Response()
     # Add target / url
     response.url = res["target"]
     # Add status code
     response.status_code = res["status"]
     # Add headers
-    response_headers = {}
-    if res["headers"] is not None:
-        for header_key, header_value in res["headers"].items():
-            if len(header_value) == 1:
-                response_headers[header_key] = header_value[0]
-            else:
-                response_headers[header_key] = header_value
+    response_headers = parse_headers(res["headers"])
 
     response.encoding = get_encoding_from_headers(response_headers)
     response.headers = response_headers
     # Add cookies
     response.cookies = res_cookies
     # Add response content (bytes)
-    response._content = base64.b64decode(res["body"].split(",", 1)[1])
+    body_decode_start = time.perf_counter_ns()
+    if body is None:
+        body = base64.b64decode(res["body"].split(",", 1)[1])
+    response.timings["body_decode"] = time.perf_counter_ns() - body_decode_start
+    response.body_size = len(body)
+    codings = (content_codings or []) + parse_content_encoding(response.headers.get("Content-Encoding"))
+    if content_codings is not None and codings and body:
+        response._raw_content = body
+        response._content_codings = codings
+    else:
+        response._content = body
     response._filepath = filepath
-    response.request = clean_dict(request_payload)
+    response._request = (request_payload.get("requestMethod"), request_payload.get("requestUrl"),
+                         request_payload.get("headers"), None)
     return response
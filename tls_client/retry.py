@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+from typing import Iterable, Optional, Tuple, Type
+
+from .exceptions import (
+    TLSClientConnectionError, TLSClientConnectionRefused, TLSClientDeadlineExceeded, TLSClientDNSError,
+    TLSClientException, TLSClientProxyError, TLSClientTimeout
+)
+from .ratelimit import parse_retry_after
+from .response import Response
+
+# Methods which may be sent twice without changing the result (RFC 9110, section 9.2.2)
+IDEMPOTENT_RETRY_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE")
+
+# Errors which guarantee the request never reached the origin, these can be retried for every method
+NOT_SENT_ERRORS: Tuple[Type[TLSClientException], ...] = (
+    TLSClientDNSError, TLSClientConnectionRefused, TLSClientProxyError
+)
+
+
+class RetryBudget:
+    """Caps retries to a fraction of the traffic within a sliding window.
+
+    Every request deposits ``ratio`` tokens, every retry withdraws one. ``min_per_second`` retries are always
+    allowed, so low traffic can still retry. A budget can be shared by any number of sessions / policies.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, window: int = 10) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+
+        self._lock = threading.Lock()
+        # one [second, requests, retries] bucket per second of the window
+        self._buckets = [[0, 0, 0] for _ in range(window)]
+
+    def _bucket(self, now: int) -> list:
+        bucket = self._buckets[now % self.window]
+        if bucket[0] != now:
+            bucket[0], bucket[1], bucket[2] = now, 0, 0
+        return bucket
+
+    def _totals(self, now: int) -> Tuple[int, int]:
+        requests = retries = 0
+        for second, bucket_requests, bucket_retries in self._buckets:
+            if now - second < self.window:
+                requests += bucket_requests
+                retries += bucket_retries
+        return requests, retries
+
+    def deposit(self) -> None:
+        now = int(time.monotonic())
+        with self._lock:
+            self._bucket(now)[1] += 1
+
+    def withdraw(self) -> bool:
+        """Takes a retry out of the budget, returns False if the budget is exhausted."""
+        now = int(time.monotonic())
+        with self._lock:
+            requests, retries = self._totals(now)
+            if retries >= self.min_per_second * self.window + requests * self.ratio:
+                return False
+            self._bucket(now)[2] += 1
+            return True
+
+
+# Process-wide budget used by every Retry which isn't given its own
+GLOBAL_RETRY_BUDGET = RetryBudget()
+
+
+class Retry:
+    """Retry policy for failed requests.
+
+    Failures are classified by their exception type (see ``exceptions.py``). Idempotent methods are retried on
+    timeouts, connection errors and ``status_forcelist``, every other method only if the request was never sent.
+    Retries wait ``backoff_factor * 2 ** (attempt - 1)`` seconds, capped by ``backoff_max`` and randomized with full
+    jitter, and are limited by a retry budget.
+
+    Example:
+        session.retry = Retry(total=3, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+    """
+
+    def __init__(self,
+                 total: int = 3,
+                 backoff_factor: float = 0.1,
+                 backoff_max: float = 10.0,
+                 jitter: bool = True,
+                 allowed_methods: Iterable[str] = IDEMPOTENT_RETRY_METHODS,
+                 retry_on: Tuple[Type[TLSClientException], ...] = (TLSClientTimeout, TLSClientConnectionError),
+                 status_forcelist: Iterable[int] = (429, 502, 503, 504),
+                 respect_retry_after: bool = True,
+                 budget: Optional[RetryBudget] = GLOBAL_RETRY_BUDGET,
+                 ) -> None:
+        # Maximum number of retries per request (not counting the first attempt)
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.allowed_methods = frozenset(method.upper() for method in allowed_methods)
+        self.retry_on = retry_on
+        self.status_forcelist = frozenset(status_forcelist)
+        self.respect_retry_after = respect_retry_after
+        # Retry budget, None disables the budget
+        self.budget = budget
+
+    def on_request(self) -> None:
+        if self.budget is not None:
+            self.budget.deposit()
+
+    def is_retryable_error(self, method: str, error: Exception) -> bool:
+        if not isinstance(error, self.retry_on) or isinstance(error, TLSClientDeadlineExceeded):
+            return False
+        return method.upper() in self.allowed_methods or isinstance(error, NOT_SENT_ERRORS)
+
+    def is_retryable_response(self, method: str, response: Response) -> bool:
+        return response.status_code in self.status_forcelist and method.upper() in self.allowed_methods
+
+    def allow_retry(self, attempt: int) -> bool:
+        """Checks the attempt limit and withdraws from the budget. ``attempt`` is the number of the next retry."""
+        if attempt > self.total:
+            return False
+        return self.budget is None or self.budget.withdraw()
+
+    def backoff(self, attempt: int, response: Optional[Response] = None) -> float:
+        if response is not None and self.respect_retry_after:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+
+        delay = min(self.backoff_max, self.backoff_factor * (2 ** (attempt - 1)))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
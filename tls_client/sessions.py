@@ -1,28 +1,40 @@
 import base64
-import ctypes
 import os
+import tempfile
 import threading
 import time
 import urllib.parse
 import uuid
-from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.cookiejar import Cookie
 from json import dumps, loads
-from sys import platform
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 from urllib.parse import urljoin
 
 from .__version__ import __version__
-from .cffi import addCookiesToSession, destroySession, freeMemory, getCookiesFromSession, request
-from .cookies import cookiejar_from_dict, extract_cookies_to_jar, merge_cookies
-from .exceptions import TLSClientException
-from .response import Response, build_response
+from .circuitbreaker import CircuitBreaker
+from .coalescing import RequestCoalescer
+from .compression import RequestCompressor, parse_content_encoding
+from .cookies import RequestsCookieJar, cookiejar_from_dict, extract_cookies_to_jar, merge_cookies
+from .dns import DNSCache, format_local_address
+from .exceptions import (
+    TLSClientBodyTooLarge, TLSClientDeadlineExceeded, TLSClientException, TLSClientResponseAborted, TLSClientTimeout,
+    classify_error
+)
+from .hedging import Hedger
+from .hooks import default_hooks, dispatch_hook
+from .lifecycle import SessionRegistry, default_registry, is_finalizing
+from .metrics import MetricsCollector
+from .multipart import MultipartEncoder
+from .ratelimit import HostRateLimiter
+from .response import Response, build_response, parse_headers
+from .retry import Retry
 from .settings import ClientIdentifiers
 from .structures import CaseInsensitiveDict
-
-if platform == "win32":
-    preferred_clock = time.perf_counter
-else:
-    preferred_clock = time.time
+from .timeouts import AdaptiveTimeout, Deadline, timeout_payload
+from .transport import Transport, get_default_transport
+from .warmup import KeepWarm, origin_url
 
 
 class SteamThread(threading.Thread):
@@ -94,11 +106,26 @@ class Session:
                  disable_ipv6: bool = False,
                  disable_ipv4: bool = False,
                  disable_compression: bool = False,
+                 transport: Optional[Transport] = None,
+                 lazy_decompression: bool = False,
+                 local_address: Optional[str] = None,
                  ) -> None:
 
         self.MAX_REDIRECTS: int = 30
 
         self._session_id = str(uuid.uuid4())
+
+        # Backend executing the requests, defaults to the TLS client shared library
+        # Other backends: FakeTransport, RecordingTransport, ReplayTransport (see transport.py)
+        self.transport: Transport = transport or get_default_transport()
+
+        # Registry bounding the number of live Go sessions (LRU eviction, idle reaping, destroyAll at exit)
+        # Example:
+        # tls_client.lifecycle.default_registry.configure(max_sessions=500, idle_ttl=300)
+        self.registry: Optional[SessionRegistry] = default_registry
+        self._active_requests = 0
+        self._last_used = 0.0
+        self._evicting = False
         # --- Standard Settings ----------------------------------------------------------------------------------------
 
         # Case-insensitive dictionary of headers, send on each request
@@ -125,12 +152,99 @@ class Session:
         # CookieJar containing all currently outstanding cookies set on this session
         self.cookies = cookiejar_from_dict({})
 
-        # Timeout
+        # Timeout of each request in seconds, fractions are sent with millisecond precision
         self.timeout = 30
 
+        # Event hooks, called on every request / response / redirect / error
+        # Possible Hooks: on_request, on_response, on_redirect, on_error (see hooks.py)
+        # Example:
+        # session.hooks["on_response"].append(lambda response: print(response.timings))
+        self.hooks = default_hooks()
+
         # Certificate pinning
         self.certificate_pinning = certificate_pinning
 
+        # Single-flight coalescing of identical in-flight requests, disabled by default
+        # Example:
+        # RequestCoalescer(methods=["GET", "HEAD"], hosts=["config.example.com"])
+        self.coalescer: Optional[RequestCoalescer] = None
+
+        # Per-origin rate limits and concurrency caps which back off on 429/503 + Retry-After, disabled by default
+        # Example:
+        # HostRateLimiter(rate=None, max_concurrency=16)
+        # A limiter can be shared between sessions to limit the combined traffic to an origin.
+        self.rate_limiter: Optional[HostRateLimiter] = None
+
+        # Hedged requests, a second copy of a slow idempotent request is sent on a separate Go session, disabled by
+        # default
+        # Example:
+        # Hedger(delay=0.5, percentile=0.95, proxies=["http://user:pass@ip:port"])
+        self.hedger: Optional[Hedger] = None
+        self._hedge_session_id = f"{self._session_id}-hedge"
+
+        # Retry policy for timeouts, connection errors and retryable status codes, disabled by default
+        # Failed requests raise typed subclasses of TLSClientException, see exceptions.py
+        # Example:
+        # Retry(total=3, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+        self.retry: Optional[Retry] = None
+
+        # Per-host and per-proxy circuit breaker, requests to a failing origin or through a failing proxy raise
+        # TLSClientCircuitOpen without being sent until probe requests succeed again, disabled by default
+        # Example:
+        # CircuitBreaker(error_threshold=0.5, min_calls=20, slow_call_threshold=0.8, slow_call_duration=5)
+        # A breaker can be shared between sessions to share what they know about an origin.
+        self.circuit_breaker: Optional[CircuitBreaker] = None
+
+        # Per-host request metrics (status classes, errors, latency histograms, bytes, redirects, in-flight), disabled
+        # by default
+        # Example:
+        # MetricsCollector(), exported with session.metrics.snapshot() or session.metrics.to_openmetrics()
+        self.metrics: Optional[MetricsCollector] = None
+
+        # Per-host timeouts learned from the observed latencies (percentile x factor within bounds), used for requests
+        # without a timeout, disabled by default
+        # Example:
+        # AdaptiveTimeout(percentile=0.99, factor=3, min_timeout=0.05, max_timeout=30)
+        self.adaptive_timeout: Optional[AdaptiveTimeout] = None
+
+        # Compression of request bodies (gzip, deflate, br, zstd) with an automatic Content-Encoding header, disabled
+        # by default
+        # Example:
+        # RequestCompressor("gzip", threshold=8192, hosts=["ingest.example.com"])
+        self.compressor: Optional[RequestCompressor] = None
+
+        # Maximum size of response bodies in bytes, larger bodies raise TLSClientBodyTooLarge, can be overwritten per
+        # request. With a limit, buffered bodies are spooled to a file by the TLS client and only read into memory if
+        # they are within the limit, streamed bodies are checked with the Content-Length of the HEAD request and while
+        # they are read.
+        # Example:
+        # 10 * 1024 * 1024
+        self.max_body_size: Optional[int] = None
+
+        # Predicate on the response headers, returning False aborts the response with TLSClientResponseAborted, can be
+        # overwritten per request. Streamed requests check the headers of the HEAD request before the body is
+        # downloaded. The TLS client can't abort a request in flight, so buffered bodies are downloaded (spooled to a
+        # file) first and discarded without being read into memory.
+        # Example:
+        # lambda headers: headers.get("Content-Type", "").startswith("application/json")
+        self.accept_headers: Optional[Callable[[CaseInsensitiveDict], bool]] = None
+
+        # Number of redirect hops kept in Response.history (the most recent ones), None keeps all of them
+        # Example:
+        # 5
+        self.max_history: Optional[int] = None
+
+        # Keeps the bodies of the redirect hops in Response.history, False releases them once the next hop is sent
+        self.keep_history_bodies = True
+
+        # Size in bytes from which buffered response bodies are spilled to a temporary file and mapped into memory
+        # (mmap) instead of being read. Response.content is then a read-only memoryview and Response.raw a seekable
+        # file object (readinto), the pages are only loaded while they are accessed. Bodies which still have to be
+        # decoded (lazy decompression) are read into memory.
+        # Example:
+        # 64 * 1024 * 1024
+        self.spill_threshold: Optional[int] = None
+
         # --- Advanced Settings ----------------------------------------------------------------------------------------
 
         # Examples:
@@ -344,6 +458,29 @@ class Session:
 
         self.disable_compression = disable_compression
 
+        # Lazy decompression
+        # The response body crosses the FFI still encoded (gzip, deflate, br, zstd) and is only decoded when .content,
+        # .text or .json() is accessed. The encoded body is available as response.raw_bytes.
+        # Decoding br needs the brotli package, zstd the zstandard package. Streamed responses are always decoded.
+        self.lazy_decompression = lazy_decompression
+
+        # Local address the outbound connections are bound to (e.g. one of the IPs of a multi-IP host), the port is
+        # optional. The TLS client applies it when it creates the client of the session, so set it before the first
+        # request.
+        # Example:
+        # "192.0.2.10" or "[2001:db8::10]:0"
+        self.local_address = local_address
+
+        # DNS cache, requests connect to the cached (or pinned) IP while keeping the hostname for the SNI and the Host
+        # header. Every pinned host uses its own session in the TLS client, as the SNI is a setting of the client.
+        # Example:
+        # DNSCache(ttl=300), with session.dns_cache.prefetch(["api.example.com"]) to resolve known hosts upfront
+        self.dns_cache: Optional[DNSCache] = None
+        self._dns_session_ids: Dict[Tuple[str, str], str] = {}
+
+        # Keeps the connections to a set of hosts open, started with Session.keep_warm
+        self.warmer: Optional[KeepWarm] = None
+
     def __enter__(self):
         return self
 
@@ -354,15 +491,35 @@ class Session:
         self.close()
 
     def close(self) -> str:
+        warmer = getattr(self, "warmer", None)
+        if warmer is not None:
+            warmer.stop()
+        registry = getattr(self, "registry", None)
+        if registry is not None:
+            registry.unregister(self)
+        if is_finalizing(registry):
+            # the shared library may already be unloaded, destroyAll took care of the Go state at exit
+            return ""
+        return self._destroy_go_state()
+
+    def _destroy_go_state(self) -> str:
+        if getattr(self, "hedger", None) is not None:
+            self._destroy_session(self._hedge_session_id)
+        dns_session_ids = getattr(self, "_dns_session_ids", {})
+        for session_id in list(dns_session_ids.values()):
+            self._destroy_session(session_id)
+        dns_session_ids.clear()
+        return self._destroy_session(self._session_id)
+
+    def _destroy_session(self, session_id: str) -> str:
         destroy_session_payload = {
-            "sessionId": self._session_id
+            "sessionId": session_id
         }
 
-        destroy_session_response = destroySession(dumps(destroy_session_payload).encode('utf-8'))
-        destroy_session_response_bytes = ctypes.string_at(destroy_session_response)
+        destroy_session_response_bytes = self.transport.destroy_session(dumps(destroy_session_payload).encode('utf-8'))
         destroy_session_response_string = destroy_session_response_bytes.decode('utf-8')
         destroy_session_response_object = loads(destroy_session_response_string)
-        freeMemory(destroy_session_response_object['id'].encode('utf-8'))
+        self.transport.free_memory(destroy_session_response_object['id'])
         # todo add exception if success is False
         return destroy_session_response_string
 
@@ -371,12 +528,11 @@ class Session:
             "sessionId": self._session_id,
             "url": url,
         }
-        cookie_response = getCookiesFromSession(dumps(cookie_payload).encode('utf-8'))
-        cookie_response_bytes = ctypes.string_at(cookie_response)
+        cookie_response_bytes = self.transport.get_cookies_from_session(dumps(cookie_payload).encode('utf-8'))
         cookie_response_string = cookie_response_bytes.decode('utf-8')
         cookie_response_object = loads(cookie_response_string)
 
-        freeMemory(cookie_response_object['id'].encode('utf-8'))
+        self.transport.free_memory(cookie_response_object['id'])
         if cookie_response_object.get("status") == 0:
             raise TLSClientException(cookie_response_object["body"])
 
@@ -390,15 +546,132 @@ class Session:
             "url": url,
         }
         # todo add exception, no session
-        add_cookies_to_session_response = addCookiesToSession(dumps(cookies_payload).encode('utf-8'))
-        add_cookies_bytes = ctypes.string_at(add_cookies_to_session_response)
+        registry = self.registry
+        if registry is not None:
+            registry.acquire(self)
+        try:
+            add_cookies_bytes = self.transport.add_cookies_to_session(dumps(cookies_payload).encode('utf-8'))
+        finally:
+            if registry is not None:
+                registry.release(self)
         add_cookies_string = add_cookies_bytes.decode('utf-8')
         add_cookies_object = loads(add_cookies_string)
 
-        freeMemory(add_cookies_object['id'].encode('utf-8'))
+        self.transport.free_memory(add_cookies_object['id'])
         if add_cookies_object.get("status") == 0:
             raise TLSClientException(add_cookies_object["body"])
 
+    def fork(self, seed_go_session: bool = False) -> "Session":
+        """
+        Returns a new session which starts from the state of this one (cookies, headers, proxies, fingerprint) and
+        diverges from there. Cookies and headers are shared copy-on-write, so forking is cheap even with a large
+        cookie jar. The components (transport, registry, rate limiter, retry, hedger, metrics, DNS cache, ...) are
+        shared with this session, assign new ones to the fork to separate them.
+
+        The fork gets its own session in the TLS client. Every request sends the cookies of the session, so the TLS
+        client only needs to be seeded with them (seed_go_session=True) if its cookies are read before the first
+        request, e.g. with get_cookies_from_session.
+
+        Example:
+        workers = [session.fork() for _ in range(32)]
+        """
+        forked = Session.__new__(Session)
+        forked.__dict__.update(self.__dict__)
+
+        forked._session_id = str(uuid.uuid4())
+        forked._hedge_session_id = f"{forked._session_id}-hedge"
+        forked._dns_session_ids = {}
+        forked._active_requests = 0
+        forked._last_used = 0.0
+        forked._evicting = False
+        forked.warmer = None
+
+        forked.headers = self.headers.fork() if isinstance(self.headers, CaseInsensitiveDict) else self.headers
+        forked.cookies = self.cookies.fork() if isinstance(self.cookies, RequestsCookieJar) else self.cookies.copy()
+        forked.proxies = self.proxies.copy() if isinstance(self.proxies, dict) else self.proxies
+        forked.params = self.params.copy()
+        forked.hooks = {event: list(hooks) for event, hooks in self.hooks.items()}
+
+        if seed_go_session:
+            forked._seed_go_session()
+        return forked
+
+    def _seed_go_session(self) -> None:
+        """Adds the cookies of the cookie jar to the session of the TLS client, one call per domain"""
+        cookies_by_domain: Dict[str, List[Dict]] = {}
+        for cookie in self._cookies_payload(self.cookies):
+            cookies_by_domain.setdefault(cookie["domain"], []).append(cookie)
+        for domain, cookies in cookies_by_domain.items():
+            self.add_cookies_to_session(f"https://{domain.lstrip('.')}/", cookies)
+
+    def preconnect(self,
+                   hosts: Iterable[str],
+                   parallel: int = 8,
+                   timeout: Optional[float] = None,
+                   proxy: Optional[Dict] = None,
+                   verify: bool = True,
+                   method: str = "HEAD"
+                   ) -> Dict[str, Optional[Exception]]:
+        """
+        Opens the connections to hosts ahead of time (TCP and TLS handshake, HTTP/2 setup), so the first real request
+        to each of them uses a warm connection. Hosts are hostnames (https) or urls, their root path is requested
+        without following redirects and without storing cookies. Returns the error of each url, None if it connected.
+
+        Example:
+        session.preconnect(["api.example.com", "https://cdn.example.com:8443"], parallel=4)
+        """
+        urls = list(dict.fromkeys(origin_url(host) for host in hosts))
+        if not urls:
+            return {}
+
+        request_kwargs = dict(
+            method=method,
+            headers=self._merge_headers(),
+            request_body=None,
+            request_cookies=[],
+            is_byte_request=False,
+            timeout=timeout or self.timeout,
+            proxy=self._get_proxy(proxy),
+            verify=verify,
+            stream=False,
+            chunk_size=1024,
+            certificate_pinning=self.certificate_pinning,
+        )
+
+        def connect(url: str) -> Optional[Exception]:
+            registry = self.registry
+            if registry is not None:
+                registry.acquire(self)
+            try:
+                self._execute_hop(url=url, cookie_jar=cookiejar_from_dict({}), **request_kwargs)
+            except TLSClientException as e:
+                return e
+            finally:
+                if registry is not None:
+                    registry.release(self)
+            return None
+
+        if len(urls) == 1 or parallel <= 1:
+            return {url: connect(url) for url in urls}
+        workers = min(parallel, len(urls))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tls-client-preconnect") as pool:
+            return dict(zip(urls, pool.map(connect, urls)))
+
+    def keep_warm(self,
+                  hosts: Iterable[str],
+                  interval: float = 30.0,
+                  parallel: int = 4,
+                  method: str = "HEAD"
+                  ) -> KeepWarm:
+        """
+        Preconnects to hosts every interval seconds in a background thread, so idle connections are kept open.
+        Replaces the hosts kept warm before, the warmer stops when the session is closed.
+        """
+        if self.warmer is not None:
+            self.warmer.stop()
+        self.warmer = KeepWarm(self, hosts, interval=interval, method=method, parallel=parallel).start()
+        return self.warmer
+
     @staticmethod
     def _prepare_url(url: str, params: Optional[Dict] = None) -> str:
         if params is not None:
@@ -406,9 +679,16 @@ class Session:
         return url
 
     @staticmethod
-    def _prepare_request_body(data: Optional[Union[str, dict]] = None,
-                              json: Optional[Dict] = None
-                              ) -> Tuple[Optional[str], Optional[str]]:
+    def _prepare_request_body(data: Optional[Union[str, dict, MultipartEncoder]] = None,
+                              json: Optional[Dict] = None,
+                              files: Optional[Union[dict, list]] = None
+                              ) -> Tuple[Optional[Union[str, bytes, MultipartEncoder]], Optional[str]]:
+        if files is not None:
+            if isinstance(data, (str, bytes)):
+                raise ValueError("data has to be a dict or a list of fields when files are given")
+            data = MultipartEncoder(fields=data, files=files)
+        if isinstance(data, MultipartEncoder):
+            return data, data.content_type
         if data is None and json is not None:
             if type(json) in [dict, list]:
                 json = dumps(json)
@@ -417,6 +697,14 @@ class Session:
             return urllib.parse.urlencode(data, doseq=True), "application/x-www-form-urlencoded"
         return data, None
 
+    @staticmethod
+    def _request_body_size(request_body: Optional[Union[str, bytes, bytearray, MultipartEncoder]]) -> int:
+        if isinstance(request_body, MultipartEncoder):
+            return request_body.content_length
+        if isinstance(request_body, str) and not request_body.isascii():
+            return len(request_body.encode("utf-8"))
+        return len(request_body) if request_body else 0
+
     def _merge_headers(self, headers: Optional[Dict] = None) -> CaseInsensitiveDict:
         if self.headers is None:
             return CaseInsensitiveDict(headers)
@@ -427,9 +715,21 @@ class Session:
             merged_headers.update(headers)
             return CaseInsensitiveDict(merged_headers)
 
-    def _prepare_cookies(self, cookies: Optional[Dict] = None) -> List[Dict[str, str]]:
-        cookies = cookies or {}
-        cookies = merge_cookies(self.cookies, cookies)
+    def _prepare_cookies(self, cookies: Optional[Union[Dict, RequestsCookieJar]] = None) -> List[Dict[str, str]]:
+        # iterating the jar takes a snapshot, other threads may change it meanwhile
+        request_cookies = list(self.cookies)
+        if cookies:
+            # cookies of a request are only sent with it, they replace session cookies with the same domain, path and
+            # name
+            if isinstance(cookies, dict):
+                cookies = cookiejar_from_dict(cookies)
+            cookies = list(cookies)
+            replaced = {(c.domain, c.path, c.name) for c in cookies}
+            request_cookies = [c for c in request_cookies if (c.domain, c.path, c.name) not in replaced] + cookies
+        return self._cookies_payload(request_cookies)
+
+    @staticmethod
+    def _cookies_payload(cookies: Iterable[Cookie]) -> List[Dict[str, str]]:
         return [
             {
                 'domain': c.domain,
@@ -455,16 +755,25 @@ class Session:
                                method: str,
                                url: str,
                                headers: CaseInsensitiveDict,
-                               request_body: Optional[Union[str, bytes, bytearray]],
+                               request_body: Optional[Union[str, bytes, bytearray, MultipartEncoder]],
                                request_cookies: List[Dict],
                                is_byte_request: bool,
-                               timeout: int,
+                               timeout: float,
                                proxy: str,
                                verify: bool,
                                stream: bool,
                                chunk_size: int,
-                               certificate_pinning: Optional[Dict[str, List[str]]] = None
+                               certificate_pinning: Optional[Dict[str, List[str]]] = None,
+                               session_id: Optional[str] = None,
+                               stream_output_path: Optional[str] = None,
+                               server_name: Optional[str] = None,
+                               host_override: Optional[str] = None
                                ) -> dict:
+        session_id = session_id or self._session_id
+
+        # multipart bodies are encoded directly into the payload document (MultipartEncoder.encode_payload)
+        if is_byte_request and not isinstance(request_body, MultipartEncoder):
+            request_body = base64.b64encode(request_body).decode()
 
         # https://bogdanfinn.gitbook.io/open-source-oasis/shared-library/payload
         request_payload = {
@@ -486,19 +795,19 @@ class Session:
             "isByteResponse": True,
             # "euckrResponse": False,
             "isRotatingProxy": False,
-            "localAddress": None,
+            "localAddress": format_local_address(self.local_address),
             "proxyUrl": proxy,
-            "requestBody": base64.b64encode(request_body).decode() if is_byte_request else request_body,
+            "requestBody": request_body,
             "requestCookies": request_cookies,
+            "requestHostOverride": host_override,
             "requestMethod": method,
             "requestUrl": url,
-            "serverNameOverwrite": None,
-            "sessionId": self._session_id,
+            "serverNameOverwrite": server_name,
+            "sessionId": session_id,
             "streamOutputBlockSize": chunk_size,
             "streamOutputEOFSymbol": None,
             # "streamOutputPath": None,
-            # "timeoutMilliseconds": 0,
-            "timeoutSeconds": timeout,
+            **timeout_payload(timeout),
             # "tlsClientIdentifier": "",
             "withDebug": self.debug,
             "withCustomCookieJar": True,
@@ -506,8 +815,10 @@ class Session:
             # "withRandomTLSExtensionOrder": False,
         }
 
-        if stream and method != "HEAD":
-            request_payload.update({"StreamOutputPath": os.path.join(os.getcwd(), self._session_id)})
+        if stream_output_path is not None:
+            request_payload["StreamOutputPath"] = stream_output_path
+        elif stream and method != "HEAD":
+            request_payload.update({"StreamOutputPath": os.path.join(os.getcwd(), session_id)})
 
         if certificate_pinning:
             request_payload["certificatePinningHosts"] = certificate_pinning
@@ -518,6 +829,11 @@ class Session:
             }
             request_payload["headers"].update({"Accept-Encoding": None})
 
+        if self.lazy_decompression and not stream:
+            # the Accept-Encoding header is kept, only the decoding in Go is skipped (also the additional decode)
+            request_payload.setdefault("transportOptions", {})["disableCompression"] = True
+            request_payload["additionalDecode"] = None
+
         # todo implement the following settings
         if False:
             request_payload["transportOptions"] = {
@@ -568,79 +884,171 @@ class Session:
             json: Optional[Dict] = None,
             allow_redirects: Optional[bool] = True,
             verify: Optional[bool] = True,
-            timeout: Optional[int] = None,
+            timeout: Optional[float] = None,
             proxy: Optional[Dict] = None,
             proxies: Optional[Dict] = None,
             stream: Optional[bool] = False,
             chunk_size: Optional[int] = 1024,
+            max_body_size: Optional[int] = None,
+            accept_headers: Optional[Callable[[CaseInsensitiveDict], bool]] = None,
+            stream_output_path: Optional[str] = None,
+            deadline: Optional[Union[float, datetime, Deadline]] = None,
+            files: Optional[Union[dict, list]] = None,
     ) -> Response:
 
+        # seconds from now or an absolute time, for the request with all its redirects and retries
+        if deadline is not None:
+            deadline = Deadline.coerce(deadline)
+
         url = self._prepare_url(url, params)
 
-        request_body, content_type = self._prepare_request_body(data, json)
+        request_body, content_type = self._prepare_request_body(data, json, files)
 
         headers = self._merge_headers(headers)
         if content_type is not None and "content-type" not in headers:
             headers["Content-Type"] = content_type
 
+        # compressed on the calling thread before the request is dispatched, its attempts can't start without the
+        # body anyway: hedged attempts share the compressed bytes and a ProcessPool compresses in its worker
+        compressor = self.compressor
+        if compressor is not None:
+            request_body, content_encoding = compressor.compress(method, url, headers, request_body)
+            if content_encoding is not None:
+                headers["Content-Encoding"] = content_encoding
+
         request_cookies = self._prepare_cookies(cookies)
 
         proxy = self._get_proxy(proxy, proxies)
 
-        timeout = timeout or self.timeout
+        # without a timeout the adaptive timeout (if any) chooses the timeout of each hop in _send
+        timeout = timeout or (self.timeout if self.adaptive_timeout is None else None)
 
         certificate_pinning = self.certificate_pinning
 
-        is_byte_request = isinstance(request_body, (bytes, bytearray))
+        is_byte_request = isinstance(request_body, (bytes, bytearray, MultipartEncoder))
+
+        send_kwargs = dict(
+            method=method,
+            url=url,
+            headers=headers,
+            request_body=request_body,
+            request_cookies=request_cookies,
+            is_byte_request=is_byte_request,
+            allow_redirects=allow_redirects,
+            timeout=timeout,
+            proxy=proxy,
+            verify=verify,
+            stream=stream,
+            chunk_size=chunk_size,
+            certificate_pinning=certificate_pinning,
+            max_body_size=self.max_body_size if max_body_size is None else max_body_size,
+            accept_headers=self.accept_headers if accept_headers is None else accept_headers,
+            stream_output_path=stream_output_path,
+            deadline=deadline,
+        )
+
+        # spilled bodies aren't coalesced, the copies would share (and close) one file and mmap
+        coalescer = self.coalescer
+        if (coalescer is not None and not stream and request_body is None and max_body_size is None
+                and accept_headers is None and deadline is None and self.spill_threshold is None
+                and coalescer.should_coalesce(method, url)):
+            key = coalescer.build_key(method, url, headers, request_cookies, allow_redirects, verify, timeout, proxy)
+            return coalescer.execute(key, lambda: self._dispatch(**send_kwargs))
+
+        return self._dispatch(**send_kwargs)
+
+    def _dispatch(self, **send_kwargs: Any) -> Response:
+        registry = self.registry
+        if registry is None:
+            return self._dispatch_hedged(**send_kwargs)
+
+        registry.acquire(self)
+        try:
+            return self._dispatch_hedged(**send_kwargs)
+        finally:
+            registry.release(self)
+
+    def _dispatch_hedged(self, **send_kwargs: Any) -> Response:
+        hedger = self.hedger
+        if hedger is None or send_kwargs["stream"] or not hedger.should_hedge(send_kwargs["method"]):
+            return self._send(**send_kwargs)
+
+        # both attempts collect their cookies separately, only the cookies of the winner end up in the session
+        def attempt(session_id: str, proxy: str) -> Tuple[Response, RequestsCookieJar]:
+            cookie_jar = cookiejar_from_dict({})
+            response = self._send(**dict(send_kwargs, proxy=proxy), session_id=session_id, cookie_jar=cookie_jar)
+            return response, cookie_jar
+
+        def hedge() -> Tuple[Response, RequestsCookieJar]:
+            if self.registry is not None:
+                self.registry.add_go_session(self, self._hedge_session_id)
+            return attempt(self._hedge_session_id, hedger.hedge_proxy(proxy))
+
+        proxy = send_kwargs["proxy"]
+        response, cookie_jar = hedger.execute(
+            lambda: attempt(self._session_id, proxy),
+            hedge,
+            # the body (and spill file) of the late response is released
+            lambda result: result[0]._drop_body(),
+            deadline=send_kwargs["deadline"]
+        )
+        merge_cookies(self.cookies, cookie_jar)
+        return response
 
+    def _send(
+            self,
+            method: str,
+            url: str,
+            headers: CaseInsensitiveDict,
+            request_body: Optional[Union[str, bytes, bytearray, MultipartEncoder]],
+            request_cookies: List[Dict],
+            is_byte_request: bool,
+            allow_redirects: bool,
+            timeout: Optional[float],
+            proxy: str,
+            verify: bool,
+            stream: bool,
+            chunk_size: int,
+            certificate_pinning: Optional[Dict[str, List[str]]] = None,
+            max_body_size: Optional[int] = None,
+            accept_headers: Optional[Callable[[CaseInsensitiveDict], bool]] = None,
+            session_id: Optional[str] = None,
+            cookie_jar: Optional[RequestsCookieJar] = None,
+            stream_output_path: Optional[str] = None,
+            deadline: Optional[Deadline] = None,
+    ) -> Response:
         history = []
         redirect = 0
         while True:
-            start = preferred_clock()
-            request_payload = self._build_request_payload(
+            hop_timeout = timeout
+            if hop_timeout is None:
+                adaptive_timeout = self.adaptive_timeout
+                hop_timeout = adaptive_timeout.timeout_for(url, self.timeout) if adaptive_timeout else self.timeout
+
+            hop_kwargs = dict(
                 method=method,
                 url=url,
                 headers=headers,
                 request_body=request_body,
                 request_cookies=request_cookies,
                 is_byte_request=is_byte_request,
-                timeout=timeout,
+                timeout=hop_timeout,
                 proxy=proxy,
                 verify=verify,
                 stream=stream,
                 chunk_size=chunk_size,
-                certificate_pinning=certificate_pinning
+                certificate_pinning=certificate_pinning,
+                max_body_size=max_body_size,
+                accept_headers=accept_headers,
+                session_id=session_id,
+                cookie_jar=cookie_jar,
+                stream_output_path=stream_output_path,
+                deadline=deadline
             )
 
-            # Execute the request using the TLS client
-            response = request(dumps(request_payload).encode('utf-8'))
-            response_bytes = ctypes.string_at(response)
-            response_string = response_bytes.decode('utf-8')
-            response_object = loads(response_string)
-            freeMemory(response_object['id'].encode('utf-8'))
-
-            # todo update for each Response
-            elapsed = preferred_clock() - start
-
-            # Handle response, split up into new method?
-            if response_object["status"] == 0:
-                raise TLSClientException(response_object["body"])
+            response = self._send_hop(**hop_kwargs)
 
-            response_cookie_jar = extract_cookies_to_jar(
-                request_url=url,
-                request_headers=headers,
-                cookie_jar=self.cookies,
-                response_headers=response_object["headers"]
-            )
-
-            if stream:
-                filepath = os.path.join(os.getcwd(), self._session_id)
-                response = build_response(response_object, response_cookie_jar, request_payload, filepath)
-            else:
-                response = build_response(response_object, response_cookie_jar, request_payload)
-            response.elapsed = timedelta(seconds=elapsed)
-
-            response.history = history.copy()
+            response._link_history(history, self.max_history)
             if not allow_redirects or not response.is_redirect:
                 return response
 
@@ -652,11 +1060,343 @@ class Session:
 
             url = self._rebuild_url(url, response)
             method = self._rebuild_methods(method, response)
+            if self.hooks.get("on_redirect"):
+                dispatch_hook("on_redirect", self.hooks, response, url)
+            if self.metrics is not None:
+                self.metrics.record_redirect(response.url or url)
+
+            if not self.keep_history_bodies:
+                response._drop_body()
+            if self.max_history is not None and len(history) > self.max_history:
+                # the hop which dropped out of the history is released
+                history[len(history) - self.max_history - 1] = None
 
             if response.status_code not in (307, 308):
                 request_body = None
+                is_byte_request = False
                 headers = self._rebuild_headers(headers)
 
+    def _send_hop(self, deadline: Optional[Deadline] = None, **hop_kwargs: Any) -> Response:
+        """Executes a single request, applying the rate limiter and the retry policy of the session"""
+        retry = self.retry
+        if retry is None:
+            return self._execute_attempt(deadline, **hop_kwargs)
+
+        method = hop_kwargs["method"]
+        retry.on_request()
+        attempt = 0
+        while True:
+            try:
+                response = self._execute_attempt(deadline, **hop_kwargs)
+            except TLSClientException as e:
+                attempt += 1
+                if not retry.is_retryable_error(method, e) or not retry.allow_retry(attempt):
+                    raise
+                delay = retry.backoff(attempt)
+                if deadline is not None and delay >= deadline.remaining():
+                    raise TLSClientDeadlineExceeded(f"Deadline exceeded before retry {attempt}: {e}") from e
+                time.sleep(delay)
+                continue
+
+            if not retry.is_retryable_response(method, response):
+                return response
+            attempt += 1
+            if not retry.allow_retry(attempt):
+                return response
+            delay = retry.backoff(attempt, response)
+            if deadline is not None and delay >= deadline.remaining():
+                # no time left for another attempt, the last response is the result
+                return response
+            time.sleep(delay)
+
+    def _execute_attempt(self, deadline: Optional[Deadline] = None, **hop_kwargs: Any) -> Response:
+        """Executes a single request, applying the deadline, the circuit breaker and the rate limiter and recording
+        metrics"""
+        if deadline is not None:
+            hop_kwargs["timeout"] = deadline.timeout(hop_kwargs["timeout"])
+
+        rate_limiter = self.rate_limiter
+        metrics = self.metrics
+        breaker = self.circuit_breaker
+        adaptive_timeout = self.adaptive_timeout
+        if rate_limiter is None and metrics is None and breaker is None and adaptive_timeout is None:
+            return self._execute_before(deadline, hop_kwargs)
+
+        url = hop_kwargs["url"]
+        circuits = origin = host = start = None
+        response = None
+        error = None
+        try:
+            # raises TLSClientCircuitOpen before the request waits for the rate limiter
+            if breaker is not None:
+                circuits = breaker.acquire(url, hop_kwargs["proxy"])
+            if rate_limiter is not None:
+                origin = rate_limiter.acquire(url, deadline)
+                if deadline is not None:
+                    # the rate limiter may have waited
+                    hop_kwargs["timeout"] = deadline.timeout(hop_kwargs["timeout"])
+            if metrics is not None:
+                host = metrics.request_started(url)
+            start = time.perf_counter_ns()
+            response = self._execute_before(deadline, hop_kwargs)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # only what was acquired is released, a request which wasn't sent has no outcome
+            duration = time.perf_counter_ns() - start if start is not None else 0
+            if circuits is not None:
+                if start is None:
+                    breaker.cancel(circuits)
+                else:
+                    breaker.record(circuits, duration / 1e9, response, error)
+            if adaptive_timeout is not None and start is not None:
+                adaptive_timeout.record(url, duration / 1e9, response, error)
+            if host is not None:
+                metrics.request_finished(host, duration, response, error)
+            if origin is not None:
+                rate_limiter.release(origin, response)
+        return response
+
+    def _execute_before(self, deadline: Optional[Deadline], hop_kwargs: Dict[str, Any]) -> Response:
+        """Executes a single request, its timeout raises TLSClientDeadlineExceeded if the deadline passed meanwhile"""
+        if deadline is None:
+            return self._execute_hop(**hop_kwargs)
+        try:
+            return self._execute_hop(**hop_kwargs, deadline=deadline)
+        except TLSClientTimeout as e:
+            if isinstance(e, TLSClientDeadlineExceeded) or not deadline.expired():
+                raise
+            raise TLSClientDeadlineExceeded(f"Deadline exceeded: {e}") from e
+
+    def _execute_hop(
+            self,
+            method: str,
+            url: str,
+            headers: CaseInsensitiveDict,
+            request_body: Optional[Union[str, bytes, bytearray, MultipartEncoder]],
+            request_cookies: List[Dict],
+            is_byte_request: bool,
+            timeout: float,
+            proxy: str,
+            verify: bool,
+            stream: bool,
+            chunk_size: int,
+            certificate_pinning: Optional[Dict[str, List[str]]] = None,
+            max_body_size: Optional[int] = None,
+            accept_headers: Optional[Callable[[CaseInsensitiveDict], bool]] = None,
+            session_id: Optional[str] = None,
+            cookie_jar: Optional[RequestsCookieJar] = None,
+            stream_output_path: Optional[str] = None,
+            deadline: Optional[Deadline] = None,
+    ) -> Response:
+        """Executes a single request (without following redirects) using the TLS client"""
+        hooks = self.hooks
+        start = time.perf_counter_ns()
+
+        limited = max_body_size is not None or accept_headers is not None
+        spool_path = None
+        if (limited or self.spill_threshold is not None) and not stream and method != "HEAD":
+            # the TLS client writes the body to a file instead of returning it as base64 JSON, it is only read into
+            # memory once the headers and its size were checked (and if it is below the spill threshold)
+            spool_path = os.path.join(tempfile.gettempdir(), f"tls-client-{uuid.uuid4().hex}")
+            chunk_size = max(chunk_size, 64 * 1024)
+
+        request_url, server_name, host_override = url, None, None
+        if self.dns_cache is not None and not proxy:
+            pinned = self._pin_address(url, session_id or self._session_id, deadline)
+            if pinned is not None:
+                request_url, server_name, host_override, session_id = pinned
+            if deadline is not None:
+                # the lookup may have waited for the resolver
+                timeout = deadline.timeout(timeout)
+
+        output_path = spool_path
+        if stream:
+            # unique per request, concurrent streams of the session don't write to the same file
+            stream_output_path = stream_output_path or self._new_stream_output_path()
+            if method != "HEAD":
+                output_path = stream_output_path
+
+        request_payload = self._build_request_payload(
+            method=method,
+            url=request_url,
+            headers=headers,
+            request_body=request_body,
+            request_cookies=request_cookies,
+            is_byte_request=is_byte_request,
+            timeout=timeout,
+            proxy=proxy,
+            verify=verify,
+            stream=stream,
+            chunk_size=chunk_size,
+            certificate_pinning=certificate_pinning,
+            session_id=session_id,
+            stream_output_path=output_path,
+            server_name=server_name,
+            host_override=host_override
+        )
+        if hooks.get("on_request"):
+            dispatch_hook("on_request", hooks, request_payload)
+
+        # Execute the request using the TLS client
+        payload_built = time.perf_counter_ns()
+        if isinstance(request_body, MultipartEncoder):
+            encoded_payload = request_body.encode_payload(request_payload)
+        else:
+            encoded_payload = dumps(request_payload).encode('utf-8')
+        payload_encoded = time.perf_counter_ns()
+        spill_file = None
+        try:
+            response_bytes = self.transport.request(encoded_payload)
+            transport_done = time.perf_counter_ns()
+            response_string = response_bytes.decode('utf-8')
+            response_object = loads(response_string)
+            self.transport.free_memory(response_object['id'])
+            envelope_decoded = time.perf_counter_ns()
+            if request_url != url and response_object.get("target"):
+                response_object["target"] = self._unpin_url(response_object["target"], request_url, url)
+
+            if response_object["status"] == 0:
+                error = classify_error(response_object["body"])
+                if hooks.get("on_error"):
+                    dispatch_hook("on_error", hooks, error, request_payload)
+                raise error
+
+            response_cookie_jar = extract_cookies_to_jar(
+                request_url=url,
+                request_headers=headers,
+                cookie_jar=self.cookies if cookie_jar is None else cookie_jar,
+                response_headers=response_object["headers"]
+            )
+            cookies_extracted = time.perf_counter_ns()
+
+            body = None
+            # streamed bodies are checked with the HEAD request and while they are read
+            if limited and (not stream or method == "HEAD"):
+                try:
+                    self._check_response(url, response_object, max_body_size, accept_headers, spool_path)
+                except TLSClientResponseAborted as error:
+                    if hooks.get("on_error"):
+                        dispatch_hook("on_error", hooks, error, request_payload)
+                    raise
+            if spool_path is not None:
+                body = b""
+                if os.path.exists(spool_path):
+                    if self._should_spill(spool_path, response_object):
+                        spill_file = open(spool_path, "rb")
+                    else:
+                        with open(spool_path, "rb") as f:
+                            body = f.read()
+        finally:
+            if spool_path is not None and spill_file is None and os.path.exists(spool_path):
+                os.remove(spool_path)
+
+        if stream:
+            response = build_response(response_object, response_cookie_jar, request_payload, stream_output_path)
+        else:
+            content_codings = None
+            if self.lazy_decompression:
+                content_codings = [self.additional_decode] if self.additional_decode else []
+            response = build_response(response_object, response_cookie_jar, request_payload,
+                                      content_codings=content_codings, body=body)
+            if spill_file is not None:
+                response._spill(spill_file, spool_path)
+        response._max_body_size = max_body_size
+        # only references, the request payload (encoded body, cookies, TLS settings) isn't kept
+        response._request = (method, url, headers, request_body)
+        response_built = time.perf_counter_ns()
+
+        response.elapsed = timedelta(microseconds=(envelope_decoded - start) / 1000)
+        response.timings.update(
+            build_payload=payload_built - start,
+            encode=payload_encoded - payload_built,
+            transport=transport_done - payload_encoded,
+            decode=envelope_decoded - transport_done,
+            cookies=cookies_extracted - envelope_decoded,
+            build_response=response_built - cookies_extracted,
+            total=response_built - start,
+        )
+        response.request_size = len(encoded_payload)
+        response.response_size = len(response_bytes)
+        response.request_body_size = self._request_body_size(request_body)
+
+        if hooks.get("on_response"):
+            dispatch_hook("on_response", hooks, response)
+        return response
+
+    def _pin_address(self,
+                     url: str,
+                     session_id: str,
+                     deadline: Optional[Deadline] = None
+                     ) -> Optional[Tuple[str, str, str, str]]:
+        """Returns the url with the cached IP of its host, the SNI, the Host header and the TLS client session to use"""
+        parts = urllib.parse.urlsplit(url)
+        host = parts.hostname
+        if not host or (self.certificate_pinning and host in self.certificate_pinning):
+            return None
+        address = self.dns_cache.lookup(host, ipv4=not self.disable_ipv4, ipv6=not self.disable_ipv6, deadline=deadline)
+        if address is None:
+            return None
+
+        port = f":{parts.port}" if parts.port else ""
+        netloc = (f"[{address}]" if ":" in address else address) + port
+        dns_session_id = self._dns_session_ids.get((session_id, host))
+        if dns_session_id is None:
+            dns_session_id = self._dns_session_ids[(session_id, host)] = f"{session_id}-{host}"
+            if self.registry is not None:
+                self.registry.add_go_session(self, dns_session_id)
+        return urllib.parse.urlunsplit(parts._replace(netloc=netloc)), host, host + port, dns_session_id
+
+    @staticmethod
+    def _unpin_url(target: str, request_url: str, url: str) -> str:
+        """Replaces the IP in the url reported by the TLS client with the hostname again"""
+        target_parts = urllib.parse.urlsplit(target)
+        if target_parts.netloc != urllib.parse.urlsplit(request_url).netloc:
+            return target
+        return urllib.parse.urlunsplit(target_parts._replace(netloc=urllib.parse.urlsplit(url).netloc))
+
+    def _should_spill(self, spool_path: str, response_object: dict) -> bool:
+        spill_threshold = self.spill_threshold
+        if spill_threshold is None or os.path.getsize(spool_path) < max(spill_threshold, 1):
+            return False
+        if self.lazy_decompression:
+            headers = CaseInsensitiveDict(parse_headers(response_object["headers"]))
+            if self.additional_decode or parse_content_encoding(headers.get("Content-Encoding")):
+                return False
+        return True
+
+    @staticmethod
+    def _check_response(url: str,
+                        response_object: dict,
+                        max_body_size: Optional[int],
+                        accept_headers: Optional[Callable[[CaseInsensitiveDict], bool]],
+                        spool_path: Optional[str] = None
+                        ) -> None:
+        """Raises TLSClientResponseAborted if the headers or the size of the response are not accepted"""
+        response_headers = CaseInsensitiveDict(parse_headers(response_object["headers"]))
+        status_code = response_object["status"]
+
+        if accept_headers is not None and not accept_headers(response_headers):
+            raise TLSClientResponseAborted(
+                f"Response rejected by accept_headers for url: {url}",
+                url=url, status_code=status_code, headers=response_headers
+            )
+        if max_body_size is None:
+            return
+
+        size = None
+        content_length = response_headers.get("Content-Length")
+        if isinstance(content_length, str) and content_length.strip().isdigit():
+            size = int(content_length)
+        if spool_path is not None and os.path.exists(spool_path):
+            size = os.path.getsize(spool_path)
+        if size is not None and size > max_body_size:
+            raise TLSClientBodyTooLarge(
+                f"Response body of {size} bytes exceeds max_body_size ({max_body_size} bytes) for url: {url}",
+                url=url, status_code=status_code, headers=response_headers, size=size
+            )
+
     @staticmethod
     def _rebuild_methods(method: str, response: Response) -> str:
         if response.status_code == 303 and method != "HEAD":
@@ -677,14 +1417,24 @@ class Session:
 
     @staticmethod
     def _rebuild_headers(headers: CaseInsensitiveDict) -> CaseInsensitiveDict:
-        purged_headers = ("Content-Length", "Content-Type", "Transfer-Encoding")
+        purged_headers = ("Content-Length", "Content-Type", "Content-Encoding", "Transfer-Encoding")
+        # the headers of the previous hop may be shared with a concurrent attempt (hedging), they are not modified
+        headers = headers.copy()
         for header in purged_headers:
             headers.pop(header, None)
         return headers
 
+    def _new_stream_output_path(self) -> str:
+        return os.path.join(os.getcwd(), f"{self._session_id}-{uuid.uuid4().hex}")
+
     def get(self, url: str, **kwargs: Any) -> Response:
         """Sends a GET request"""
         if kwargs.get("stream", False):
+            # the HEAD response reads the file the GET request writes to
+            kwargs.setdefault("stream_output_path", self._new_stream_output_path())
+            # the HEAD and the GET request share one budget
+            if kwargs.get("deadline") is not None:
+                kwargs["deadline"] = Deadline.coerce(kwargs["deadline"])
             head_data = self.head(url, **kwargs)
             stream_data_thread = SteamThread(
                 main_request=head_data,
@@ -711,6 +1461,9 @@ class Session:
         """Sends a POST request"""
         if kwargs.get("stream", False):
             # todo head for post request doesn't always work correctly
+            kwargs.setdefault("stream_output_path", self._new_stream_output_path())
+            if kwargs.get("deadline") is not None:
+                kwargs["deadline"] = Deadline.coerce(kwargs["deadline"])
             head_data = self.head(url, allow_redircts=True, **kwargs)
             stream_data_thread = SteamThread(
                 main_request=head_data,
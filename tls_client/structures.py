@@ -31,6 +31,9 @@ class CaseInsensitiveDict(MutableMapping):
     behavior is undefined.
     """
 
+    # True while the store is shared with a fork, it is copied before the next change
+    _shared = False
+
     def __init__(self, data=None, **kwargs):
         self._store = OrderedDict()
         if data is None:
@@ -40,12 +43,16 @@ class CaseInsensitiveDict(MutableMapping):
     def __setitem__(self, key, value):
         # Use the lowercased key for lookups, but store the actual
         # key alongside the value.
+        if self._shared:
+            self._unshare()
         self._store[key.lower()] = (key, value)
 
     def __getitem__(self, key):
         return self._store[key.lower()][1]
 
     def __delitem__(self, key):
+        if self._shared:
+            self._unshare()
         del self._store[key.lower()]
 
     def __iter__(self):
@@ -70,5 +77,16 @@ class CaseInsensitiveDict(MutableMapping):
     def copy(self):
         return CaseInsensitiveDict(self._store.values())
 
+    def fork(self):
+        """Copy which shares the store with this dict until either of them is changed (copy-on-write)."""
+        forked = CaseInsensitiveDict()
+        forked._store = self._store
+        forked._shared = self._shared = True
+        return forked
+
+    def _unshare(self):
+        self._store = OrderedDict(self._store)
+        self._shared = False
+
     def __repr__(self):
         return str(dict(self.items()))
@@ -0,0 +1,161 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+from .exceptions import TLSClientDeadlineExceeded, TLSClientTimeout
+from .metrics import LatencyHistogram, host_of
+from .response import Response
+
+
+def timeout_payload(timeout: float) -> Dict[str, int]:
+    """Timeout fields of the request payload, whole seconds as timeoutSeconds and anything else as
+    timeoutMilliseconds (the TLS client rejects payloads which set both)."""
+    if float(timeout).is_integer():
+        return {"timeoutSeconds": int(timeout)}
+    return {"timeoutMilliseconds": max(1, round(timeout * 1000))}
+
+
+class Deadline:
+    """Time budget of a logical request, shared by all its redirects, retries and hedges. Each attempt gets the
+    remaining time as timeout (if that is shorter than its own), the request raises ``TLSClientDeadlineExceeded``
+    once the budget is spent. A Deadline can be passed to several requests to share one budget between them.
+
+    Example:
+        session.get(url, deadline=2.5)
+        session.get(url, deadline=datetime.now(timezone.utc) + timedelta(seconds=2))
+    """
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, seconds: float) -> None:
+        # time.monotonic() at which the budget is spent
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def at(cls, when: datetime) -> "Deadline":
+        """Deadline at an absolute time, naive datetimes are local time."""
+        return cls((when - datetime.now(when.tzinfo)).total_seconds())
+
+    @classmethod
+    def coerce(cls, deadline: Union["Deadline", datetime, float]) -> "Deadline":
+        if isinstance(deadline, Deadline):
+            return deadline
+        if isinstance(deadline, datetime):
+            return cls.at(deadline)
+        return cls(deadline)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, timeout: float) -> float:
+        """``timeout`` capped by the remaining time, raises TLSClientDeadlineExceeded if there is none left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise TLSClientDeadlineExceeded(f"Deadline exceeded by {-remaining:.3f}s")
+        return min(timeout, remaining)
+
+
+class _HostLatencies:
+    def __init__(self, precision_bits: int) -> None:
+        self.lock = threading.Lock()
+        # the latencies of the current and the previous window, the percentile is taken over both
+        self.current = LatencyHistogram(precision_bits)
+        self.previous = LatencyHistogram(precision_bits)
+        self.timeout: Optional[float] = None
+        self.samples_since_update = 0
+
+
+class AdaptiveTimeout:
+    """Per-host timeouts learned from the observed latencies: the ``percentile`` of the latencies of a host times
+    ``factor``, within ``min_timeout`` and ``max_timeout`` seconds.
+
+    Until ``min_samples`` latencies of a host were recorded its requests use the timeout of the session. The
+    latencies of the last ``window`` to ``2 * window`` requests are considered, so the timeout follows changes of a
+    host. Timed out requests are recorded with their duration and raise the timeout of a host which got slower;
+    other errors are not recorded. Timeouts passed to a request are used as given.
+
+    Example:
+        session.adaptive_timeout = AdaptiveTimeout(percentile=0.99, factor=3, min_timeout=0.05, max_timeout=30)
+    """
+
+    def __init__(self,
+                 percentile: float = 0.99,
+                 factor: float = 3.0,
+                 min_timeout: float = 0.1,
+                 max_timeout: float = 30.0,
+                 min_samples: int = 50,
+                 window: int = 1000,
+                 precision_bits: int = 7,
+                 ) -> None:
+        # Latency percentile of a host which is multiplied by factor, e.g. 0.99
+        self.percentile = percentile
+        self.factor = factor
+        # Bounds of the learned timeouts in seconds
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.window = window
+        self.precision_bits = precision_bits
+
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostLatencies] = {}
+
+    def _host(self, host: str) -> _HostLatencies:
+        latencies = self._hosts.get(host)
+        if latencies is None:
+            with self._lock:
+                latencies = self._hosts.setdefault(host, _HostLatencies(self.precision_bits))
+        return latencies
+
+    def timeout_for(self, url: str, default: float) -> float:
+        """Learned timeout (seconds) of the host of ``url``, ``default`` until enough latencies were observed."""
+        latencies = self._hosts.get(host_of(url))
+        if latencies is None or latencies.timeout is None:
+            return default
+        return latencies.timeout
+
+    def record(self,
+               url: str,
+               seconds: float,
+               response: Optional[Response] = None,
+               error: Optional[BaseException] = None
+               ) -> None:
+        if error is not None and not isinstance(error, TLSClientTimeout):
+            return
+        if isinstance(error, TLSClientDeadlineExceeded):
+            # the timeout of a request cut short by its deadline says nothing about the host
+            return
+
+        latencies = self._host(host_of(url))
+        with latencies.lock:
+            latencies.current.record(int(seconds * 1_000_000))
+            latencies.samples_since_update += 1
+            if latencies.current.count >= self.window:
+                latencies.previous = latencies.current
+                latencies.current = LatencyHistogram(self.precision_bits)
+
+            count = latencies.current.count + latencies.previous.count
+            if count < self.min_samples:
+                return
+            if latencies.timeout is not None and latencies.samples_since_update < self.min_samples:
+                return
+            histogram = LatencyHistogram(self.precision_bits).merge(latencies.previous).merge(latencies.current)
+            learned = histogram.percentile(self.percentile * 100) / 1_000_000 * self.factor
+            latencies.timeout = min(self.max_timeout, max(self.min_timeout, learned))
+            latencies.samples_since_update = 0
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            hosts = list(self._hosts.items())
+        snapshot = {}
+        for host, latencies in hosts:
+            with latencies.lock:
+                snapshot[host] = {
+                    "timeout": latencies.timeout,
+                    "samples": latencies.current.count + latencies.previous.count,
+                }
+        return snapshot
@@ -0,0 +1,294 @@
+import base64
+import ctypes
+import itertools
+import threading
+import time
+from collections import defaultdict, deque
+from json import dumps, loads
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+
+class Transport:
+    """Backend which executes the requests of a ``Session``.
+
+    The interface mirrors the exposed functions of the TLS client shared library: every method takes a JSON encoded
+    payload and returns a JSON encoded result (https://bogdanfinn.gitbook.io/open-source-oasis/shared-library).
+    Results carry an ``id`` which has to be handed back to ``free_memory`` once they were decoded. Request payloads
+    can also be a ``bytearray`` (built in place for large uploads).
+    """
+
+    def request(self, payload: Union[bytes, bytearray]) -> bytes:
+        raise NotImplementedError
+
+    def get_cookies_from_session(self, payload: bytes) -> bytes:
+        raise NotImplementedError
+
+    def add_cookies_to_session(self, payload: bytes) -> bytes:
+        raise NotImplementedError
+
+    def destroy_session(self, payload: bytes) -> bytes:
+        raise NotImplementedError
+
+    def destroy_all(self) -> bytes:
+        raise NotImplementedError
+
+    def free_memory(self, response_id: str) -> None:
+        pass
+
+
+class CFFITransport(Transport):
+    """The TLS client shared library, called through ctypes."""
+
+    def __init__(self) -> None:
+        # the shared library is only loaded once a session actually uses it
+        from . import cffi
+        self._cffi = cffi
+
+    def request(self, payload: Union[bytes, bytearray]) -> bytes:
+        if isinstance(payload, bytearray):
+            # large payloads (multipart uploads) are built in place, pass the buffer without copying it into bytes
+            payload.append(0)
+            try:
+                buffer = (ctypes.c_char * len(payload)).from_buffer(payload)
+                try:
+                    return ctypes.string_at(self._cffi.request(buffer))
+                finally:
+                    del buffer
+            finally:
+                payload.pop()
+        return ctypes.string_at(self._cffi.request(payload))
+
+    def get_cookies_from_session(self, payload: bytes) -> bytes:
+        return ctypes.string_at(self._cffi.getCookiesFromSession(payload))
+
+    def add_cookies_to_session(self, payload: bytes) -> bytes:
+        return ctypes.string_at(self._cffi.addCookiesToSession(payload))
+
+    def destroy_session(self, payload: bytes) -> bytes:
+        return ctypes.string_at(self._cffi.destroySession(payload))
+
+    def destroy_all(self) -> bytes:
+        return ctypes.string_at(self._cffi.destroyAll())
+
+    def free_memory(self, response_id: str) -> None:
+        self._cffi.freeMemory(response_id.encode('utf-8'))
+
+
+_default_transport: Optional[Transport] = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport() -> Transport:
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = CFFITransport()
+    return _default_transport
+
+
+_ids = itertools.count()
+
+
+def build_envelope(payload: dict,
+                   status: int = 200,
+                   headers: Optional[Dict[str, Union[str, List[str]]]] = None,
+                   body: bytes = b"",
+                   target: Optional[str] = None
+                   ) -> dict:
+    """Builds a response envelope the way the shared library does for ``isByteResponse`` requests."""
+    headers = {key: value if isinstance(value, list) else [value] for key, value in (headers or {}).items()}
+    content_type = next((value[0] for key, value in headers.items() if key.lower() == "content-type"), "")
+
+    stream_path = payload.get("StreamOutputPath")
+    if stream_path:
+        with open(stream_path, "wb") as f:
+            f.write(body)
+        body = b""
+
+    return {
+        "id": f"fake-{next(_ids)}",
+        "sessionId": payload.get("sessionId"),
+        "status": status,
+        "target": target or payload.get("requestUrl"),
+        "usedProtocol": "HTTP/2.0",
+        "headers": headers,
+        "cookies": {},
+        "body": f"data:{content_type};base64,{base64.b64encode(body).decode()}",
+    }
+
+
+def _error_envelope(payload: dict, message: str) -> dict:
+    return {
+        "id": f"fake-{next(_ids)}",
+        "sessionId": payload.get("sessionId"),
+        "status": 0,
+        "target": "",
+        "headers": None,
+        "cookies": None,
+        "body": message,
+    }
+
+
+class _CookieStore:
+    """Cookie handling of the fake backends, stores the cookies which were added to a session."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cookies: Dict[str, List[dict]] = defaultdict(list)
+
+    def get_cookies_from_session(self, payload: bytes) -> bytes:
+        session_id = loads(payload)["sessionId"]
+        with self._lock:
+            cookies = list(self._cookies.get(session_id, ()))
+        return dumps({"id": f"fake-{next(_ids)}", "sessionId": session_id, "cookies": cookies}).encode('utf-8')
+
+    def add_cookies_to_session(self, payload: bytes) -> bytes:
+        data = loads(payload)
+        with self._lock:
+            self._cookies[data["sessionId"]].extend(data["cookies"])
+            cookies = list(self._cookies[data["sessionId"]])
+        return dumps({"id": f"fake-{next(_ids)}", "sessionId": data["sessionId"], "cookies": cookies}).encode('utf-8')
+
+    def destroy_session(self, payload: bytes) -> bytes:
+        session_id = loads(payload)["sessionId"]
+        with self._lock:
+            self._cookies.pop(session_id, None)
+        return dumps({"id": f"fake-{next(_ids)}", "success": True}).encode('utf-8')
+
+    def destroy_all(self) -> bytes:
+        with self._lock:
+            self._cookies.clear()
+        return dumps({"id": f"fake-{next(_ids)}", "success": True}).encode('utf-8')
+
+
+class FakeTransport(_CookieStore, Transport):
+    """In-process backend returning canned response envelopes, without the shared library or any network.
+
+    Useful to measure the Python-side overhead per request in isolation and to test code using a ``Session``.
+
+    Example:
+        transport = FakeTransport()
+        transport.add_response("https://example.com/", body=b"hello", headers={"Content-Type": "text/plain"})
+        session = tls_client.Session(transport=transport)
+    """
+
+    def __init__(self,
+                 handler: Optional[Callable[[dict], dict]] = None,
+                 latency: float = 0.0,
+                 ) -> None:
+        super().__init__()
+        # Called with the decoded request payload for requests without canned response, returns an envelope
+        # (see build_envelope)
+        self.handler = handler
+        # Simulated network latency in seconds
+        self.latency = latency
+        self.requests = 0
+        self._routes: Dict[Tuple[str, str], dict] = {}
+
+    def add_response(self,
+                     url: str,
+                     status: int = 200,
+                     headers: Optional[Dict[str, Union[str, List[str]]]] = None,
+                     body: bytes = b"",
+                     method: str = "GET",
+                     ) -> None:
+        self._routes[(method.upper(), url)] = {"status": status, "headers": headers, "body": body}
+
+    def request(self, payload: bytes) -> bytes:
+        data = loads(payload)
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        route = self._routes.get((data["requestMethod"].upper(), data["requestUrl"]))
+        if route is not None:
+            envelope = build_envelope(data, **route)
+        elif self.handler is not None:
+            envelope = self.handler(data)
+        else:
+            envelope = build_envelope(data)
+        return dumps(envelope).encode('utf-8')
+
+
+class RecordingTransport(Transport):
+    """Wraps another backend and appends every request with its response envelope to a JSON lines file.
+
+    The file can be replayed with ``ReplayTransport``.
+    """
+
+    def __init__(self, path: str, transport: Optional[Transport] = None) -> None:
+        self.path = path
+        self.transport = transport or get_default_transport()
+        self._lock = threading.Lock()
+
+    def request(self, payload: bytes) -> bytes:
+        response = self.transport.request(payload)
+        data = loads(payload)
+        record = {
+            "request": {
+                "method": data["requestMethod"],
+                "url": data["requestUrl"],
+                "headers": data.get("headers"),
+            },
+            "response": loads(response),
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(dumps(record) + "\n")
+        return response
+
+    def get_cookies_from_session(self, payload: bytes) -> bytes:
+        return self.transport.get_cookies_from_session(payload)
+
+    def add_cookies_to_session(self, payload: bytes) -> bytes:
+        return self.transport.add_cookies_to_session(payload)
+
+    def destroy_session(self, payload: bytes) -> bytes:
+        return self.transport.destroy_session(payload)
+
+    def destroy_all(self) -> bytes:
+        return self.transport.destroy_all()
+
+    def free_memory(self, response_id: str) -> None:
+        self.transport.free_memory(response_id)
+
+
+class ReplayTransport(_CookieStore, Transport):
+    """Replays the response envelopes captured by ``RecordingTransport``.
+
+    Requests are matched by method and url. Multiple recordings of the same request are replayed in order, the last
+    one is repeated. Requests without recording fail like a connection error of the shared library.
+    """
+
+    def __init__(self, path: str, latency: float = 0.0) -> None:
+        super().__init__()
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._recordings: Dict[Tuple[str, str], Deque[dict]] = defaultdict(deque)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = loads(line)
+                    key = (record["request"]["method"].upper(), record["request"]["url"])
+                    self._recordings[key].append(record["response"])
+
+    def request(self, payload: bytes) -> bytes:
+        data = loads(payload)
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            recordings = self._recordings.get((data["requestMethod"].upper(), data["requestUrl"]))
+            if not recordings:
+                envelope = _error_envelope(data, f"no recorded response for {data['requestMethod']} {data['requestUrl']}")
+                return dumps(envelope).encode('utf-8')
+            envelope = recordings.popleft() if len(recordings) > 1 else recordings[0]
+
+        envelope = dict(envelope, id=f"fake-{next(_ids)}", sessionId=data.get("sessionId"))
+        stream_path = data.get("StreamOutputPath")
+        if stream_path and envelope["status"] != 0:
+            with open(stream_path, "wb") as f:
+                f.write(base64.b64decode(envelope["body"].split(",", 1)[1]))
+            envelope["body"] = envelope["body"].split(",", 1)[0] + ","
+        return dumps(envelope).encode('utf-8')
@@ -0,0 +1,77 @@
+import threading
+import weakref
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from .sessions import Session
+
+
+def origin_url(host: str) -> str:
+    """Root url of a host, a plain hostname (optionally with a port) is taken as https."""
+    if "://" not in host:
+        return f"https://{host}/"
+    parts = urlsplit(host)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+class KeepWarm:
+    """Keeps the connections of a session to a set of hosts open by sending a cheap request to each host every
+    ``interval`` seconds, so the next request doesn't pay for the TCP and TLS handshake again.
+
+    Choose an interval below the idle timeout of the servers (often 60 seconds or more for HTTP/2, less for
+    HTTP/1.1 behind load balancers). The warmer only holds a weak reference to the session and stops once the
+    session is closed or garbage collected.
+
+    Example:
+        warmer = session.keep_warm(["api.example.com", "https://cdn.example.com:8443"], interval=25)
+        ...
+        warmer.stop()
+    """
+
+    def __init__(self,
+                 session: "Session",
+                 hosts: Iterable[str],
+                 interval: float = 30.0,
+                 method: str = "HEAD",
+                 parallel: int = 4,
+                 timeout: Optional[int] = 10
+                 ) -> None:
+        self._session = weakref.ref(session)
+        self.hosts: List[str] = [origin_url(host) for host in hosts]
+        self.interval = interval
+        self.method = method
+        self.parallel = parallel
+        self.timeout = timeout
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.rounds = 0
+        self.failures = 0
+        # Errors of the last round by url, None if the host answered
+        self.last_errors: Dict[str, Optional[Exception]] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> "KeepWarm":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="tls-client-keep-warm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            session = self._session()
+            if session is None:
+                return
+            errors = session.preconnect(self.hosts, parallel=self.parallel, timeout=self.timeout, method=self.method)
+            del session
+            self.rounds += 1
+            self.failures += sum(error is not None for error in errors.values())
+            self.last_errors = errors